@@ -1,64 +1,36 @@
-import json
-import re
-
 import pandas as pd
 
+from biotools_utils import DomainCategories, ensure_tool_list, export_excel, load_categories, load_stage, \
+    load_term_matrix, save_stage, score_tools
 
 
-def count_terms(df: pd.DataFrame):
-    with open("Resources/term_categories.json", "r") as f:
-        terms = json.load(f)
-    topic_yes_terms: list = [term["uri"] for term in terms["TopicYes"]]
-    topic_maybe_terms: list = [term["uri"] for term in terms["TopicMaybe"]]
-    operation_yes_terms: list = [term["uri"] for term in terms["OperationYes"]]
-    operation_maybe_terms: list = [term["uri"] for term in terms["OperationMaybe"]]
-
-    topic_regex_pattern = r"\((topic_[0-9]{4})\)"
-    operation_regex_pattern = r"\((operation_[0-9]{4})\)"
-
-    topic_yes_counts: list = []
-    topic_maybe_counts: list = []
-    operation_yes_counts: list = []
-    operation_maybe_counts: list = []
-    total_yes_counts: list = []
-    total_maybe_counts: list = []
-    total_topic_counts: list = []
-    total_operation_counts: list = []
-    for i, row in df.iterrows():
-        topics: list = [re.search(topic_regex_pattern, term).group(1) for term in row["Topics"].split("\n")
-                        if re.search(topic_regex_pattern, term) is not None]
-        operations: list = [re.search(operation_regex_pattern, term).group(1) for term in row["Operations"].split("\n")
-                            if re.search(operation_regex_pattern, term) is not None]
-
-        topic_yes_count = len([term for term in topics if term in topic_yes_terms])
-        topic_maybe_count = len([term for term in topics if term in topic_maybe_terms])
-        operation_yes_count = len([term for term in operations if term in operation_yes_terms])
-        operation_maybe_count = len([term for term in operations if term in operation_maybe_terms])
-
-        topic_yes_counts.append(topic_yes_count)
-        topic_maybe_counts.append(topic_maybe_count)
-        operation_yes_counts.append(operation_yes_count)
-        operation_maybe_counts.append(operation_maybe_count)
-
-        total_yes_counts.append(topic_yes_count + operation_yes_count)
-        total_maybe_counts.append(topic_maybe_count + operation_maybe_count)
+def count_terms(stage_path: str, excel: bool = False, output_path: str = "TestFiles/Biotools_proteomics_count",
+                categories_path: str = "Resources/term_categories.json"):
+    categories: DomainCategories = load_categories(categories_path)
 
-        total_topic_counts.append(topic_yes_count + topic_maybe_count)
-        total_operation_counts.append(operation_yes_count + operation_maybe_count)
+    # Score all tools against all categories at once, with the term matrices built directly from the term lists
+    scores = score_tools(term_matrices=[load_term_matrix(path=stage_path, column="Topics"),
+                                        load_term_matrix(path=stage_path, column="Operations")],
+                         categories=categories).astype(int)
 
-    count_df = df.assign(TopicsYes=topic_yes_counts, TopicsMaybe=topic_maybe_counts,
-                         OperationsYes=operation_yes_counts, OperationsMaybe=operation_maybe_counts,
-                         TotalYes=total_yes_counts, TotalMaybe=total_maybe_counts, TotalTopics=total_topic_counts,
-                         TotalOperations=total_operation_counts)
+    count_df = load_stage(path=stage_path)
+    count_df = count_df.assign(TopicsYes=scores["TopicYes"].to_numpy(), TopicsMaybe=scores["TopicMaybe"].to_numpy(),
+                               OperationsYes=scores["OperationYes"].to_numpy(),
+                               OperationsMaybe=scores["OperationMaybe"].to_numpy())
+    count_df = count_df.assign(TotalYes=count_df["TopicsYes"] + count_df["OperationsYes"],
+                               TotalMaybe=count_df["TopicsMaybe"] + count_df["OperationsMaybe"],
+                               TotalTopics=count_df["TopicsYes"] + count_df["TopicsMaybe"],
+                               TotalOperations=count_df["OperationsYes"] + count_df["OperationsMaybe"])
 
-    count_df = count_df.set_index("ID")
-    count_df.to_excel("TestFiles/Biotools_proteomics_count.xlsx")
+    save_stage(df=count_df, path=output_path)
+    if excel:
+        export_excel(df=count_df, path=f"{output_path}.xlsx")
 
 
 def main():
-    file: pd.DataFrame = pd.read_excel("TestFiles/biotools_proteomics.xlsx")
-    file = file.fillna('')
-    count_terms(df=file)
+    excel: bool = False
+    stage_path = ensure_tool_list(path="TestFiles/biotools_proteomics", excel_path="TestFiles/biotools_proteomics.xlsx")
+    count_terms(stage_path=stage_path, excel=excel)
 
 
 if __name__ == "__main__":
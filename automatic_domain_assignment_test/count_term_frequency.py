@@ -1,35 +1,32 @@
-import json
-import re
-from collections import Counter
+from biotools_utils import EdamIndex, count_term_hierarchy, ensure_tool_list, load_term_matrix, top_terms_per_level
 
-import pandas as pd
 
-
-def count_terms(df: pd.DataFrame, topic_index, operation_index):
-    def show_terms(term_type: str, index: dict, regex_pattern):
-        terms = [term for term in df[term_type].str.split("\n")]
-        terms = [item for sublist in terms for item in sublist]
-        terms = [re.search(regex_pattern, term).group(1) for term in terms
-                 if re.search(regex_pattern, term) is not None]
-        counter: Counter = Counter(terms)
+def count_terms(stage_path: str, index: EdamIndex):
+    def show_terms(term_type: str):
+        term_matrix = load_term_matrix(path=stage_path, column=term_type)
+        counts = count_term_hierarchy(term_matrix=term_matrix, index=index)
         print("*" * 5, f"Top {top_n} {term_type}", "*" * 5)
-        [print(f"{term_rank}. {index[term]['name'] if term in index else 'N/A'} ({term}) - {term_count}")
-         for term_rank, (term, term_count) in enumerate(counter.most_common(top_n), start=1)]
+        direct_counts = counts[counts["direct"] > 0].sort_values("direct", ascending=False, kind="stable")
+        [print(f"{term_rank}. {term['name']} ({term_id}) - {term['direct']}")
+         for term_rank, (term_id, term) in enumerate(direct_counts.head(top_n).iterrows(), start=1)]
+
+        print("*" * 5, f"Top {top_n_per_level} {term_type} per level, including sub-terms", "*" * 5)
+        for depth, level_counts in top_terms_per_level(counts=counts, top_n=top_n_per_level).groupby("depth"):
+            print(f"Level {depth}:")
+            [print(f"  {term_rank}. {term['name']} ({term_id}) - {term['total']}")
+             for term_rank, (term_id, term) in enumerate(level_counts.iterrows(), start=1)]
 
     top_n: int = 30
-    show_terms(term_type="Topics", index=topic_index, regex_pattern=r"\((topic_[0-9]{4})\)")
-    show_terms(term_type="Operations", index=operation_index, regex_pattern=r"\((operation_[0-9]{4})\)")
+    top_n_per_level: int = 5
+    show_terms(term_type="Topics")
+    show_terms(term_type="Operations")
 
 
 def main():
-    with open("Resources/topic_index.json", "r") as f:
-        topic_index = json.load(f)["data"]
-    with open("Resources/operation_index.json", "r") as f:
-        operation_index = json.load(f)["data"]
-
-    file: pd.DataFrame = pd.read_excel("TestFiles/biotools_proteomics.xlsx")
-    file = file.fillna('')
-    count_terms(df=file, topic_index=topic_index, operation_index=operation_index)
+    index: EdamIndex = EdamIndex.load("Resources/topic_index.json", "Resources/operation_index.json",
+                                      cache_path="Resources/edam_index.npz")
+    stage_path = ensure_tool_list(path="TestFiles/biotools_proteomics", excel_path="TestFiles/biotools_proteomics.xlsx")
+    count_terms(stage_path=stage_path, index=index)
 
 
 if __name__ == "__main__":
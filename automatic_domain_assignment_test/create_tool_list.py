@@ -1,12 +1,18 @@
+from argparse import ArgumentParser, Namespace
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 import json
-from time import sleep
+import os
+import re
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
 
+import numpy as np
 import pandas as pd
-import requests
-from requests import Response
-import urllib.parse
 
-from biotools_utils import extract_terms
+from biotools_utils import TermExtractor, ToolStore, export_excel, harvest_tools, iter_catalogue, iter_tools, \
+    save_stage, save_tool_list, sync_catalogue
 
 
 def _download_full_tool_list() -> list[dict]:
@@ -15,31 +21,23 @@ def _download_full_tool_list() -> list[dict]:
 
     :return: The tool list.
     """
-    tool_list: list[dict] = []
-    next_page: str = ""
-    base_url = f"https://bio.tools/api/t/?format=json"
-    # Get the first page
-    resp: Response = requests.get(base_url)
-    resp.raise_for_status()
-    resp_json = resp.json()
-    next_page = resp_json["next"]
-    tool_list.extend(resp_json["list"])
-    sleep(1)
-
-    # Get the next pages
-    while next_page is not None:
-        resp: Response = requests.get(f"{base_url}&{next_page[1:]}")
-        print(resp.url)
-        resp.raise_for_status()
-        resp_json = resp.json()
-        next_page = resp_json["next"]
-        tool_list.extend(resp_json["list"])
-        sleep(1)
-
-    with open("TestFiles/all_tools.json", "w") as f:
-        f.write(json.dumps(tool_list))
-
-    return tool_list
+    save_tool_list(tools=harvest_tools(checkpoint_dir="TestFiles/all_tools_pages"), path="TestFiles/all_tools.json")
+    with open("TestFiles/all_tools.json", "r") as f:
+        return json.load(f)
+
+
+def _sync_full_tool_list() -> list[dict]:
+    """
+    Update the entire tool list with the tools changed since the last sync.
+
+    :return: The tool list.
+    """
+    report = sync_catalogue(store_dir="Resources/catalogue")
+    print(f"Added {len(report.added)}, updated {len(report.updated)} and deleted {len(report.deleted)} tools using "
+          f"{report.requests} requests ({report.requests_avoided} requests and {report.bytes_avoided} bytes avoided)")
+    save_tool_list(tools=iter_catalogue(store_dir="Resources/catalogue"), path="Resources/all_tools.json")
+    with open("Resources/all_tools.json", "r") as f:
+        return json.load(f)
 
 
 def _download_tool_list(collection_id: str) -> list[dict]:
@@ -49,94 +47,273 @@ def _download_tool_list(collection_id: str) -> list[dict]:
     :param collection_id: The collection ID.
     :return: The list of tools.
     """
-    tool_list: list[dict] = []
-    next_page: str = ""
-    # Create base URL
-    escaped_collection_id: str = urllib.parse.quote(collection_id.encode('utf8'))
-    base_url = f"https://bio.tools/api/t/?collectionID=%22{escaped_collection_id}%22&format=json"
-
-    # Get the first page
-    resp: Response = requests.get(base_url)
-    resp.raise_for_status()
-    resp_json = resp.json()
-    next_page = resp_json["next"]
-    tool_list.extend(resp_json["list"])
-    sleep(1)
-
-    # Get the next pages
-    while next_page is not None:
-        resp: Response = requests.get(f"{base_url}&{next_page[1:]}")
-        print(resp.url)
-        resp.raise_for_status()
-        resp_json = resp.json()
-        next_page = resp_json["next"]
-        tool_list.extend(resp_json["list"])
-        sleep(1)
+    save_tool_list(tools=harvest_tools(params={"collectionID": f'"{collection_id}"'},
+                                       checkpoint_dir=f"TestFiles/{collection_id}_tools_pages"),
+                   path=f"TestFiles/{collection_id}_tools.json")
+    with open(f"TestFiles/{collection_id}_tools.json", "r") as f:
+        return json.load(f)
 
-    with open(f"TestFiles/{collection_id}_tools.json", "w") as f:
-        f.write(json.dumps(tool_list))
 
-    return tool_list
-
-
-def _extract_collection_tools(tool_list: list[dict], collection_id: str) -> list[dict]:
+def _extract_collection_tools(tool_list: Iterable[dict], collection_id: str) -> Iterator[dict]:
     """
     Extract tools with  a given collection ID.
 
-    :param tool_list: The list of tools.
+    :param tool_list: The tools.
     :param collection_id: The collection ID.
-    :return: The list of tools.
+    :return: The iterator over the tools in the collection.
     """
-    return [tool for tool in tool_list if collection_id in tool["collectionID"]]
+    return (tool for tool in tool_list if collection_id in tool["collectionID"])
 
 
-def _create_collection_tool_list(tool_list: list[dict]):
+def _load_term_indexes() -> tuple[dict, dict]:
     """
-    Create the tool list.
+    Load the topic and operation indexes.
 
-    :param tool_list: The list of tools.
+    :return: The dictionaries with the term ID and the term, for the topics and the operations.
     """
-    parsed_tool_list: dict = {}
     with open("Resources/topic_index.json", "r") as f:
         topic_index = json.load(f)["data"]
     with open("Resources/operation_index.json", "r") as f:
         operation_index = json.load(f)["data"]
+    return topic_index, operation_index
+
+
+def _save_tool_list(tools_df: pd.DataFrame, path: str, excel_path: Optional[str] = None):
+    """
+    Save the tool list as a stage table, and optionally export it to Excel.
+
+    :param tools_df: The tool list, indexed by the tool ID with the 'Name', 'Description', 'Topics' and 'Operations'
+        columns.
+    :param path: The path of the stage table.
+    :param excel_path: The path of the Excel file, or None to not export it.
+    """
+    save_stage(df=tools_df, path=path)
+    if excel_path is not None:
+        topic_index, operation_index = _load_term_indexes()
+        # Keep the layout of the spreadsheet, with the name and the bio.tools URL in the ID column
+        excel_df = tools_df.drop(columns="Name")
+        excel_df.index = [f"{name}\n(https://bio.tools/{tool_id})" for tool_id, name in tools_df["Name"].items()]
+        excel_df.index.name = "ID"
+        term_names = {term: term_data["name"] for index in (topic_index, operation_index)
+                      for term, term_data in index.items()}
+        export_excel(df=excel_df, path=excel_path, term_names=term_names)
+
+
+def _create_collection_tool_list(tool_list: Iterable[dict], excel: bool = False):
+    """
+    Create the tool list.
+
+    The tool list is saved as a stage table with the terms of each tool as a list, which the other scripts read
+    directly. The spreadsheet for reading is only written on request.
+
+    :param tool_list: The tools.
+    :param excel: Whether to also export the tool list to Excel.
+    """
+    topic_index, operation_index = _load_term_indexes()
+    # Extract all terms while streaming the tools, and keep only the fields for the tool list
+    extractor = TermExtractor()
+    tool_rows: list = []
+    for tool in tool_list:
+        tool_rows.append((tool["biotoolsID"], tool["name"], tool["description"]))
+        extractor.add(tool)
+    terms = extractor.result()
+
+    tools_df: pd.DataFrame = pd.DataFrame(tool_rows, columns=["ID", "Name", "Description"]).set_index("ID")
+    tools_df["Topics"] = [[term for term in terms.get_terms("Topic", row) if term in topic_index]
+                          for row in range(len(tool_rows))]
+    tools_df["Operations"] = [[term for term in terms.get_terms("Operation", row) if term in operation_index]
+                              for row in range(len(tool_rows))]
+    _save_tool_list(tools_df=tools_df, path="TestFiles/biotools_proteomics",
+                    excel_path="TestFiles/biotools_proteomics.xlsx" if excel else None)
+
+
+def create_tool_list_from_store(store: ToolStore, collection_id: str, path: str, excel_path: Optional[str] = None):
+    """
+    Create the tool list of a collection from the columnar store of the catalogue, which only reads the rows of the
+    tools in the collection instead of parsing the whole dump.
+
+    :param store: The tool store of the catalogue.
+    :param collection_id: The collection ID.
+    :param path: The path of the stage table.
+    :param excel_path: The path of the Excel file, or None to not export it.
+    """
+    topic_index, operation_index = _load_term_indexes()
+    codes, offsets = store.term_codes("collectionID")
+    collections = store.vocabularies["collectionID"]
+    rows: list = []
+    if collection_id in collections:
+        tool_rows = np.repeat(np.arange(len(store)), np.diff(offsets))
+        rows = np.unique(tool_rows[np.asarray(codes) == collections.index(collection_id)]).tolist()
+
+    tools_df: pd.DataFrame = pd.DataFrame({"ID": [store.get_string("biotoolsID", row) for row in rows],
+                                           "Name": [store.get_string("name", row) for row in rows],
+                                           "Description": [store.get_string("description", row) for row in rows]})
+    tools_df = tools_df.set_index("ID")
+    tools_df["Topics"] = [[term for term in store.get_terms("topic", row) if term in topic_index] for row in rows]
+    tools_df["Operations"] = [[term for term in store.get_terms("operation", row) if term in operation_index]
+                              for row in rows]
+    _save_tool_list(tools_df=tools_df, path=path, excel_path=excel_path)
+
+
+def _collection_file_name(collection_id: str) -> str:
+    """
+    Convert a collection ID to a file name, e.g. 'Animal and Crop Genomics' to 'Animal_and_Crop_Genomics'.
+
+    :param collection_id: The collection ID.
+    :return: The file name.
+    """
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", collection_id).strip("_") or "collection"
+
+
+def _collection_file_names(collection_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    Convert collection IDs to distinct file names.
+
+    IDs that only differ in the characters replaced by `_collection_file_name`, e.g. 'A/B' and 'A B', or in case,
+    which some file systems ignore, would share a file name. These get the start of the hash of the ID appended, e.g.
+    'A_B_0f1e2d3c', except for an ID which is its own file name.
+
+    :param collection_ids: The collection IDs.
+    :return: The dictionary with the collection ID and its file name.
+    """
+    names = {collection_id: _collection_file_name(collection_id) for collection_id in collection_ids}
+    shared = Counter(name.lower() for name in names.values())
+    verbatim = Counter(name.lower() for collection_id, name in names.items() if name == collection_id)
+    return {collection_id: name if shared[name.lower()] == 1 or (name == collection_id and verbatim[name.lower()] == 1)
+            else f"{name}_{hashlib.sha1(collection_id.encode('utf-8')).hexdigest()[:8]}"
+            for collection_id, name in names.items()}
+
+
+def _index_collections(tool_list: Iterable[dict], collection_ids: Optional[Sequence[str]] = None) \
+        -> tuple[list, Dict[str, List[int]]]:
+    """
+    Build the tool rows and the collection to tools inverted index in a single pass over the tools.
+
+    Only the tools in at least one of the collections are kept, and the terms of each tool are extracted once, however
+    many of the collections it is in.
+
+    :param tool_list: The tools.
+    :param collection_ids: The collection IDs, or None for all collections.
+    :return: The tool rows, as tuples with the ID, name, description, topics and operations, and the dictionary with the
+        collection ID and the positions of its tools in the rows.
+    """
+    topic_index, operation_index = _load_term_indexes()
+    wanted: Optional[set] = set(collection_ids) if collection_ids is not None else None
+    collection_rows: Dict[str, List[int]] = defaultdict(list) if wanted is None else {collection: []
+                                                                                      for collection in wanted}
+    extractor = TermExtractor()
+    tool_rows: list = []
     for tool in tool_list:
-        tool_idx: str = f"{tool['name']}\n(https://bio.tools/{tool['biotoolsID']})"
-        # Extract the terms
-        topics_raw: list = list(extract_terms(tools=[tool], term_type="Topic").values())[0]
-        operations_raw: list = list(extract_terms(tools=[tool], term_type="Operation").values())
-        if len(operations_raw) > 0:
-            operations_raw = operations_raw[0]
+        collections = [collection for collection in dict.fromkeys(tool.get("collectionID") or [])
+                       if wanted is None or collection in wanted]
+        if len(collections) == 0:
+            continue
+        row = extractor.add(tool)
+        for collection in collections:
+            collection_rows[collection].append(row)
+        tool_rows.append((tool["biotoolsID"], tool["name"], tool["description"]))
+    terms = extractor.result()
 
-        # Get the term names
-        topics_list: list = list(set([term["uri"].replace("http://edamontology.org/", "")
-                                      for term in topics_raw]))
-        operations_list: list = list(
-            set([term["uri"].replace("http://edamontology.org/", "") for term in operations_raw]))
+    tool_rows = [(tool_id, name, description,
+                  [term for term in terms.get_terms("Topic", row) if term in topic_index],
+                  [term for term in terms.get_terms("Operation", row) if term in operation_index])
+                 for row, (tool_id, name, description) in enumerate(tool_rows)]
+    return tool_rows, dict(collection_rows)
 
-        topics: str = "\n".join([f"{topic_index[term]['name']} ({term})"
-                                 for term in topics_list if term in topic_index])
-        operations: str = "\n".join([f"{operation_index[term]['name']} ({term})"
-                                     for term in operations_list if term in operation_index])
 
-        # Add the term to the dictionary
-        parsed_tool_list[tool_idx] = [tool["description"], topics, operations]
+_worker_tool_rows: list = []
 
-    tools_df: pd.DataFrame = pd.DataFrame.from_dict(parsed_tool_list, orient="index", columns=["Description", "Topics",
-                                                                                               "Operations"])
-    tools_df.index.name = "ID"
-    tools_df.to_excel("TestFiles/biotools_proteomics.xlsx")
+
+def _init_worker(tool_rows: list):
+    """
+    Keep the tool rows in a worker process, so they are only sent once per process.
+
+    :param tool_rows: The tool rows.
+    """
+    global _worker_tool_rows
+    _worker_tool_rows = tool_rows
+
+
+def _write_collection(collection_id: str, file_name: str, rows: List[int], output_dir: str,
+                      excel: bool) -> tuple[str, int]:
+    """
+    Write the tool list of a collection from the tool rows of the worker.
+
+    :param collection_id: The collection ID.
+    :param file_name: The file name of the tool list.
+    :param rows: The positions of the tools of the collection in the tool rows.
+    :param output_dir: The directory of the tool lists.
+    :param excel: Whether to also export the tool list to Excel.
+    :return: The collection ID and the number of tools.
+    """
+    tools_df = pd.DataFrame([_worker_tool_rows[row] for row in rows],
+                            columns=["ID", "Name", "Description", "Topics", "Operations"]).set_index("ID")
+    path = os.path.join(output_dir, file_name)
+    _save_tool_list(tools_df=tools_df, path=path, excel_path=f"{path}.xlsx" if excel else None)
+    return collection_id, len(tools_df)
+
+
+def create_collection_tool_lists(tool_list: Iterable[dict], collection_ids: Optional[Sequence[str]] = None,
+                                 output_dir: str = "TestFiles/collections", workers: int = 1,
+                                 excel: bool = False) -> Dict[str, int]:
+    """
+    Create the tool lists of many collections with a single pass over the catalogue.
+
+    The tools of all collections are indexed in one pass, and the tool lists are then written in parallel by a pool of
+    processes, so the time hardly depends on the number of collections.
+
+    :param tool_list: The tools, e.g. streamed from the dump.
+    :param collection_ids: The collection IDs, or None for all collections.
+    :param output_dir: The directory of the tool lists, with one stage table per collection, named after the collection
+        ID with `_collection_file_names`.
+    :param workers: The number of processes.
+    :param excel: Whether to also export the tool lists to Excel.
+    :return: The dictionary with the collection ID and its number of tools.
+    """
+    tool_rows, collection_rows = _index_collections(tool_list=tool_list, collection_ids=collection_ids)
+    os.makedirs(output_dir, exist_ok=True)
+    # Write the largest collections first, so they do not end up alone at the end
+    collections = sorted(collection_rows, key=lambda collection: -len(collection_rows[collection]))
+    file_names = _collection_file_names(collection_ids=collections)
+    if workers > 1 and len(collections) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tool_rows,)) as executor:
+            futures = [executor.submit(_write_collection, collection, file_names[collection],
+                                       collection_rows[collection], output_dir, excel)
+                       for collection in collections]
+            return dict(future.result() for future in futures)
+    _init_worker(tool_rows=tool_rows)
+    return dict(_write_collection(collection_id=collection, file_name=file_names[collection],
+                                  rows=collection_rows[collection], output_dir=output_dir, excel=excel)
+                for collection in collections)
 
 
 def main():
-    collection_id: str = "Proteomics"
-    # full_tools: list[dict] = _download_full_tool_list()
-    with open("Resources/all_tools.json", "r") as f:
-        full_tools = json.load(f)
+    parser = ArgumentParser(description="Create the tool lists of bio.tools collections. Without options, the tool "
+                                        "list of the Proteomics collection is written to TestFiles/biotools_proteomics")
+    parser.add_argument("--collections", nargs="+", help="Create the tool lists of these collections in one pass.")
+    parser.add_argument("--all", action="store_true", help="Create the tool lists of all collections in one pass.")
+    parser.add_argument("--dump", default="Resources/all_tools.json", help="The tool list dump.")
+    parser.add_argument("--output-dir", default="TestFiles/collections", help="The directory of the tool lists.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="The number of processes.")
+    parser.add_argument("--excel", action="store_true", help="Also export the tool lists to Excel.")
+    args: Namespace = parser.parse_args()
+    fields = ["name", "description", "collectionID", "topic", "function"]
+
+    if args.collections is None and not args.all:
+        collection_id: str = "Proteomics"
+        # _download_full_tool_list()
+        # Stream the dump, so only the tools in the collection are kept in memory
+        tools: Iterator[dict] = iter_tools(path=args.dump, collection_id=collection_id, fields=fields)
+        _create_collection_tool_list(tool_list=tools, excel=args.excel)
+        return
 
-    tools: list[dict] = _extract_collection_tools(tool_list=full_tools, collection_id=collection_id)
-    _create_collection_tool_list(tool_list=tools)
+    start = time.perf_counter()
+    counts = create_collection_tool_lists(tool_list=iter_tools(path=args.dump, fields=fields),
+                                          collection_ids=None if args.all else args.collections,
+                                          output_dir=args.output_dir, workers=args.workers, excel=args.excel)
+    for collection_id, number_of_tools in sorted(counts.items()):
+        print(f"{collection_id}: {number_of_tools} tools")
+    print(f"Created {len(counts)} tool lists in {time.perf_counter() - start:.2f} s")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from biotools_utils import DomainClassifier, build_term_matrices, collection_labels, ensure_tool_list, export_excel, \
+    iter_tools, load_categories, load_stage, save_stage, seed_labels
+
+DOMAIN = "Proteomics"
+EDAM_URL = "http://edamontology.org/"
+
+
+def _metrics(name: str, labels: np.ndarray, probabilities: np.ndarray, threshold: float = 0.5) -> dict:
+    """
+    Compute the metrics of domain predictions.
+
+    :param name: The name of the method.
+    :param labels: The true labels, 1 for tools in the domain.
+    :param probabilities: The predicted probabilities or scores.
+    :param threshold: The smallest probability of a tool predicted in the domain.
+    :return: The dictionary with the metrics.
+    """
+    predictions = probabilities >= threshold
+    return {"Method": name, "Precision": precision_score(labels, predictions, zero_division=0),
+            "Recall": recall_score(labels, predictions, zero_division=0),
+            "F1": f1_score(labels, predictions, zero_division=0), "AUC": roc_auc_score(labels, probabilities)}
+
+
+def _cross_validate(tools: List[dict], labels: pd.DataFrame, description_features: int, folds: int = 5) -> np.ndarray:
+    """
+    Predict the probability of each tool with a classifier trained on the other folds.
+
+    :param tools: The tools.
+    :param labels: The collection labels.
+    :param description_features: The number of hashed description word columns.
+    :param folds: The number of folds.
+    :return: The out-of-fold probabilities.
+    """
+    probabilities = np.zeros(len(tools))
+    targets = labels[DOMAIN].to_numpy()
+    for train, test in StratifiedKFold(n_splits=folds, shuffle=True, random_state=0).split(tools, targets):
+        classifier = DomainClassifier(description_features=description_features)
+        classifier.fit(tools=[tools[row] for row in train], labels=labels.iloc[train])
+        probabilities[test] = classifier.predict_proba(tools=[tools[row] for row in test])[DOMAIN].to_numpy()
+    return probabilities
+
+
+def _stage_tools(df: pd.DataFrame, keep_proteomics_topic: bool = True) -> List[dict]:
+    """
+    Convert the rows of the tool list stage table to minimal tool records.
+
+    :param df: The tool list created by create_tool_list.
+    :param keep_proteomics_topic: Whether to keep the Proteomics topic (topic_0121) of the tools.
+    :return: The tools.
+    """
+    return [{"biotoolsID": tool_id, "description": description,
+             "topic": [{"uri": EDAM_URL + topic} for topic in topics
+                       if keep_proteomics_topic or topic != "topic_0121"],
+             "function": [{"operation": [{"uri": EDAM_URL + operation} for operation in operations]}]}
+            for tool_id, description, topics, operations in df[["Description", "Topics", "Operations"]].itertuples()]
+
+
+def evaluate_catalogue(tools: List[dict]) -> pd.DataFrame:
+    """
+    Evaluate the classifiers against the Proteomics collection, with the seed term count as the baseline.
+
+    :param tools: The tools.
+    :return: The dataframe with the metrics of each method.
+    """
+    categories = load_categories("Resources/term_categories.json")
+    labels = collection_labels(tools=tools, domains=[DOMAIN])
+    targets = labels[DOMAIN].to_numpy()
+
+    term_matrices = build_term_matrices(tools=tools)
+    seed_scores = seed_labels(term_matrices=term_matrices.values(), categories=categories, domain=DOMAIN)[DOMAIN]
+    seed_model = DomainClassifier().fit(tools=tools, categories=categories, domain=DOMAIN)
+
+    results = [_metrics(name="Seed terms (TotalYes > 0)", labels=targets,
+                        probabilities=(seed_scores.to_numpy() == 1).astype(float)),
+               _metrics(name="Classifier on seed labels", labels=targets,
+                        probabilities=seed_model.predict_proba(tools=tools)[DOMAIN].to_numpy()),
+               _metrics(name="Classifier, terms (5-fold CV)", labels=targets,
+                        probabilities=_cross_validate(tools=tools, labels=labels, description_features=0)),
+               _metrics(name="Classifier, terms and descriptions (5-fold CV)", labels=targets,
+                        probabilities=_cross_validate(tools=tools, labels=labels, description_features=2 ** 18))]
+    return pd.DataFrame(results).set_index("Method")
+
+
+def evaluate_test_files(classifier: DomainClassifier, excel: bool = False):
+    """
+    Score the tools of the Proteomics tool list with and without their Proteomics topic, and save the probabilities.
+
+    :param classifier: The classifier trained on the catalogue.
+    :param excel: Whether to also export the probabilities to Excel.
+    """
+    stage_path = ensure_tool_list(path="TestFiles/biotools_proteomics", excel_path="TestFiles/biotools_proteomics.xlsx")
+    df = load_stage(path=stage_path)
+    probabilities: Dict[str, pd.Series] = {}
+    for name, keep_proteomics_topic in (("Probability", True), ("ProbabilityNoProteomicsTopic", False)):
+        tools = _stage_tools(df=df, keep_proteomics_topic=keep_proteomics_topic)
+        probabilities[name] = classifier.predict_proba(tools=tools)[DOMAIN]
+        print(f"{name}: {(probabilities[name] >= 0.5).mean():.1%} of {len(tools)} Proteomics tools found")
+
+    domains_df = df.assign(**{name: values.to_numpy() for name, values in probabilities.items()})
+    save_stage(df=domains_df, path="TestFiles/Biotools_proteomics_domains")
+    if excel:
+        export_excel(df=domains_df, path="TestFiles/Biotools_proteomics_domains.xlsx")
+
+
+def main():
+    excel: bool = False
+    tools = list(iter_tools(path="Resources/all_tools.json"))
+    print(evaluate_catalogue(tools=tools).round(3).to_string())
+
+    classifier = DomainClassifier(description_features=2 ** 18)
+    classifier.fit(tools=tools, labels=collection_labels(tools=tools, domains=[DOMAIN]))
+    classifier.save("Resources/domain_classifier.npz")
+    evaluate_test_files(classifier=DomainClassifier.load("Resources/domain_classifier.npz"), excel=excel)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from argparse import ArgumentParser, Namespace
+
+import biotools_utils.domain_scoring
+import biotools_utils.edam_term_extractor
+import biotools_utils.stage_io
+import biotools_utils.term_matrix
+import biotools_utils.tool_store
+import biotools_utils.tool_stream
+import count_dataframe_terms
+import count_term_frequency
+import create_tool_list
+from biotools_utils import EdamIndex, StageCache, ToolStore, code_version, convert_json_dump, export_excel, \
+    load_stage
+
+TOPIC_INDEX_PATH: str = "Resources/topic_index.json"
+OPERATION_INDEX_PATH: str = "Resources/operation_index.json"
+CATEGORIES_PATH: str = "Resources/term_categories.json"
+
+
+def _build_catalogue(path: str, dump_path: str):
+    """
+    Convert the tool list dump to the columnar store shared by all collections.
+
+    :param path: The output directory.
+    :param dump_path: The path of the tool list dump.
+    """
+    convert_json_dump(json_path=dump_path, store_path=path)
+
+
+def _build_tool_list(path: str, catalogue_path: str, topic_index_path: str, operation_index_path: str,
+                     collection_id: str):
+    """
+    Create the tool list of a collection from the catalogue store.
+
+    :param path: The output directory.
+    :param catalogue_path: The path of the catalogue store.
+    :param topic_index_path: The path of the topic index, read by create_tool_list.
+    :param operation_index_path: The path of the operation index, read by create_tool_list.
+    :param collection_id: The collection ID.
+    """
+    create_tool_list.create_tool_list_from_store(store=ToolStore.load(catalogue_path), collection_id=collection_id,
+                                                 path=path)
+
+
+def _build_counts(path: str, tool_list_path: str, categories_path: str):
+    """
+    Count the terms of the tools in the term categories.
+
+    :param path: The output directory.
+    :param tool_list_path: The path of the tool list stage table.
+    :param categories_path: The path of the term categories.
+    """
+    count_dataframe_terms.count_terms(stage_path=tool_list_path, output_path=path, categories_path=categories_path)
+
+
+def main():
+    parser = ArgumentParser(description="Run the domain assignment pipeline, reusing the cached output of every stage "
+                                        "whose inputs, parameters and code did not change")
+    parser.add_argument("--collections", nargs="+", default=["Proteomics"], help="The collection IDs.")
+    parser.add_argument("--dump", default="Resources/all_tools.json", help="The tool list dump.")
+    parser.add_argument("--cache-dir", default="Resources/pipeline_cache", help="The cache directory.")
+    parser.add_argument("--max-cache-size", type=int, default=2048, help="The largest size of the cache in MB.")
+    parser.add_argument("--excel", action="store_true", help="Export the tool lists and counts to TestFiles as Excel.")
+    parser.add_argument("--report", action="store_true", help="Print the most common terms of each collection.")
+    args: Namespace = parser.parse_args()
+
+    version = code_version(create_tool_list, count_dataframe_terms, biotools_utils.domain_scoring,
+                           biotools_utils.edam_term_extractor, biotools_utils.stage_io, biotools_utils.term_matrix,
+                           biotools_utils.tool_store, biotools_utils.tool_stream)
+    # The cache only evicts outputs when it is closed, so the outputs of the shared stages stay while they are used
+    with StageCache(cache_dir=args.cache_dir, max_bytes=args.max_cache_size * 1024 ** 2) as cache:
+        catalogue_path = cache.run(stage="catalogue", build=_build_catalogue, inputs=[args.dump], code_version=version)
+        for collection_id in args.collections:
+            tool_list_path = cache.run(stage="tool_list", build=_build_tool_list,
+                                       inputs=[catalogue_path, TOPIC_INDEX_PATH, OPERATION_INDEX_PATH],
+                                       params={"collection_id": collection_id}, code_version=version)
+            counts_path = cache.run(stage="counts", build=_build_counts, inputs=[tool_list_path, CATEGORIES_PATH],
+                                    code_version=version)
+            counts_df = load_stage(path=counts_path, columns=["TotalYes", "TotalMaybe"])
+            yes = counts_df["TotalYes"] > 0
+            maybe_only = ~yes & (counts_df["TotalMaybe"] > 0)
+            print(f"{collection_id}: {len(counts_df)} tools, {yes.sum()} with a 'Yes' term and {maybe_only.sum()} with "
+                  f"only 'Maybe' terms")
+
+            if args.excel:
+                export_excel(df=load_stage(path=tool_list_path), path=f"TestFiles/{collection_id}_tools.xlsx")
+                export_excel(df=load_stage(path=counts_path), path=f"TestFiles/{collection_id}_count.xlsx")
+            if args.report:
+                index = EdamIndex.load(TOPIC_INDEX_PATH, OPERATION_INDEX_PATH, cache_path="Resources/edam_index.npz")
+                count_term_frequency.count_terms(stage_path=tool_list_path, index=index)
+
+    print(f"Ran {len(cache.stats.misses)} and reused {len(cache.stats.hits)} stages, evicted "
+          f"{cache.stats.evicted} outputs, {cache.size / 1024 ** 2:.1f} MB cached")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+
+from biotools_utils import AnnotationSuggester, ensure_tool_list, export_excel, load_stage, save_stage, \
+    suggest_catalogue
+
+TOPIC_INDEX_PATH: str = "Resources/topic_index.json"
+OPERATION_INDEX_PATH: str = "Resources/operation_index.json"
+
+
+def suggest_missing_operations(suggester: AnnotationSuggester):
+    """
+    Suggest operations for the tools of the catalogue without operations.
+
+    :param suggester: The suggester.
+    """
+    report = suggest_catalogue(path="Resources/all_tools.json", report_path="TestFiles/suggested_operations.jsonl",
+                               suggester=suggester, workers=os.cpu_count(), only_missing_operations=True)
+    print(f"{report.tools_with_suggestions} of {report.tools} tools without operations got "
+          f"{report.suggested_operations} suggested operations in {report.seconds:.2f} s "
+          f"({report.tools_per_second:.0f} tools/s)")
+
+
+def suggest_test_files(suggester: AnnotationSuggester, excel: bool = False):
+    """
+    Suggest topics and operations for the tools of the Proteomics tool list, and save them next to the tool list.
+
+    :param suggester: The suggester.
+    :param excel: Whether to also export the suggestions to Excel.
+    """
+    stage_path = ensure_tool_list(path="TestFiles/biotools_proteomics", excel_path="TestFiles/biotools_proteomics.xlsx")
+    df = load_stage(path=stage_path)
+    suggested = {"SuggestedTopics": [], "SuggestedOperations": []}
+    for name, description, topics, operations in df[["Name", "Description", "Topics", "Operations"]].itertuples(
+            index=False):
+        suggestions = suggester.suggest(text=f"{name}. {description}", existing=list(topics) + list(operations),
+                                        max_suggestions=None)
+        suggested["SuggestedTopics"].append([s.term_id for s in suggestions if s.term_id.startswith("topic")])
+        suggested["SuggestedOperations"].append([s.term_id for s in suggestions if s.term_id.startswith("operation")])
+
+    suggestions_df = pd.DataFrame(suggested, index=df.index)
+    without_operations = df["Operations"].map(len) == 0
+    print(f"{(suggestions_df['SuggestedOperations'].map(len) > 0)[without_operations].sum()} of "
+          f"{without_operations.sum()} Proteomics tools without operations got suggested operations")
+    save_stage(df=suggestions_df, path="TestFiles/Biotools_proteomics_suggestions")
+    if excel:
+        export_excel(df=suggestions_df, path="TestFiles/Biotools_proteomics_suggestions.xlsx",
+                     term_names=dict(zip(suggester.term_ids, suggester.names)))
+
+
+def main():
+    excel: bool = False
+    suggester = AnnotationSuggester.load(TOPIC_INDEX_PATH, OPERATION_INDEX_PATH,
+                                         cache_path="Resources/annotation_suggester.npz")
+    suggest_missing_operations(suggester=suggester)
+    suggest_test_files(suggester=suggester, excel=excel)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark of the annotation suggester against matching every EDAM name and synonym separately
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import os
+import re
+import tempfile
+import time
+from typing import List, Set, Tuple
+
+from biotools_utils import AnnotationSuggester, read_suggestions, save_tool_list, suggest_catalogue
+from biotools_utils.annotation_suggester import _words
+from synthetic_catalogue import RESOURCES_DIR, _load_index, generate_tools
+
+INDEX_PATHS: List[str] = [os.path.join(RESOURCES_DIR, "topic_index.json"),
+                          os.path.join(RESOURCES_DIR, "operation_index.json")]
+
+
+def pattern_scan(texts: List[str], patterns: List[re.Pattern]) -> int:
+    """
+    Search every pattern in every text, as with one regular expression per EDAM name and synonym.
+    :param texts: The texts.
+    :param patterns: The compiled patterns.
+    :return: The number of matches.
+    """
+    return sum(pattern.search(text) is not None for text in texts for pattern in patterns)
+
+
+def match_reference(text: str, phrases: Set[Tuple[str, ...]], longest: int) -> List[Tuple[str, int]]:
+    """
+    Find the leftmost longest phrases in a text by trying every phrase length at every word.
+    :param text: The text.
+    :param phrases: The words of the phrases.
+    :param longest: The number of words of the longest phrase.
+    :return: The list with the phrase and the word position after the end of each match.
+    """
+    words = _words(text)
+    matches = []
+    position = 0
+    while position < len(words):
+        for length in range(min(longest, len(words) - position), 0, -1):
+            if tuple(words[position:position + length]) in phrases:
+                matches.append((" ".join(words[position:position + length]), position + length))
+                position += length
+                break
+        else:
+            position += 1
+    return matches
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the annotation suggester")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    parser.add_argument("--workers", type=int, default=2, help="The number of processes of the catalogue run.")
+    args: Namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "annotation_suggester.npz")
+        start = time.perf_counter()
+        compiled = AnnotationSuggester.load(*INDEX_PATHS, cache_path=cache_path)
+        compile_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        suggester = AnnotationSuggester.load(*INDEX_PATHS, cache_path=cache_path)
+        print(f"{len(suggester)} terms, {len(suggester.pattern_texts)} patterns: compiled in {compile_seconds:.3f} s, "
+              f"loaded from the cache in {time.perf_counter() - start:.3f} s")
+
+        tools = list(generate_tools(number_of_tools=args.tools))
+        texts = [f"{tool['name']}. {tool['description']}" for tool in tools]
+        phrases = [text for file_name in ("topic_index.json", "operation_index.json")
+                   for term in _load_index(file_name).values()
+                   for text in [term["name"]] + term["exact_synonyms"] + term["narrow_synonyms"]]
+        patterns = [re.compile(rf"\b{re.escape(phrase)}\b", re.IGNORECASE) for phrase in phrases]
+        sample = texts[:max(len(texts) // 100, 1)]
+        start = time.perf_counter()
+        pattern_scan(texts=sample, patterns=patterns)
+        scan_rate = len(sample) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        suggestions = {tool["biotoolsID"]: suggester.suggest_tool(tool=tool) for tool in tools}
+        suggest_rate = len(tools) / (time.perf_counter() - start)
+
+        # The automaton finds the same phrases as trying every phrase at every word, and the cache changes nothing
+        phrases = {tuple(text.split(" ")) for text in suggester.pattern_texts}
+        longest = max(len(phrase) for phrase in phrases)
+        for text in sample:
+            assert [(suggester.pattern_texts[pattern], end) for pattern, end in suggester.match(text)] == \
+                match_reference(text=text, phrases=phrases, longest=longest), text
+        for tool in tools[:len(sample)]:
+            assert compiled.suggest_tool(tool=tool) == suggestions[tool["biotoolsID"]], tool["biotoolsID"]
+        print(f"{'method':<40} {'tools/s':>9}")
+        print(f"{f'one regular expression per phrase ({len(patterns)})':<40} {scan_rate:>9.0f}")
+        print(f"{'suggester':<40} {suggest_rate:>9.0f}")
+
+        dump_path = os.path.join(directory, "all_tools.json")
+        save_tool_list(tools=tools, path=dump_path)
+        expected = {tool_id: tool_suggestions for tool_id, tool_suggestions in suggestions.items()
+                    if len(tool_suggestions) > 0}
+        for workers in (1, args.workers):
+            report_path = os.path.join(directory, "suggestions.jsonl")
+            report = suggest_catalogue(path=dump_path, report_path=report_path, suggester=suggester, workers=workers)
+            assert dict(read_suggestions(report_path=report_path)) == expected, workers
+            print(f"{f'catalogue dump, {workers} processes':<40} {report.tools_per_second:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
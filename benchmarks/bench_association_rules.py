@@ -0,0 +1,122 @@
+"""
+Benchmark of the Eclat frequent itemset mining against a level-wise Apriori over transaction sets
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import math
+import time
+from typing import Optional
+
+from biotools_utils import TermMatrix, association_rules, build_term_matrices, combine_term_matrices, \
+    frequent_itemsets, iter_tools
+from synthetic_catalogue import generate_tools
+
+
+def apriori(term_matrix: TermMatrix, min_support: float) -> dict:
+    """
+    Find the frequent itemsets level by level, counting each candidate by scanning the transactions as sets, the way
+    pure Python Apriori implementations like apyori do.
+    :param term_matrix: The tool by term matrix.
+    :param min_support: The smallest fraction of the tools having all terms of an itemset.
+    :return: The dictionary with the sorted tuple of terms and the count.
+    """
+    transactions = [frozenset(term_matrix.terms[column] for column in term_matrix.matrix[row].indices)
+                    for row in range(term_matrix.matrix.shape[0])]
+    min_count = max(1, math.ceil(min_support * len(transactions)))
+    counts: dict = {}
+    for transaction in transactions:
+        for term in transaction:
+            counts[(term,)] = counts.get((term,), 0) + 1
+    level = {itemset: count for itemset, count in counts.items() if count >= min_count}
+    frequent = dict(level)
+    while level:
+        itemsets = sorted(level)
+        candidates = {tuple(sorted(set(first) | set(second))) for index, first in enumerate(itemsets)
+                      for second in itemsets[index + 1:] if first[:-1] == second[:-1]}
+        candidate_counts = {candidate: sum(1 for transaction in transactions if transaction.issuperset(candidate))
+                            for candidate in candidates}
+        level = {itemset: count for itemset, count in candidate_counts.items() if count >= min_count}
+        frequent.update(level)
+    return frequent
+
+
+def count_tools(term_matrix: TermMatrix, terms: tuple) -> int:
+    """
+    Count the tools having all of some terms directly from the term matrix.
+    :param term_matrix: The tool by term matrix.
+    :param terms: The terms.
+    :return: The number of tools.
+    """
+    columns = [term_matrix.terms.index(term) for term in terms]
+    return int(((term_matrix.matrix[:, columns] > 0).sum(axis=1) == len(columns)).sum())
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the association rule mining")
+    parser.add_argument("--dump", help="The tool list dump, e.g. all_tools.json. A synthetic catalogue is used if "
+                                       "not given.")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    parser.add_argument("--supports", type=float, nargs="+", default=[0.01, 0.003, 0.001, 0.0003],
+                        help="The minimum supports.")
+    parser.add_argument("--apriori-tools", type=int, default=5000,
+                        help="The number of tools for the Apriori baseline, which is too slow for the full catalogue.")
+    parser.add_argument("--workers", type=int, default=2, help="The number of processes.")
+    args: Namespace = parser.parse_args()
+
+    tools = iter_tools(path=args.dump) if args.dump is not None else generate_tools(number_of_tools=args.tools)
+    term_matrix = combine_term_matrices(build_term_matrices(tools=tools).values())
+    print(f"{len(term_matrix.tool_ids)} tools, {len(term_matrix.terms)} topics and operations")
+
+    subset = TermMatrix(matrix=term_matrix.matrix[:args.apriori_tools],
+                        tool_ids=term_matrix.tool_ids[:args.apriori_tools], terms=term_matrix.terms)
+    for min_support in args.supports[:2]:
+        start = time.perf_counter()
+        expected = apriori(term_matrix=subset, min_support=min_support)
+        apriori_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        itemsets = frequent_itemsets(term_matrix=subset, min_support=min_support)
+        eclat_seconds = time.perf_counter() - start
+        assert dict(zip(itemsets["Itemset"], itemsets["Count"])) == expected
+        print(f"{len(subset.tool_ids)} tools, support {min_support}: Apriori {apriori_seconds:.2f} s, "
+              f"Eclat {eclat_seconds:.2f} s, {len(expected)} itemsets")
+
+    for min_support in args.supports:
+        single_process_itemsets: Optional[dict] = None
+        for workers in sorted({1, args.workers}):
+            start = time.perf_counter()
+            itemsets = frequent_itemsets(term_matrix=term_matrix, min_support=min_support, workers=workers)
+            itemset_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            rules = association_rules(itemsets=itemsets, min_confidence=0.2, antecedent_prefix="topic_",
+                                      consequent_prefix="operation_")
+            rules_seconds = time.perf_counter() - start
+            # The processes find the same itemsets, and the confidences agree with counting the tools directly
+            counts = dict(zip(itemsets["Itemset"], itemsets["Count"]))
+            if single_process_itemsets is None:
+                single_process_itemsets = counts
+            assert counts == single_process_itemsets, workers
+            for antecedent, consequent, confidence in rules[["Antecedent", "Consequent", "Confidence"]].head(
+                    20).itertuples(index=False):
+                expected_confidence = count_tools(term_matrix, antecedent + consequent) / count_tools(term_matrix,
+                                                                                                      antecedent)
+                assert math.isclose(confidence, expected_confidence), (antecedent, consequent)
+            print(f"{len(term_matrix.tool_ids)} tools, support {min_support}, {workers} process(es): "
+                  f"{itemset_seconds:.2f} s for {len(itemsets)} itemsets, {rules_seconds:.2f} s for "
+                  f"{len(rules)} topic => operation rules")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark of the scalable tool clustering against Ward linkage on the dense one-hot matrix
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+from scipy.cluster import hierarchy
+# The clustering imports scikit-learn when it is first called, which should not count towards the measured times
+import sklearn.cluster  # noqa: F401
+import sklearn.feature_extraction.text  # noqa: F401
+
+from biotools_utils import ClusteringResult, TermMatrix, build_term_matrices, cluster_kmeans, cluster_knn_graph, \
+    combine_term_matrices, tfidf_vectors
+from synthetic_catalogue import generate_tools
+
+
+def ward_dense(term_matrix: TermMatrix) -> np.ndarray:
+    """
+    Cluster the tools the way `clustering_test.cluster` used to, with Ward linkage on the dense one-hot matrix.
+    :param term_matrix: The tool by term matrix.
+    :return: The linkage matrix.
+    """
+    return hierarchy.linkage(term_matrix.matrix.toarray(), method="ward")
+
+
+def check_clustering(result: ClusteringResult, term_matrix: TermMatrix, cluster_all: bool):
+    """
+    Check a clustering against its definition: tools without terms are in no cluster, and the sizes and centroids are
+    those of the labels, with each centroid computed as the mean of the TF-IDF vectors of its tools.
+    :param result: The clustering.
+    :param term_matrix: The tool by term matrix.
+    :param cluster_all: Whether every tool with terms must be in a cluster, as with k-means.
+    """
+    has_terms = term_matrix.matrix.getnnz(axis=1) > 0
+    assert len(result.labels) == len(term_matrix.tool_ids)
+    assert (result.labels[~has_terms] == -1).all()
+    assert not cluster_all or (result.labels[has_terms] >= 0).all()
+    assert (result.sizes == np.bincount(result.labels[result.labels >= 0], minlength=len(result.sizes))).all()
+    vectors = tfidf_vectors(term_matrix)
+    for cluster in range(result.number_of_clusters):
+        centroid = np.asarray(vectors[result.labels == cluster].mean(axis=0)).ravel()
+        assert np.allclose(result.centroids[cluster], centroid), cluster
+
+
+def measure(function: Callable, term_matrix: TermMatrix) -> tuple:
+    """
+    Run a clustering and measure the wall time and the peak of the traced memory.
+    :param function: The clustering function.
+    :param term_matrix: The tool by term matrix.
+    :return: The seconds, the peak memory in MB and the result of the clustering.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(term_matrix)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak / 1e6, result
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the scalable tool clustering")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 30000], help="The numbers of tools.")
+    parser.add_argument("--ward-limit", type=int, default=10000,
+                        help="The largest number of tools clustered with dense Ward linkage.")
+    args: Namespace = parser.parse_args()
+
+    methods = {"dense Ward linkage": ward_dense,
+               "mini-batch k-means": lambda term_matrix: cluster_kmeans(term_matrix=term_matrix, number_of_clusters=50),
+               "kNN graph HDBSCAN": lambda term_matrix: cluster_knn_graph(term_matrix=term_matrix)}
+    print(f"{'tools':>6} {'method':<20} {'seconds':>8} {'peak MB':>8}")
+    for size in args.sizes:
+        term_matrix = combine_term_matrices(build_term_matrices(tools=generate_tools(number_of_tools=size)).values())
+        for name, function in methods.items():
+            if function is ward_dense and size > args.ward_limit:
+                condensed_gigabytes = size * (size - 1) / 2 * 8 / 1e9
+                print(f"{size:>6} {name:<20} {'skipped':>8} (the distance matrix alone needs "
+                      f"{condensed_gigabytes:.1f} GB)")
+                continue
+            seconds, peak, result = measure(function=function, term_matrix=term_matrix)
+            if function is ward_dense:
+                assert result.shape == (size - 1, 4) and result[-1, 3] == size
+            else:
+                check_clustering(result=result, term_matrix=term_matrix, cluster_all=name == "mini-batch k-means")
+            print(f"{size:>6} {name:<20} {seconds:>8.2f} {peak:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
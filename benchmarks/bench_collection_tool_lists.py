@@ -0,0 +1,82 @@
+"""
+Benchmark of creating the tool lists of many collections in one catalogue pass against one pass per collection
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import os
+import sys
+import tempfile
+import time
+
+from biotools_utils import iter_tools, load_stage, save_tool_list
+from synthetic_catalogue import COLLECTIONS, generate_tools
+
+SCRIPTS_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "automatic_domain_assignment_test")
+FIELDS: list = ["name", "description", "collectionID", "topic", "function"]
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the multi-collection batch mode of create_tool_list")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    parser.add_argument("--collections", type=int, nargs="+", default=[1, 3, 10],
+                        help="The numbers of collections, at most the number of synthetic collections.")
+    parser.add_argument("--workers", type=int, default=2, help="The number of processes of the batch mode.")
+    args: Namespace = parser.parse_args()
+
+    # The scripts read the EDAM indexes relative to their own directory
+    sys.path.insert(0, SCRIPTS_DIR)
+    os.chdir(SCRIPTS_DIR)
+    from create_tool_list import _collection_file_names, create_collection_tool_lists
+
+    with tempfile.TemporaryDirectory() as directory:
+        dump_path = os.path.join(directory, "all_tools.json")
+        save_tool_list(tools=generate_tools(number_of_tools=args.tools), path=dump_path)
+        print(f"{args.tools} tools")
+        print(f"{'collections':>11} {'pass per collection s':>22} {'one pass s':>11} "
+              f"{f'one pass, {args.workers} processes s':>24}")
+        for number_of_collections in args.collections:
+            collection_ids = COLLECTIONS[:number_of_collections]
+            output_dir = os.path.join(directory, "collections")
+            file_names = _collection_file_names(collection_ids=collection_ids)
+
+            start = time.perf_counter()
+            expected_counts = {}
+            for collection_id in collection_ids:
+                expected_counts.update(create_collection_tool_lists(
+                    tool_list=iter_tools(path=dump_path, collection_id=collection_id, fields=FIELDS),
+                    collection_ids=[collection_id], output_dir=output_dir))
+            per_collection_seconds = time.perf_counter() - start
+            expected = {collection_id: load_stage(path=os.path.join(output_dir, file_names[collection_id]))
+                        for collection_id in collection_ids}
+
+            # The single pass writes the same tool lists as a pass per collection, with any number of processes
+            timings = []
+            for workers in (1, args.workers):
+                batch_dir = os.path.join(directory, f"collections_{workers}")
+                start = time.perf_counter()
+                counts = create_collection_tool_lists(tool_list=iter_tools(path=dump_path, fields=FIELDS),
+                                                      collection_ids=collection_ids, output_dir=batch_dir,
+                                                      workers=workers)
+                timings.append(time.perf_counter() - start)
+                assert counts == expected_counts, workers
+                for collection_id in collection_ids:
+                    tools_df = load_stage(path=os.path.join(batch_dir, file_names[collection_id]))
+                    assert tools_df.equals(expected[collection_id]), (collection_id, workers)
+            print(f"{number_of_collections:>11} {per_collection_seconds:>22.2f} {timings[0]:>11.2f} {timings[1]:>24.2f}")
+
+
+if __name__ == "__main__":
+    main()
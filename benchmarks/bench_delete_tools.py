@@ -0,0 +1,86 @@
+"""
+Benchmark of the bulk deletion against the local fake bio.tools server
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from fake_biotools_server import FakeBiotoolsServer, make_tools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "other_utilities"))
+from delete_tools import delete_tools  # noqa: E402
+
+
+def bench_delete(number_of_tools: int, workers: int, latency: float, server_limit: float | None) -> dict:
+    """
+    Delete the tools of the fake server, and delete them again to check that the journal skips them.
+    :param number_of_tools: The number of tools to delete.
+    :param workers: The number of concurrent deletions.
+    :param latency: The latency of the fake server in seconds.
+    :param server_limit: The number of requests per second above which the server answers 429.
+    :return: The dictionary with the results.
+    """
+    tools = make_tools(number_of_tools)
+    with FakeBiotoolsServer(tools=tools, latency=latency, max_requests_per_second=server_limit) as server, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        ids_file = os.path.join(tmp_dir, "ids.txt")
+        with open(ids_file, "w") as f:
+            f.write("\n".join(tool["biotoolsID"] for tool in tools))
+        credentials = {"username": "admin", "password": "secret"}
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            delete_tools(account_credentials=credentials, tool_id_list_file=ids_file, workers=workers,
+                         requests_per_second=5.0, max_requests_per_second=1000.0, api_url=server.api_url)
+        elapsed = time.perf_counter() - start
+        deletions = [request for request in server.requests if request[0] == "DELETE"]
+
+        number_of_requests = len(server.requests)
+        with contextlib.redirect_stdout(io.StringIO()):
+            delete_tools(account_credentials=credentials, tool_id_list_file=ids_file, workers=workers,
+                         api_url=server.api_url)
+        rerun_deletions = [request for request in server.requests[number_of_requests:] if request[0] == "DELETE"]
+
+    # Every tool is deleted, and the re-run finds them all in the journal
+    assert len(server.tools) == 0 and len(deletions) >= number_of_tools and len(rerun_deletions) == 0
+    return {"workers": workers, "seconds": elapsed, "remaining_tools": len(server.tools),
+            "delete_requests": len(deletions), "throttled": len(deletions) - number_of_tools,
+            "tools_per_second": number_of_tools / elapsed, "rerun_delete_requests": len(rerun_deletions)}
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the bulk deletion against a local fake bio.tools API")
+    parser.add_argument("--tools", type=int, default=300, help="The number of tools to delete.")
+    parser.add_argument("--latency", type=float, default=0.05, help="The latency of the fake server in seconds.")
+    parser.add_argument("--server-limit", type=float, default=40.0,
+                        help="The number of requests per second above which the fake server answers 429.")
+    args: Namespace = parser.parse_args()
+
+    for workers in (1, 4, 16):
+        result = bench_delete(number_of_tools=args.tools, workers=workers, latency=args.latency,
+                              server_limit=args.server_limit)
+        print(f"{workers:>2} workers: {result['tools_per_second']:.1f} tools/s, {result['throttled']} throttled "
+              f"requests, {result['remaining_tools']} tools left, {result['rerun_delete_requests']} deletions on "
+              f"re-run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark of fitting, saving, loading and batch prediction of the domain classifier
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import os
+import tempfile
+import time
+
+import numpy as np
+
+# The classifier imports scikit-learn when it is first fitted, which should not count towards the fit time
+import sklearn.feature_extraction.text  # noqa: F401
+import sklearn.linear_model  # noqa: F401
+
+from biotools_utils import DomainClassifier, collection_labels, iter_tools
+from synthetic_catalogue import COLLECTIONS, generate_tools
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the domain classifier")
+    parser.add_argument("--dump", help="The tool list dump, e.g. all_tools.json. A synthetic catalogue is used if "
+                                       "not given.")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    parser.add_argument("--domains", nargs="+", default=COLLECTIONS[:4],
+                        help="The domains, which are the collections used as labels.")
+    parser.add_argument("--batch-size", type=int, default=10000, help="The number of tools per prediction batch.")
+    args: Namespace = parser.parse_args()
+
+    tools = list(iter_tools(path=args.dump) if args.dump is not None else generate_tools(number_of_tools=args.tools))
+    labels = collection_labels(tools=tools, domains=args.domains)
+    print(f"{len(tools)} tools, {len(args.domains)} domains")
+
+    for description_features in (0, 2 ** 18):
+        start = time.perf_counter()
+        fitted = DomainClassifier(description_features=description_features).fit(tools=tools, labels=labels)
+        fit_seconds = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "domain_classifier.npz")
+            start = time.perf_counter()
+            fitted.save(path)
+            save_seconds = time.perf_counter() - start
+            size = os.path.getsize(path) / 1e6
+            start = time.perf_counter()
+            classifier = DomainClassifier.load(path)
+            load_seconds = time.perf_counter() - start
+
+        # Warm up, so the throughput excludes the one-time imports and allocations
+        classifier.predict_domains(tools=tools[:100])
+        start = time.perf_counter()
+        domains = classifier.predict_domains(tools=tools, batch_size=args.batch_size)
+        predict_seconds = time.perf_counter() - start
+        print(f"{description_features} description features: fit {fit_seconds:.2f} s, save {save_seconds:.3f} s "
+              f"({size:.1f} MB), load {load_seconds:.3f} s, predict {len(domains) / predict_seconds:,.0f} tools/s")
+
+        # The loaded classifier predicts in batches what the fitted classifier predicts one tool at a time
+        sample = tools[:500]
+        expected = fitted.predict_proba(tools=sample, batch_size=1)
+        assert np.allclose(classifier.predict_proba(tools=sample, batch_size=args.batch_size).to_numpy(),
+                           expected.to_numpy())
+        for tool_id, probabilities in expected.iterrows():
+            assert set(domains[tool_id]) == set(probabilities.index[probabilities >= 0.5]), tool_id
+
+
+if __name__ == "__main__":
+    main()
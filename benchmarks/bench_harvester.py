@@ -0,0 +1,86 @@
+"""
+Benchmark of the tool harvester against the local fake bio.tools server
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import itertools
+import os
+import tempfile
+import time
+
+from biotools_utils import harvest_tools
+from fake_biotools_server import FakeBiotoolsServer, make_tools
+
+
+def bench_harvest(number_of_tools: int, latency: float, workers: int, requests_per_second: float) -> dict:
+    """
+    Harvest the fake catalogue and measure the page rate.
+    :param number_of_tools: The number of tools in the fake catalogue.
+    :param latency: The latency of the fake server in seconds.
+    :param workers: The number of concurrent requests.
+    :param requests_per_second: The request budget.
+    :return: The dictionary with the results.
+    """
+    with FakeBiotoolsServer(tools=make_tools(number_of_tools), latency=latency) as server, \
+            tempfile.TemporaryDirectory() as directory:
+        checkpoint_dir = os.path.join(directory, "pages")
+        start = time.perf_counter()
+        tools = list(harvest_tools(base_url=f"{server.api_url}/t/", checkpoint_dir=checkpoint_dir, workers=workers,
+                                   requests_per_second=requests_per_second, burst=workers))
+        elapsed = time.perf_counter() - start
+        number_of_requests = len(server.requests)
+        # A complete harvest removes its checkpoints
+        assert not os.path.exists(checkpoint_dir)
+
+        # Interrupt a harvest before its last tool, when every page has been requested and written to the checkpoints
+        harvest = harvest_tools(base_url=f"{server.api_url}/t/", checkpoint_dir=checkpoint_dir, workers=workers,
+                                requests_per_second=requests_per_second, burst=workers)
+        for _ in itertools.islice(harvest, number_of_tools - 1):
+            pass
+        harvest.close()
+
+        # Resume from the checkpoints, which should not send any requests
+        resume_start = len(server.requests)
+        start = time.perf_counter()
+        resumed = list(harvest_tools(base_url=f"{server.api_url}/t/", checkpoint_dir=checkpoint_dir))
+        resume_elapsed = time.perf_counter() - start
+        resume_requests = len(server.requests) - resume_start
+
+        # The concurrent harvest yields the catalogue in the order of the API, as does the resumed harvest
+        assert [tool["biotoolsID"] for tool in tools] == [tool["biotoolsID"] for tool in server.tools]
+        assert resumed == tools and resume_requests == 0
+    return {"workers": workers, "pages": number_of_requests, "seconds": elapsed,
+            "pages_per_second": number_of_requests / elapsed, "resume_seconds": resume_elapsed,
+            "resume_requests": resume_requests}
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the tool harvester against a local fake bio.tools API")
+    parser.add_argument("--tools", type=int, default=2000, help="The number of tools in the fake catalogue.")
+    parser.add_argument("--latency", type=float, default=0.05, help="The latency of the fake server in seconds.")
+    parser.add_argument("--rate", type=float, default=1000.0, help="The request budget in requests per second.")
+    args: Namespace = parser.parse_args()
+
+    for workers in (1, 4, 16):
+        result = bench_harvest(number_of_tools=args.tools, latency=args.latency, workers=workers,
+                               requests_per_second=args.rate)
+        print(f"{result['workers']:>2} workers: {result['pages']} pages in {result['seconds']:.2f} s "
+              f"({result['pages_per_second']:.1f} pages/s), resumed in {result['resume_seconds']:.3f} s "
+              f"with {result['resume_requests']} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark of the domain assignment pipeline with and without the stage cache
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from biotools_utils import StageCache, ToolStore, convert_json_dump, load_categories, load_stage, load_term_matrix, \
+    save_stage, save_tool_list, score_tools
+from synthetic_catalogue import COLLECTIONS, RESOURCES_DIR, generate_tools
+
+CATEGORIES_PATH: str = os.path.join(RESOURCES_DIR, "term_categories.json")
+
+
+def build_catalogue(path: str, dump_path: str):
+    """
+    Convert the dump to the tool store shared by all collections.
+    :param path: The output directory.
+    :param dump_path: The path of the dump.
+    """
+    convert_json_dump(json_path=dump_path, store_path=path)
+
+
+def build_tool_list(path: str, catalogue_path: str, collection_id: str):
+    """
+    Create the tool list of a collection from the tool store.
+    :param path: The output directory.
+    :param catalogue_path: The path of the tool store.
+    :param collection_id: The collection ID.
+    """
+    store = ToolStore.load(catalogue_path)
+    codes, offsets = store.term_codes("collectionID")
+    tool_rows = np.repeat(np.arange(len(store)), np.diff(offsets))
+    rows = np.unique(tool_rows[np.asarray(codes) == store.vocabularies["collectionID"].index(collection_id)])
+    save_stage(df=pd.DataFrame({"Topics": [store.get_terms("topic", row) for row in rows],
+                                "Operations": [store.get_terms("operation", row) for row in rows]},
+                               index=pd.Index([store.get_string("biotoolsID", row) for row in rows], name="ID")),
+               path=path)
+
+
+def build_counts(path: str, tool_list_path: str, categories_path: str):
+    """
+    Score the tools of a tool list against the term categories.
+    :param path: The output directory.
+    :param tool_list_path: The path of the tool list.
+    :param categories_path: The path of the term categories.
+    """
+    scores = score_tools(term_matrices=[load_term_matrix(path=tool_list_path, column="Topics"),
+                                        load_term_matrix(path=tool_list_path, column="Operations")],
+                         categories=load_categories(categories_path))
+    save_stage(df=scores, path=path)
+
+
+def run_pipeline(cache: StageCache, dump_path: str, collection_id: str) -> pd.DataFrame:
+    """
+    Run the stages of a collection through the cache.
+    :param cache: The stage cache.
+    :param dump_path: The path of the dump.
+    :param collection_id: The collection ID.
+    :return: The counts.
+    """
+    catalogue_path = cache.run(stage="catalogue", build=build_catalogue, inputs=[dump_path])
+    tool_list_path = cache.run(stage="tool_list", build=build_tool_list, inputs=[catalogue_path],
+                               params={"collection_id": collection_id})
+    return load_stage(path=cache.run(stage="counts", build=build_counts, inputs=[tool_list_path, CATEGORIES_PATH]))
+
+
+def run_uncached(directory: str, dump_path: str, collection_id: str) -> pd.DataFrame:
+    """
+    Run the stages of a collection without the cache.
+    :param directory: The directory of the stage outputs.
+    :param dump_path: The path of the dump.
+    :param collection_id: The collection ID.
+    :return: The counts.
+    """
+    catalogue_path, tool_list_path, counts_path = (os.path.join(directory, stage)
+                                                   for stage in ("catalogue", "tool_list", "counts"))
+    build_catalogue(path=catalogue_path, dump_path=dump_path)
+    build_tool_list(path=tool_list_path, catalogue_path=catalogue_path, collection_id=collection_id)
+    build_counts(path=counts_path, tool_list_path=tool_list_path, categories_path=CATEGORIES_PATH)
+    return load_stage(path=counts_path)
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the stage cache of the domain assignment pipeline")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    args: Namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        dump_path = os.path.join(directory, "all_tools.json")
+        save_tool_list(tools=generate_tools(number_of_tools=args.tools), path=dump_path)
+        print(f"{args.tools} tools, {os.path.getsize(dump_path) / 1e6:.0f} MB dump")
+
+        runs = [("cold cache", COLLECTIONS[0]), ("warm cache, same collection", COLLECTIONS[0]),
+                ("warm cache, second collection", COLLECTIONS[1]), ("new process, same collection", COLLECTIONS[0])]
+        cache = StageCache(cache_dir=os.path.join(directory, "cache"))
+        for name, collection_id in runs:
+            if name.startswith("new process"):
+                # Reopening the cache only reads its index and the remembered hashes of the input files
+                cache.close()
+                cache = StageCache(cache_dir=os.path.join(directory, "cache"))
+            start = time.perf_counter()
+            hits = len(cache.stats.hits)
+            counts = run_pipeline(cache=cache, dump_path=dump_path, collection_id=collection_id)
+            print(f"{name:<30} {time.perf_counter() - start:>7.3f} s, {len(cache.stats.hits) - hits} of 3 stages "
+                  f"reused")
+            # A reused stage gives the same counts as running the stages again
+            expected = run_uncached(directory=os.path.join(directory, "uncached", collection_id), dump_path=dump_path,
+                                    collection_id=collection_id)
+            assert counts.equals(expected), name
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark of the local search index against scanning the tool list with string operations
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import math
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+from biotools_utils import EdamIndex, SearchIndex
+from synthetic_catalogue import COLLECTIONS, RESOURCES_DIR, generate_tools
+
+QUERIES: List[str] = ["protein identification", "mass spectrometry", "sequence alignment", "gene expression analysis",
+                      "variant calling", "metabolomics", "peptide", "rna-seq quantification"]
+
+
+def scan_search(tools: List[dict], query: str, k: int = 10) -> List[str]:
+    """
+    Find the tools whose name or description contain the words of a query, as when scanning the dump.
+    :param tools: The tools.
+    :param query: The query.
+    :param k: The largest number of tools.
+    :return: The tool IDs with the most matching words.
+    """
+    words = query.lower().split()
+    matches = []
+    for tool in tools:
+        text = f"{tool['name']} {tool.get('description') or ''}".lower()
+        count = sum(word in text for word in words)
+        if count > 0:
+            matches.append((count, tool["biotoolsID"]))
+    return [tool_id for _, tool_id in sorted(matches, reverse=True)[:k]]
+
+
+def check_results(index: SearchIndex, reference: SearchIndex, k: int):
+    """
+    Check that an index finds the same tools with the same scores as a reference index for the benchmark queries.
+    :param index: The index.
+    :param reference: The reference index, e.g. built from scratch.
+    :param k: The number of results compared, e.g. the number of tools to compare all matches.
+    """
+    for query in QUERIES:
+        for options in ({}, {"require_all": True}, {"collections": COLLECTIONS[:1]}, {"topics": ["topic_3361"]}):
+            results = dict(index.search(query, k=k, **options))
+            expected = dict(reference.search(query, k=k, **options))
+            assert results.keys() == expected.keys(), (query, options)
+            assert all(math.isclose(score, expected[tool_id], rel_tol=1e-6) for tool_id, score in results.items()), \
+                (query, options)
+
+
+def time_queries(search: Callable[[str], object], repeats: int) -> float:
+    """
+    Time the benchmark queries.
+    :param search: The function running a query.
+    :param repeats: The number of times each query is run.
+    :return: The mean time of a query in microseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for query in QUERIES:
+            search(query)
+    return (time.perf_counter() - start) / (repeats * len(QUERIES)) * 1e6
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the local search index")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    parser.add_argument("--repeats", type=int, default=50, help="The number of times each query is run.")
+    args: Namespace = parser.parse_args()
+
+    tools = list(generate_tools(number_of_tools=args.tools))
+    edam_index = EdamIndex.load(os.path.join(RESOURCES_DIR, "topic_index.json"),
+                                os.path.join(RESOURCES_DIR, "operation_index.json"))
+    start = time.perf_counter()
+    index = SearchIndex.build(tools=tools, edam_index=edam_index)
+    print(f"{args.tools} tools, index built in {time.perf_counter() - start:.2f} s")
+    built = index
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        index.save(directory)
+        save_seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(directory, file_name)) for file_name in os.listdir(directory))
+        start = time.perf_counter()
+        index = SearchIndex.load(directory, edam_index=edam_index)
+        print(f"saved in {save_seconds:.2f} s ({size / 1e6:.1f} MB), memory-mapped in "
+              f"{(time.perf_counter() - start) * 1e3:.1f} ms")
+        check_results(index=index, reference=built, k=len(tools))
+
+        print(f"{'search':<40} {'us per query':>12}")
+        scan_repeats = max(args.repeats // 25, 1)
+        print(f"{'string scan':<40} {time_queries(lambda query: scan_search(tools, query), scan_repeats):>12.0f}")
+        print(f"{'index':<40} {time_queries(lambda query: index.search(query), args.repeats):>12.0f}")
+        print(f"{'index, all words':<40} "
+              f"{time_queries(lambda query: index.search(query, require_all=True), args.repeats):>12.0f}")
+        print(f"{'index, collection filter':<40} "
+              f"{time_queries(lambda query: index.search(query, collections=COLLECTIONS[:1]), args.repeats):>12.0f}")
+        # Topic filters match the sub-topics of the topic as well
+        print(f"{'index, topic filter':<40} "
+              f"{time_queries(lambda query: index.search(query, topics=['topic_3361']), args.repeats):>12.0f}")
+
+        updated = [dict(tool, description=f"{tool['description']} Updated.") for tool in tools[:100]]
+        start = time.perf_counter()
+        index.add(updated)
+        add_seconds = time.perf_counter() - start
+        print(f"{'index, 100 tools updated':<40} "
+              f"{time_queries(lambda query: index.search(query), args.repeats):>12.0f}")
+        # Adding tools to the index, before and after merging the segments, gives the index built from scratch
+        rebuilt = SearchIndex.build(tools=updated + tools[len(updated):], edam_index=edam_index)
+        check_results(index=index, reference=rebuilt, k=len(tools))
+        start = time.perf_counter()
+        index.save(directory)
+        print(f"updated 100 tools in {add_seconds * 1e3:.1f} ms, merged and saved in "
+              f"{time.perf_counter() - start:.2f} s")
+        check_results(index=index, reference=rebuilt, k=len(tools))
+        check_results(index=SearchIndex.load(directory, edam_index=edam_index), reference=rebuilt, k=len(tools))
+
+        # Removing tools, without merging the segments, gives the index built from the remaining tools as well
+        removed_ids = {tool["biotoolsID"] for tool in tools[len(tools) // 3:]}
+        index.remove(removed_ids)
+        remaining = [tool for tool in updated + tools[len(updated):] if tool["biotoolsID"] not in removed_ids]
+        check_results(index=index, reference=SearchIndex.build(tools=remaining, edam_index=edam_index), k=len(tools))
+
+
+if __name__ == "__main__":
+    main()
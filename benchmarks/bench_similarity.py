@@ -0,0 +1,130 @@
+"""
+Benchmark of the sparse tool similarity and duplicate detection against dense pairwise distances
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import copy
+import random
+import time
+
+import numpy as np
+from scipy.spatial.distance import pdist
+
+from biotools_utils import build_term_matrices, combine_term_matrices, find_duplicates, iter_tools, pair_similarity, \
+    similar_tools, top_k_similar
+from synthetic_catalogue import generate_tools
+
+
+def add_near_duplicates(tools: list, number_of_duplicates: int, seed: int = 7) -> set:
+    """
+    Append copies of random tools, each with one topic or operation removed.
+    :param tools: The tools, extended in place.
+    :param number_of_duplicates: The number of copies.
+    :param seed: The random seed.
+    :return: The set of the (original ID, copy ID) pairs.
+    """
+    rng = random.Random(seed)
+    pairs = set()
+    for number, tool in enumerate(rng.sample(tools, number_of_duplicates)):
+        duplicate = copy.deepcopy(tool)
+        duplicate["biotoolsID"] = f"duplicate_tool_{number:06d}"
+        if duplicate["topic"]:
+            duplicate["topic"].pop()
+        elif duplicate["function"] and duplicate["function"][0]["operation"]:
+            duplicate["function"][0]["operation"].pop()
+        tools.append(duplicate)
+        pairs.add((tool["biotoolsID"], duplicate["biotoolsID"]))
+    return pairs
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the sparse tool similarity")
+    parser.add_argument("--dump", help="The tool list dump, e.g. all_tools.json. A synthetic catalogue is used if "
+                                       "not given.")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    parser.add_argument("--dense-tools", type=int, default=3000, help="The number of tools for the dense baseline.")
+    parser.add_argument("--workers", type=int, default=2, help="The number of processes for the top-k search.")
+    args: Namespace = parser.parse_args()
+
+    tools = list(iter_tools(path=args.dump) if args.dump is not None else generate_tools(number_of_tools=args.tools))
+    duplicates = sorted(add_near_duplicates(tools=tools, number_of_duplicates=len(tools) // 100))
+    term_matrix = combine_term_matrices(build_term_matrices(tools=tools, term_types=("topic", "operation", "data",
+                                                                                      "format")).values())
+    print(f"{len(term_matrix.tool_ids)} tools, {len(term_matrix.terms)} terms, {term_matrix.matrix.nnz} annotations")
+
+    dense = term_matrix.matrix[:args.dense_tools].toarray().astype(bool)
+    start = time.perf_counter()
+    distances = pdist(dense, "jaccard")
+    dense_seconds = time.perf_counter() - start
+    rows, other_rows = np.triu_indices(len(dense), k=1)
+    has_terms = dense[rows].any(axis=1) & dense[other_rows].any(axis=1)
+    dense_similarities = pair_similarity(term_matrix=term_matrix, rows=rows, other_rows=other_rows)
+    assert np.allclose(dense_similarities[has_terms], 1 - distances[has_terms]), "pair_similarity differs from pdist"
+    full_gigabytes = len(term_matrix.tool_ids) ** 2 * 8 / 1e9
+    print(f"dense pdist, {args.dense_tools} tools:  {dense_seconds:.2f} s "
+          f"(the full {len(term_matrix.tool_ids)} x {len(term_matrix.tool_ids)} matrix needs {full_gigabytes:.1f} GB)")
+
+    reference = None
+    for workers in sorted({1, args.workers}):
+        start = time.perf_counter()
+        neighbours = top_k_similar(term_matrix=term_matrix, k=10, metric="jaccard", workers=workers)
+        reference = neighbours if reference is None else reference
+        assert neighbours["Similarity"].equals(reference["Similarity"]), ("top_k_similar differs", workers)
+        print(f"top-10 of all tools, {workers} process(es): {time.perf_counter() - start:.2f} s, "
+              f"{len(neighbours)} pairs")
+
+    # No tool of the dense subset is more similar to a tool than its most similar neighbour
+    dense_best = np.zeros(len(dense))
+    np.maximum.at(dense_best, rows, np.where(has_terms, dense_similarities, 0))
+    np.maximum.at(dense_best, other_rows, np.where(has_terms, dense_similarities, 0))
+    top_similarities = reference.groupby("ID", sort=False)["Similarity"].max()
+    assert all(dense_best[row] <= top_similarities.get(tool_id, 0) + 1e-9
+               for row, tool_id in enumerate(term_matrix.tool_ids[:len(dense)])), "top_k_similar missed a tool"
+    neighbour_rows = {tool_id: row for row, tool_id in enumerate(term_matrix.tool_ids)}
+    assert np.allclose(reference["Similarity"], pair_similarity(
+        term_matrix=term_matrix, rows=reference["ID"].map(neighbour_rows).to_numpy(),
+        other_rows=reference["SimilarID"].map(neighbour_rows).to_numpy())), "top_k_similar similarities differ"
+
+    start = time.perf_counter()
+    similar = [similar_tools(term_matrix=term_matrix, tool_id=tool_id, k=10) for tool_id in term_matrix.tool_ids[:100]]
+    print(f"similar_tools:                {(time.perf_counter() - start) * 10:.1f} ms per query")
+    for tool_id, tool_similar in zip(term_matrix.tool_ids, similar):
+        assert np.allclose(tool_similar["Similarity"], reference.loc[reference["ID"] == tool_id, "Similarity"]), \
+            ("similar_tools differs from top_k_similar", tool_id)
+
+    start = time.perf_counter()
+    found = find_duplicates(term_matrix=term_matrix, threshold=0.8)
+    seconds = time.perf_counter() - start
+    found_pairs = {tuple(sorted(pair)) for pair in zip(found["ID"], found["SimilarID"])}
+    found_similarities = pair_similarity(term_matrix=term_matrix, rows=found["ID"].map(neighbour_rows).to_numpy(),
+                                         other_rows=found["SimilarID"].map(neighbour_rows).to_numpy())
+    assert np.allclose(found["Similarity"], found_similarities) and (found_similarities >= 0.8).all(), \
+        "find_duplicates found a pair below the threshold"
+
+    # The recall is measured on the injected pairs which are above the threshold and have enough terms
+    rows = {tool_id: row for row, tool_id in enumerate(term_matrix.tool_ids)}
+    pairs = np.array([(rows[tool_id], rows[duplicate_id]) for tool_id, duplicate_id in duplicates])
+    sizes = np.diff(term_matrix.matrix.indptr)
+    expected = (pair_similarity(term_matrix=term_matrix, rows=pairs[:, 0], other_rows=pairs[:, 1]) >= 0.8) & \
+        (sizes[pairs[:, 1]] >= 3)
+    recall = sum(tuple(sorted(pair)) in found_pairs for pair, is_expected in zip(duplicates, expected)
+                 if is_expected) / expected.sum()
+    print(f"find_duplicates:              {seconds:.2f} s, {len(found)} pairs, {recall:.0%} of the "
+          f"{expected.sum()} injected duplicates with Jaccard >= 0.8 found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark of the streaming snapshot diff against loading and comparing both snapshots in memory
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+from biotools_utils import diff_snapshots, save_tool_list
+from synthetic_catalogue import COLLECTIONS, LICENSES, generate_tools
+
+
+def diff_in_memory(old_path: str, new_path: str) -> Tuple[int, int, int]:
+    """
+    Compare two snapshots by loading both with `json.load` and comparing the tools as dictionaries.
+    :param old_path: The path of the older snapshot.
+    :param new_path: The path of the newer snapshot.
+    :return: The number of added, removed and modified tools.
+    """
+    with open(old_path, "r") as f:
+        old = {tool["biotoolsID"]: tool for tool in json.load(f)}
+    with open(new_path, "r") as f:
+        new = {tool["biotoolsID"]: tool for tool in json.load(f)}
+    return (len(new.keys() - old.keys()), len(old.keys() - new.keys()),
+            sum(old[tool_id] != new[tool_id] for tool_id in old.keys() & new.keys()))
+
+
+def measure(function: Callable[[], object]) -> Tuple[float, float, object]:
+    """
+    Measure the time of a function, and its peak memory in a second call.
+    :param function: The function.
+    :return: The time in seconds, the peak of the allocated memory in MB and the result of the function.
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1e6, result
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the snapshot diff")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools per snapshot.")
+    parser.add_argument("--changed", type=float, default=0.05, help="The fraction of tools changed between snapshots.")
+    args: Namespace = parser.parse_args()
+
+    rng = random.Random(0)
+    old = list(generate_tools(number_of_tools=args.tools))
+    new = [dict(tool) for tool in old if rng.random() >= args.changed / 5]
+    for tool in rng.sample(new, int(len(new) * args.changed)):
+        tool["description"] += " Updated."
+        tool["license"] = rng.choice(LICENSES)
+        tool["collectionID"] = sorted(set(tool["collectionID"]) | {rng.choice(COLLECTIONS)})
+        tool["topic"] = tool["topic"][1:]
+    new.extend(dict(tool, biotoolsID=f"new_{tool['biotoolsID']}")
+               for tool in generate_tools(number_of_tools=int(args.tools * args.changed / 5), seed=1))
+
+    with tempfile.TemporaryDirectory() as directory:
+        old_path, new_path = os.path.join(directory, "old.json"), os.path.join(directory, "new.json")
+        save_tool_list(tools=old, path=old_path)
+        save_tool_list(tools=new, path=new_path)
+        del old, new
+        print(f"{args.tools} tools, snapshots of {os.path.getsize(old_path) / 1e6:.0f} and "
+              f"{os.path.getsize(new_path) / 1e6:.0f} MB")
+
+        changelog_path = os.path.join(directory, "changelog.jsonl")
+        added, removed, modified = diff_in_memory(old_path=old_path, new_path=new_path)
+        print(f"{added} added, {removed} removed and {modified} modified tools")
+        print(f"{'method':<32} {'seconds':>8} {'peak MB':>8}")
+        seconds, peak, _ = measure(lambda: diff_in_memory(old_path=old_path, new_path=new_path))
+        print(f"{'json.load and dictionaries':<32} {seconds:>8.2f} {peak:>8.0f}")
+        for run_size in (10000, 2000):
+            seconds, peak, diff = measure(lambda: diff_snapshots(old_path=old_path, new_path=new_path,
+                                                                 changelog_path=changelog_path, run_size=run_size))
+            assert (diff.added, diff.removed, diff.modified) == (added, removed, modified), \
+                ("diff_snapshots differs from diff_in_memory", run_size, diff)
+            with open(changelog_path, "r") as f:
+                assert sum(1 for _ in f) == added + removed + modified, ("changelog lines", run_size)
+            print(f"{f'streaming diff, runs of {run_size}':<32} {seconds:>8.2f} {peak:>8.0f}")
+        print(f"changelog of {os.path.getsize(changelog_path) / 1e3:.0f} kB")
+
+
+if __name__ == "__main__":
+    main()
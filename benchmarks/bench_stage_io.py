@@ -0,0 +1,130 @@
+"""
+Benchmark of the pipeline stages handing data over through stage tables against Excel spreadsheets
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import os
+import tempfile
+import time
+from typing import Dict, List, Set, Tuple
+
+import pandas as pd
+
+from biotools_utils import TermMatrix, export_excel, load_categories, load_stage, load_term_matrix, save_stage, \
+    score_tools, term_matrix_from_strings
+from synthetic_catalogue import RESOURCES_DIR, _load_index, generate_tools
+
+TOPIC_REGEX: str = r"\((topic_[0-9]{4})\)"
+OPERATION_REGEX: str = r"\((operation_[0-9]{4})\)"
+
+
+def tool_list(number_of_tools: int) -> pd.DataFrame:
+    """
+    Create the tool list of `create_tool_list` with the terms of each tool as lists.
+    :param number_of_tools: The number of synthetic tools.
+    :return: The dataframe indexed by the tool ID.
+    """
+    rows = [(tool["biotoolsID"], tool["name"], tool["description"],
+             [topic["uri"].rsplit("/", 1)[1] for topic in tool["topic"]],
+             [operation["uri"].rsplit("/", 1)[1] for function in tool["function"]
+              for operation in function["operation"]])
+            for tool in generate_tools(number_of_tools=number_of_tools)]
+    return pd.DataFrame(rows, columns=["ID", "Name", "Description", "Topics", "Operations"]).set_index("ID")
+
+
+def annotations(term_matrix: TermMatrix) -> Set[Tuple[str, str]]:
+    """
+    Get the annotations of a term matrix, which do not depend on the order of its rows and columns.
+    :param term_matrix: The tool by term matrix.
+    :return: The set of the (tool ID, term) pairs.
+    """
+    rows, columns = term_matrix.matrix.nonzero()
+    return {(str(term_matrix.tool_ids[row]), term_matrix.terms[column]) for row, column in zip(rows, columns)}
+
+
+def run_excel(tools_df: pd.DataFrame, directory: str, term_names: Dict[str, str]) -> Tuple[pd.DataFrame, List[set]]:
+    """
+    Run the stages the way the scripts used to, with each stage reading the spreadsheet of the previous stage and
+    parsing the terms back out of the 'Name (term_id)' lines.
+    :param tools_df: The tool list.
+    :param directory: The directory of the files.
+    :param term_names: The dictionary with the term ID and its name.
+    :return: The scores of the tools and the annotations of the topic and operation term matrices.
+    """
+    tool_list_path = os.path.join(directory, "biotools_proteomics.xlsx")
+    export_excel(df=tools_df, path=tool_list_path, term_names=term_names)
+
+    # count_dataframe_terms
+    df = pd.read_excel(tool_list_path, index_col=0).fillna("")
+    scores = score_tools(term_matrices=[term_matrix_from_strings(column=df["Topics"], regex=TOPIC_REGEX),
+                                        term_matrix_from_strings(column=df["Operations"], regex=OPERATION_REGEX)],
+                         categories=load_categories(os.path.join(RESOURCES_DIR, "term_categories.json")))
+    df.assign(**{name: scores[name].to_numpy() for name in scores.columns}).to_excel(
+        os.path.join(directory, "Biotools_proteomics_count.xlsx"))
+
+    # count_term_frequency and clustering_test
+    df = pd.read_excel(tool_list_path, index_col=0).fillna("")
+    return scores, [annotations(term_matrix_from_strings(column=df[column], regex=regex))
+                    for column, regex in (("Topics", TOPIC_REGEX), ("Operations", OPERATION_REGEX))]
+
+
+def run_stages(tools_df: pd.DataFrame, directory: str) -> Tuple[pd.DataFrame, List[set]]:
+    """
+    Run the stages with stage tables, building the term matrices directly from the term lists.
+    :param tools_df: The tool list.
+    :param directory: The directory of the stage tables.
+    :return: The scores of the tools and the annotations of the topic and operation term matrices.
+    """
+    tool_list_path = os.path.join(directory, "biotools_proteomics")
+    save_stage(df=tools_df, path=tool_list_path)
+
+    # count_dataframe_terms
+    scores = score_tools(term_matrices=[load_term_matrix(path=tool_list_path, column="Topics"),
+                                        load_term_matrix(path=tool_list_path, column="Operations")],
+                         categories=load_categories(os.path.join(RESOURCES_DIR, "term_categories.json")))
+    df = load_stage(path=tool_list_path)
+    save_stage(df=df.assign(**{name: scores[name].to_numpy() for name in scores.columns}),
+               path=os.path.join(directory, "Biotools_proteomics_count"))
+
+    # count_term_frequency and clustering_test
+    return scores, [annotations(load_term_matrix(path=tool_list_path, column=column))
+                    for column in ("Topics", "Operations")]
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the stage tables against Excel spreadsheets")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 30000], help="The numbers of tools.")
+    args: Namespace = parser.parse_args()
+
+    term_names = {term: term_data["name"] for file_name in ("topic_index.json", "operation_index.json")
+                  for term, term_data in _load_index(file_name).items()}
+    print(f"{'tools':>6} {'Excel s':>8} {'stages s':>9} {'speed-up':>9}")
+    for size in args.sizes:
+        tools_df = tool_list(number_of_tools=size)
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            excel_scores, excel_annotations = run_excel(tools_df=tools_df, directory=directory, term_names=term_names)
+            excel_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            stage_scores, stage_annotations = run_stages(tools_df=tools_df, directory=directory)
+            stage_seconds = time.perf_counter() - start
+        assert stage_annotations == excel_annotations, ("the term matrices differ", size)
+        assert (stage_scores.to_numpy() == excel_scores.to_numpy()).all(), ("the scores differ", size)
+        print(f"{size:>6} {excel_seconds:>8.2f} {stage_seconds:>9.3f} {excel_seconds / stage_seconds:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark of the startup cost of each subcommand of the command line interface, measured with `python -X importtime`
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from biotools_utils import iter_tools, save_tool_list
+from fake_biotools_server import FakeBiotoolsServer, make_tools
+from synthetic_catalogue import generate_tools, write_license_cache
+
+REPOSITORY_DIR: str = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+SCRIPTS_DIR: str = os.path.join(REPOSITORY_DIR, "automatic_domain_assignment_test")
+HEAVY_PACKAGES: Tuple[str, ...] = ("numpy", "scipy", "pandas", "sklearn", "matplotlib", "requests")
+# Loading every public name of the package, which imports all its modules as `import biotools_utils` used to
+ALL_MODULES_IMPORT: str = "import biotools_utils; [getattr(biotools_utils, name) for name in biotools_utils.__all__]"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def parse_import_times(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Parse the output of `python -X importtime`.
+    :param stderr: The standard error of the process.
+    :return: The total import time in milliseconds, and the dictionary with the import time in milliseconds of each
+        heavy package imported, which is the sum of the own import times of its modules, without its dependencies.
+    """
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+        own, cumulative, indent, name = match.groups()
+        # Only the top level imports, as the cumulative times of the nested imports are included in them
+        if indent == "":
+            total += int(cumulative) / 1000
+        package = name.split(".")[0]
+        if package in HEAVY_PACKAGES:
+            packages[package] = packages.get(package, 0.0) + int(own) / 1000
+    return total, packages
+
+
+def measure(arguments: List[str], cwd: str, repeat: int) -> dict:
+    """
+    Run a command in a new interpreter with `-X importtime`, and keep the fastest of the runs.
+    :param arguments: The arguments of the interpreter after `-X importtime`.
+    :param cwd: The working directory.
+    :param repeat: The number of runs.
+    :return: The dictionary with the wall time in seconds, the total import time and the heavy packages.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPOSITORY_DIR, os.environ.get("PYTHONPATH")])))
+    best: Optional[dict] = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=cwd, env=env,
+                                 capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+        if process.returncode != 0:
+            raise RuntimeError(f"{' '.join(arguments)} failed:\n{process.stderr[-2000:]}")
+        import_ms, packages = parse_import_times(process.stderr)
+        if best is None or seconds < best["seconds"]:
+            best = {"seconds": seconds, "import_ms": import_ms, "packages": packages}
+    return best
+
+
+def subcommands(api_url: str) -> List[Tuple[str, List[str]]]:
+    """
+    Get the arguments of a run of each subcommand on the small files written by `main`.
+    :param api_url: The base URL of the fake API.
+    :return: The list with the subcommand and its arguments.
+    """
+    return [("harvest", ["harvest", "harvested.json", "--base-url", f"{api_url}/t/", "--rate", "1000"]),
+            ("sync", ["sync", "catalogue", "--base-url", f"{api_url}/t/", "--rate", "1000"]),
+            ("convert", ["convert", "old.json", "store"]),
+            ("validate", ["validate", "old.json", "issues.jsonl", "--license-cache", "licenses", "--offline",
+                          "--workers", "1"]),
+            ("diff", ["diff", "old.json", "new.json", "--changelog", "changelog.jsonl"]),
+            ("index", ["index", "old.json", "search_index"]),
+            ("search", ["search", "search_index", "sequence alignment", "--topic", "topic_0080"]),
+            ("suggest", ["suggest", "old.json", "suggestions.jsonl", "--cache", "suggester.npz", "--workers", "1"])]
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the startup cost of each subcommand of the command line interface")
+    parser.add_argument("--tools", type=int, default=200, help="The number of synthetic tools of the dumps.")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of runs of each command.")
+    parser.add_argument("--output", help="The JSON file for the results, to compare them between commits.")
+    args: Namespace = parser.parse_args()
+
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as directory, FakeBiotoolsServer(tools=make_tools(args.tools)) as server:
+        tools = list(generate_tools(number_of_tools=args.tools))
+        save_tool_list(tools=tools, path=os.path.join(directory, "old.json"))
+        for tool in tools[::10]:
+            tool["description"] += " Updated."
+        save_tool_list(tools=tools, path=os.path.join(directory, "new.json"))
+        write_license_cache(cache_dir=os.path.join(directory, "licenses"))
+
+        results["python"] = measure(arguments=["-c", "pass"], cwd=directory, repeat=args.repeat)
+        results["all modules"] = measure(arguments=["-c", ALL_MODULES_IMPORT], cwd=directory, repeat=args.repeat)
+        results["package"] = measure(arguments=["-c", "import biotools_utils"], cwd=directory, repeat=args.repeat)
+        for name, arguments in subcommands(api_url=server.api_url):
+            results[f"{name} --help"] = measure(arguments=["-m", "biotools_utils", name, "--help"], cwd=directory,
+                                                repeat=args.repeat)
+            results[name] = measure(arguments=["-m", "biotools_utils", *arguments], cwd=directory, repeat=args.repeat)
+
+        # The counting script, run on a copy of its inputs so the stage table and the cache are not written to the
+        # repository. Importing it must only load what the counting needs.
+        for file_name in ("Resources/topic_index.json", "Resources/operation_index.json",
+                          "TestFiles/biotools_proteomics.xlsx"):
+            os.makedirs(os.path.join(directory, os.path.dirname(file_name)), exist_ok=True)
+            shutil.copy(os.path.join(SCRIPTS_DIR, file_name), os.path.join(directory, file_name))
+        results["count_term_frequency import"] = measure(
+            arguments=["-c", f"import sys; sys.path.insert(0, {SCRIPTS_DIR!r}); import count_term_frequency"],
+            cwd=directory, repeat=args.repeat)
+        results["count_term_frequency"] = measure(arguments=[os.path.join(SCRIPTS_DIR, "count_term_frequency.py")],
+                                                  cwd=directory, repeat=args.repeat)
+
+        # The subcommands must give the same results as the modules they load
+        harvested = [tool["biotoolsID"] for tool in iter_tools(path=os.path.join(directory, "harvested.json"))]
+        assert harvested == [tool["biotoolsID"] for tool in server.tools], "the harvest differs from the server"
+        with open(os.path.join(directory, "changelog.jsonl"), "r") as f:
+            assert sum(1 for _ in f) == len(tools[::10]), "the changelog differs from the updated tools"
+    assert not results["package"]["packages"], ("importing the package loads", results["package"]["packages"])
+    assert results["count_term_frequency import"]["packages"].keys() <= {"numpy", "scipy"}, \
+        ("importing count_term_frequency loads", results["count_term_frequency import"]["packages"])
+
+    print(f"{'command':<28} {'wall s':>7} {'import ms':>10}  heavy packages (import ms)")
+    for name, result in results.items():
+        packages = ", ".join(f"{package} {milliseconds:.0f}" for package, milliseconds in result["packages"].items())
+        print(f"{name:<28} {result['seconds']:>7.3f} {result['import_ms']:>10.1f}  {packages or '-'}")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
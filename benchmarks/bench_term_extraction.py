@@ -0,0 +1,71 @@
+"""
+Benchmark of the single-pass term extraction against one extract_terms call per term type and tool
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import time
+
+from biotools_utils import extract_all_terms, extract_terms, iter_tools
+from synthetic_catalogue import generate_tools
+
+
+def extract_per_tool(tools: list) -> dict:
+    """
+    Extract the terms the way `create_tool_list` used to, with one `extract_terms` call per term type and tool.
+    :param tools: The tools.
+    :return: The dictionary with the tool ID and the dictionary with the term type and the term IDs.
+    """
+    terms: dict = {}
+    for tool in tools:
+        tool_terms: dict = {}
+        for term_type in ("Topic", "Operation", "Data", "Format"):
+            extracted = list(extract_terms(tools=[tool], term_type=term_type).values())
+            extracted = extracted[0] if len(extracted) > 0 else []
+            tool_terms[term_type] = list(set(term["uri"].replace("http://edamontology.org/", "")
+                                             for term in extracted))
+        terms[tool["biotoolsID"]] = tool_terms
+    return terms
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the single-pass term extraction")
+    parser.add_argument("--dump", help="The tool list dump, e.g. all_tools.json. A synthetic catalogue is used if "
+                                       "not given.")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    args: Namespace = parser.parse_args()
+
+    tools = list(iter_tools(path=args.dump) if args.dump is not None else generate_tools(number_of_tools=args.tools))
+
+    start = time.perf_counter()
+    per_tool = extract_per_tool(tools=tools)
+    per_tool_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = extract_all_terms(tools=tools)
+    batch_seconds = time.perf_counter() - start
+
+    # Both extractions must give the same terms
+    for row, tool_id in enumerate(batch.tool_ids):
+        for term_type, terms in per_tool[tool_id].items():
+            assert set(batch.get_terms(term_type, row)) == set(terms), (tool_id, term_type)
+
+    print(f"{len(tools)} tools")
+    print(f"4 x extract_terms per tool: {per_tool_seconds:.3f} s")
+    print(f"extract_all_terms:          {batch_seconds:.3f} s ({per_tool_seconds / batch_seconds:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark of loading the columnar tool store against json.load and read_excel
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import SUPPRESS, ArgumentParser, Namespace
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import TYPE_CHECKING
+
+from biotools_utils import build_term_matrices, iter_tools, save_tool_list
+from synthetic_catalogue import generate_tools
+
+if TYPE_CHECKING:
+    from biotools_utils.tool_store import ToolStore
+
+EXCEL_FILE: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "automatic_domain_assignment_test",
+                               "TestFiles", "biotools_proteomics.xlsx")
+
+
+def check_store(store: "ToolStore", dump: str):
+    """
+    Check that a tool store holds the same tools, strings and terms as the JSON dump it was converted from.
+    :param store: The tool store.
+    :param dump: The path of the JSON dump.
+    """
+    tools = list(iter_tools(path=dump))
+    assert len(store) == len(tools), "the number of tools differs"
+    for column in ("biotoolsID", "name", "description"):
+        assert store.strings(column) == [tool.get(column) or "" for tool in tools], ("the strings differ", column)
+    assert all(store.get_terms("collectionID", row) == list(dict.fromkeys(tool.get("collectionID") or []))
+               for row, tool in enumerate(tools)), "the collections differ"
+    for column, term_matrix in build_term_matrices(tools=tools).items():
+        store_matrix = store.term_matrix(column, terms=term_matrix.terms)
+        assert list(store_matrix.tool_ids) == list(term_matrix.tool_ids), ("the tool IDs differ", column)
+        assert (store_matrix.matrix != term_matrix.matrix).nnz == 0, ("the term matrices differ", column)
+
+
+def _load(kind: str, path: str):
+    """
+    Load a file in the current process and print the load time and the peak memory as JSON.
+    :param kind: The loader, 'json', 'excel', 'store' or 'baseline' for only importing the modules.
+    :param path: The path of the file.
+    """
+    import pandas as pd
+    from biotools_utils.tool_store import ToolStore
+
+    start = time.perf_counter()
+    if kind == "baseline":
+        pass
+    elif kind == "json":
+        with open(path, "r") as f:
+            json.load(f)
+    elif kind == "excel":
+        pd.read_excel(path)
+    else:
+        store = ToolStore.load(path)
+        store.term_codes("topic")
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+
+
+def _measure(kind: str, path: str) -> dict:
+    """
+    Load a file in a fresh interpreter, so the memory measurements do not influence each other.
+    :param kind: The loader, 'json', 'excel', 'store' or 'baseline'.
+    :param path: The path of the file.
+    :return: The dictionary with the load time and the peak memory.
+    """
+    output = subprocess.run([sys.executable, __file__, "--load", kind, path], check=True, capture_output=True,
+                            text=True, env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark loading the columnar tool store")
+    parser.add_argument("--dump", help="The tool list dump to convert. A synthetic catalogue is used if not given.")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    parser.add_argument("--load", nargs=2, metavar=("KIND", "PATH"), help=SUPPRESS)
+    args: Namespace = parser.parse_args()
+    if args.load is not None:
+        _load(kind=args.load[0], path=args.load[1])
+        return
+
+    from biotools_utils.tool_store import convert_json_dump
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dump = args.dump
+        if dump is None:
+            dump = os.path.join(tmp_dir, "all_tools.json")
+            save_tool_list(tools=generate_tools(number_of_tools=args.tools), path=dump)
+
+        start = time.perf_counter()
+        store = convert_json_dump(json_path=dump, store_path=os.path.join(tmp_dir, "store"))
+        print(f"Converted {len(store)} tools in {time.perf_counter() - start:.2f} s")
+        check_store(store=store, dump=dump)
+
+        baseline_kb = _measure(kind="baseline", path="")["peak_rss_kb"]
+        for kind, path in (("json", dump), ("store", store.path), ("excel", EXCEL_FILE)):
+            result = _measure(kind=kind, path=path)
+            print(f"{kind:>5}: {result['seconds'] * 1000:9.1f} ms, peak RSS "
+                  f"+{(result['peak_rss_kb'] - baseline_kb) / 1024:.1f} MB ({os.path.basename(path)})")
+
+
+if __name__ == "__main__":
+    main()
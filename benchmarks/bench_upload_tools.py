@@ -0,0 +1,112 @@
+"""
+Benchmark of the bulk upload of tools against a local fake bio.tools API
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from biotools_utils import EdamIndex, parse_license_list, save_json_lines
+from biotools_utils.tool_validator import ToolValidator
+from fake_biotools_server import FakeBiotoolsServer
+from synthetic_catalogue import RESOURCES_DIR, generate_tools, write_license_cache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "other_utilities"))
+from upload_tools import upload_tools  # noqa: E402
+
+INVALID_EVERY: int = 50
+
+
+def bench_upload(number_of_tools: int, workers: int, latency: float, server_limit: float | None,
+                 validator: ToolValidator) -> dict:
+    """
+    Upload tools to the fake server, where half of them exist, and upload them again to check that the journal skips
+    them.
+    :param number_of_tools: The number of tools to upload.
+    :param workers: The number of concurrent uploads.
+    :param latency: The latency of the fake server in seconds.
+    :param server_limit: The number of requests per second above which the server answers 429.
+    :param validator: The validator.
+    :return: The dictionary with the results.
+    """
+    tools = list(generate_tools(number_of_tools=number_of_tools))
+    for tool in tools[::INVALID_EVERY]:
+        del tool["homepage"]
+    existing = [dict(tool, description="An older description of the tool.") for tool in tools[::2]]
+    with FakeBiotoolsServer(tools=existing, latency=latency, max_requests_per_second=server_limit) as server, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        tools_file = os.path.join(tmp_dir, "tools.jsonl")
+        save_json_lines(tools=tools, path=tools_file)
+        credentials = {"username": "admin", "password": "secret"}
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            statuses = upload_tools(account_credentials=credentials, tools_file=tools_file, validator=validator,
+                                    workers=workers, requests_per_second=5.0, max_requests_per_second=1000.0,
+                                    api_url=server.api_url)
+        elapsed = time.perf_counter() - start
+        uploads = [request for request in server.requests if request[0] in ("PUT", "POST")][1:]
+
+        number_of_requests = len(server.requests)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            rerun = upload_tools(account_credentials=credentials, tools_file=tools_file, validator=validator,
+                                 workers=workers, api_url=server.api_url)
+        rerun_requests = len(server.requests) - number_of_requests
+        uploaded = {tool["biotoolsID"]: tool for tool in server.tools}
+        matching = sum(uploaded.get(tool["biotoolsID"]) == tool for tool in tools)
+
+    return {"seconds": elapsed, "statuses": statuses, "requests": len(uploads),
+            "tools_per_second": (statuses["created"] + statuses["updated"]) / elapsed, "matching": matching,
+            "rerun_skipped": rerun["skipped"], "rerun_requests": rerun_requests}
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the bulk upload against a local fake bio.tools API")
+    parser.add_argument("--tools", type=int, default=300, help="The number of tools to upload.")
+    parser.add_argument("--latency", type=float, default=0.05, help="The latency of the fake server in seconds.")
+    parser.add_argument("--server-limit", type=float, default=40.0,
+                        help="The number of requests per second above which the fake server answers 429.")
+    args: Namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_license_cache(cache_dir=tmp_dir)
+        validator = ToolValidator(licenses=parse_license_list(cache_dir=tmp_dir, offline=True),
+                                  index=EdamIndex.load(os.path.join(RESOURCES_DIR, "topic_index.json"),
+                                                       os.path.join(RESOURCES_DIR, "operation_index.json")),
+                                  check_schema=True)
+
+    for workers in (1, 4, 16):
+        result = bench_upload(number_of_tools=args.tools, workers=workers, latency=args.latency,
+                              server_limit=args.server_limit, validator=validator)
+        statuses = result["statuses"]
+        invalid = len(range(0, args.tools, INVALID_EVERY))
+        assert statuses["invalid"] == invalid and statuses["created"] + statuses["updated"] == args.tools - invalid, \
+            ("the upload statuses differ", workers, statuses)
+        assert result["matching"] == args.tools - invalid, ("the server records differ from the valid tools", workers)
+        assert result["rerun_skipped"] == args.tools - invalid and result["rerun_requests"] == 0, \
+            ("the re-run did not skip the uploaded tools", workers)
+        print(f"{workers:>2} workers: {result['tools_per_second']:.1f} tools/s, {statuses['created']} created, "
+              f"{statuses['updated']} updated, {statuses['invalid']} invalid, {result['requests']} requests, "
+              f"{result['matching']} of {args.tools} records on the server, {result['rerun_skipped']} skipped and "
+              f"{result['rerun_requests']} requests on re-run")
+
+
+if __name__ == "__main__":
+    main()
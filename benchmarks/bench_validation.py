@@ -0,0 +1,103 @@
+"""
+Benchmark of the catalogue validation against an ad-hoc validation loop
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import json
+import os
+import tempfile
+import time
+
+from biotools_utils import EdamIndex, LicensesData, extract_terms, parse_license_list, save_tool_list
+from biotools_utils.tool_validator import ToolValidator, validate_catalogue
+from synthetic_catalogue import RESOURCES_DIR, generate_tools, write_license_cache
+
+
+def validate_ad_hoc(path: str, licenses: LicensesData) -> int:
+    """
+    Validate the tools the ad-hoc way, loading the whole dump and extracting the terms one tool at a time.
+    :param path: The path of the dump.
+    :param licenses: The SPDX license data.
+    :return: The number of tools with issues.
+    """
+    known_terms: set = set()
+    for file_name in ("topic_index.json", "operation_index.json"):
+        with open(os.path.join(RESOURCES_DIR, file_name), "r") as f:
+            known_terms.update(json.load(f)["data"])
+    with open(path, "r") as f:
+        tools = json.load(f)
+
+    tools_with_issues = 0
+    for tool in tools:
+        issues = []
+        if tool.get("license") and tool["license"] not in ("Proprietary", "Other", "Not licensed"):
+            if tool["license"] not in licenses.licenses_list or tool["license"] in list(licenses.deprecated_licenses):
+                issues.append(tool["license"])
+        for term_type in ("Topic", "Operation"):
+            for terms in extract_terms(tools=[tool], term_type=term_type).values():
+                issues.extend(term["uri"] for term in terms
+                              if term["uri"].replace("http://edamontology.org/", "") not in known_terms)
+        tools_with_issues += len(issues) > 0
+    return tools_with_issues
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the catalogue validation")
+    parser.add_argument("--dump", help="The tool list dump, e.g. all_tools.json. A synthetic catalogue is used if "
+                                       "not given.")
+    parser.add_argument("--tools", type=int, default=30000, help="The number of synthetic tools.")
+    parser.add_argument("--license-cache", help="The SPDX license list cache directory. A small fixture is used if "
+                                                "not given.")
+    args: Namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dump = args.dump
+        if dump is None:
+            dump = os.path.join(tmp_dir, "all_tools.json")
+            save_tool_list(tools=generate_tools(number_of_tools=args.tools), path=dump)
+        license_cache = args.license_cache
+        if license_cache is None:
+            license_cache = os.path.join(tmp_dir, "spdx")
+            write_license_cache(cache_dir=license_cache)
+
+        licenses = parse_license_list(cache_dir=license_cache, offline=True)
+        index = EdamIndex.load(os.path.join(RESOURCES_DIR, "topic_index.json"),
+                               os.path.join(RESOURCES_DIR, "operation_index.json"))
+        validator = ToolValidator(licenses=licenses, index=index)
+
+        start = time.perf_counter()
+        ad_hoc_issues = validate_ad_hoc(path=dump, licenses=licenses)
+        ad_hoc_seconds = time.perf_counter() - start
+        print(f"ad-hoc loop:     {ad_hoc_seconds:.2f} s, {ad_hoc_issues} tools with issues")
+
+        reference = None
+        for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            report = validate_catalogue(path=dump, report_path=os.path.join(tmp_dir, "report.jsonl"),
+                                        validator=validator, workers=workers)
+            with open(os.path.join(tmp_dir, "report.jsonl"), "r") as f:
+                report_lines = sorted(f)
+            reference = report_lines if reference is None else reference
+            assert report_lines == reference, ("the report differs from the report of one process", workers)
+            # The validator also checks the non-standard licenses and the data and format terms, which the synthetic
+            # catalogue does not have, so only there it finds the same tools as the ad-hoc loop
+            assert report.tools_with_issues >= ad_hoc_issues if args.dump is not None else \
+                report.tools_with_issues == ad_hoc_issues, ("the tools with issues differ", workers)
+            print(f"{workers:>2} processes:    {report.seconds:.2f} s, {report.tools_per_second:,.0f} tools/s, "
+                  f"{report.tools_with_issues} of {report.tools} tools with issues {dict(report.issues)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Local stand-in for the bio.tools API used by the benchmarks
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAGE_SIZE: int = 10
+
+
+class FakeBiotoolsServer:
+    """
+    A threaded HTTP server serving a tool list in the same pages as the bio.tools API.
+
+    Every request is recorded with its method, path and start time, so the benchmarks can compute the request rate
+    and concurrency seen by the server.
+    """
+
+    def __init__(self, tools: list, latency: float = 0.0, max_requests_per_second: float | None = None):
+        """
+        Create the server on a free local port.
+        :param tools: The tools served by the fake API.
+        :param latency: The time in seconds each request takes.
+        :param max_requests_per_second: Answer with 429 when more requests arrive within the last second, or None to
+            never throttle.
+        """
+        self.tools: list = tools
+        self.latency: float = latency
+        self.max_requests_per_second: float | None = max_requests_per_second
+        self.requests: list = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def api_url(self) -> str:
+        """
+        The base URL of the fake API.
+        """
+        return f"http://127.0.0.1:{self._server.server_port}/api"
+
+    def record(self, method: str, path: str) -> bool:
+        """
+        Record a request.
+        :param method: The HTTP method.
+        :param path: The request path.
+        :return: True if the request should be throttled.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.requests.append((method, path, now))
+            if self.max_requests_per_second is None:
+                return False
+            recent = sum(1 for _, _, start in reversed(self.requests[-1000:]) if now - start < 1.0)
+            return recent > self.max_requests_per_second
+
+    def delete_tool(self, tool_id: str) -> bool:
+        """
+        Delete a tool.
+        :param tool_id: The tool ID.
+        :return: True if the tool existed.
+        """
+        with self._lock:
+            number_of_tools = len(self.tools)
+            self.tools = [tool for tool in self.tools if tool["biotoolsID"] != tool_id]
+            return len(self.tools) < number_of_tools
+
+    def upsert_tool(self, tool: dict, create: bool) -> bool:
+        """
+        Create or update a tool.
+        :param tool: The tool.
+        :param create: Whether to create the tool, else it is updated.
+        :return: True if the tool was created or updated, and False if it already exists when creating it or does not
+            exist when updating it.
+        """
+        with self._lock:
+            positions = [i for i, existing in enumerate(self.tools) if existing["biotoolsID"] == tool["biotoolsID"]]
+            if create == (len(positions) > 0):
+                return False
+            if create:
+                self.tools.append(tool)
+            else:
+                self.tools[positions[0]] = tool
+            return True
+
+    def list_page(self, page: int, sort: str | None = None, order: str = "desc") -> dict | None:
+        """
+        Get a page of the tool list.
+        :param page: The page number, starting from 1.
+        :param sort: The field to sort the tools by, or None to keep the order of the tools.
+        :param order: The sort order, 'asc' or 'desc'.
+        :return: The page, or None if it does not exist.
+        """
+        with self._lock:
+            tools = list(self.tools)
+        if sort is not None:
+            tools.sort(key=lambda tool: tool.get(sort) or "", reverse=order == "desc")
+        number_of_pages = max(1, -(-len(tools) // PAGE_SIZE))
+        if page < 1 or page > number_of_pages:
+            return None
+        return {"count": len(tools),
+                "next": f"?page={page + 1}" if page < number_of_pages else None,
+                "previous": f"?page={page - 1}" if page > 1 else None,
+                "list": tools[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]}
+
+    def __enter__(self) -> "FakeBiotoolsServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _make_handler(fake_server: FakeBiotoolsServer) -> type:
+    """
+    Create the request handler class bound to the fake server.
+    :param fake_server: The fake server.
+    :return: The request handler class.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status: int, body: dict | None, etag: bool = False):
+            data = json.dumps(body).encode("utf-8") if body is not None else b""
+            tag = f'"{hashlib.sha1(data).hexdigest()}"'
+            if etag and self.headers.get("If-None-Match") == tag:
+                status, data = 304, b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if etag:
+                self.send_header("ETag", tag)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_json(self) -> dict | None:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length)) if length > 0 else None
+
+        def _authorized(self) -> bool:
+            if self.headers.get("Authorization") != "Token fake-token":
+                self._read_json()
+                self._send_json(401, {"detail": "Authentication credentials were not provided."})
+                return False
+            return True
+
+        def _throttled(self, method: str) -> bool:
+            throttled = fake_server.record(method, self.path)
+            if throttled:
+                self._read_json()
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                time.sleep(fake_server.latency)
+            return throttled
+
+        def do_POST(self):
+            if self._throttled("POST"):
+                return
+            body = self._read_json() or {}
+            if urlparse(self.path).path == "/api/rest-auth/login/":
+                if body.get("username") and body.get("password"):
+                    self._send_json(200, {"key": "fake-token"})
+                else:
+                    self._send_json(400, {"non_field_errors": ["Unable to log in."]})
+            elif urlparse(self.path).path == "/api/tool/":
+                if self.headers.get("Authorization") != "Token fake-token":
+                    self._send_json(401, {"detail": "Authentication credentials were not provided."})
+                elif "biotoolsID" not in body:
+                    self._send_json(400, {"biotoolsID": ["This field is required."]})
+                elif fake_server.upsert_tool(tool=body, create=True):
+                    self._send_json(201, body)
+                else:
+                    self._send_json(400, {"biotoolsID": ["tool with this biotoolsID already exists."]})
+            else:
+                self._send_json(404, {"detail": "Not found."})
+
+        def do_PUT(self):
+            if self._throttled("PUT") or not self._authorized():
+                return
+            parts = urlparse(self.path).path.strip("/").split("/")
+            body = self._read_json() or {}
+            if len(parts) != 3 or parts[:2] != ["api", "tool"] or body.get("biotoolsID") != parts[2]:
+                self._send_json(400, {"biotoolsID": ["The biotoolsID does not match the URL."]})
+            elif fake_server.upsert_tool(tool=body, create=False):
+                self._send_json(200, body)
+            else:
+                self._send_json(404, {"detail": "Not found."})
+
+        def do_DELETE(self):
+            if self._throttled("DELETE"):
+                return
+            parts = urlparse(self.path).path.strip("/").split("/")
+            if self.headers.get("Authorization") != "Token fake-token":
+                self._send_json(401, {"detail": "Authentication credentials were not provided."})
+            elif len(parts) == 3 and parts[:2] == ["api", "tool"] and fake_server.delete_tool(parts[2]):
+                self._send_json(204, None)
+            else:
+                self._send_json(404, {"detail": "Not found."})
+
+        def do_GET(self):
+            if self._throttled("GET"):
+                return
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/api/t":
+                self._send_json(404, {"detail": "Not found."})
+                return
+            query = parse_qs(url.query)
+            page = fake_server.list_page(page=int(query.get("page", ["1"])[0]), sort=query.get("sort", [None])[0],
+                                         order=query.get("ord", ["desc"])[0])
+            if page is None:
+                self._send_json(404, {"detail": "Invalid page."})
+            else:
+                self._send_json(200, page, etag=True)
+
+    return Handler
+
+
+def make_tools(number_of_tools: int) -> list:
+    """
+    Create minimal tool records for the fake server.
+    :param number_of_tools: The number of tools.
+    :return: The list of tools.
+    """
+    return [{"biotoolsID": f"tool_{i:06d}", "name": f"Tool {i}", "description": f"Description of tool {i}.",
+             "collectionID": [], "topic": [], "function": [], "lastUpdate": f"2022-01-01T00:00:{i % 60:02d}Z"}
+            for i in range(number_of_tools)]
@@ -0,0 +1,516 @@
+"""
+Benchmark suite timing the hot paths of the package on seeded synthetic catalogues, with the results kept per commit
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import SUPPRESS, ArgumentParser, Namespace
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from biotools_utils import save_tool_list
+from synthetic_catalogue import LICENSE_SPELLINGS, LICENSE_TEXTS, RESOURCES_DIR, SPDX_LIST_SIZE, generate_tools, \
+    write_license_cache
+
+BENCHMARKS_DIR: str = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_FILE: str = os.path.join(BENCHMARKS_DIR, "results.jsonl")
+TERM_TYPES: tuple = ("Topic", "Operation", "Data", "Format")
+# The cases set up their inputs from the fixtures and return the timed function, which returns the number of tools
+CASES: Dict[str, Callable[[str], Callable[[], int]]] = {}
+
+
+def case(function: Callable[[str], Callable[[], int]]) -> Callable[[str], Callable[[], int]]:
+    """
+    Register a benchmark case under the name of its function.
+    :param function: The function taking the fixture directory and returning the timed function.
+    :return: The function.
+    """
+    CASES[function.__name__] = function
+    return function
+
+
+def _load_tools(fixture_dir: str) -> list:
+    """
+    Load the tools of the catalogue fixture.
+    :param fixture_dir: The directory of the fixtures.
+    :return: The list of tools.
+    """
+    from biotools_utils import iter_tools
+
+    return list(iter_tools(path=os.path.join(fixture_dir, "all_tools.json")))
+
+
+def _load_edam_index(fixture_dir: str):
+    """
+    Load the EDAM index of the topics and operations, cached in the fixture directory.
+    :param fixture_dir: The directory of the fixtures.
+    :return: The EDAM index.
+    """
+    from biotools_utils import EdamIndex
+
+    return EdamIndex.load(os.path.join(RESOURCES_DIR, "topic_index.json"),
+                          os.path.join(RESOURCES_DIR, "operation_index.json"),
+                          cache_path=os.path.join(fixture_dir, "edam_index.npz"))
+
+
+@case
+def stream_dump(fixture_dir: str) -> Callable[[], int]:
+    """
+    Stream the tools of the catalogue dump.
+    """
+    from biotools_utils import iter_tools
+
+    return lambda: sum(1 for _ in iter_tools(path=os.path.join(fixture_dir, "all_tools.json")))
+
+
+@case
+def extract_terms(fixture_dir: str) -> Callable[[], int]:
+    """
+    Extract each term type from the tools with `extract_terms`.
+    """
+    from biotools_utils import extract_terms as extract
+
+    tools = _load_tools(fixture_dir)
+
+    def run() -> int:
+        for term_type in TERM_TYPES:
+            extract(tools=tools, term_type=term_type)
+        return len(tools)
+    return run
+
+
+@case
+def extract_all_terms(fixture_dir: str) -> Callable[[], int]:
+    """
+    Extract all term types from the tools in one pass.
+    """
+    from biotools_utils import extract_all_terms as extract
+
+    tools = _load_tools(fixture_dir)
+    return lambda: len(extract(tools=tools).tool_ids)
+
+
+@case
+def encode_terms(fixture_dir: str) -> Callable[[], int]:
+    """
+    One-hot encode the extracted topics and operations as sparse term matrices.
+    """
+    from biotools_utils import build_term_matrices, extract_all_terms
+
+    extracted = extract_all_terms(tools=_load_tools(fixture_dir))
+    return lambda: len(build_term_matrices(tools=extracted)["topic"].tool_ids)
+
+
+@case
+def encode_stage(fixture_dir: str) -> Callable[[], int]:
+    """
+    One-hot encode the topics and operations of the tool list stage table, as `clustering_test.process_df`.
+    """
+    from biotools_utils import load_term_matrix
+
+    stage_path = os.path.join(fixture_dir, "tool_list")
+
+    # The one-hot encoding of `clustering_test.process_df`
+    def run() -> int:
+        topics = load_term_matrix(path=stage_path, column="Topics")
+        load_term_matrix(path=stage_path, column="Operations")
+        return len(topics.tool_ids)
+    return run
+
+
+@case
+def count_terms(fixture_dir: str) -> Callable[[], int]:
+    """
+    Count the topics and operations rolled up the EDAM tree, as `count_term_frequency.count_terms`.
+    """
+    from biotools_utils import count_term_hierarchy, load_term_matrix, top_terms_per_level
+
+    index = _load_edam_index(fixture_dir)
+    term_matrices = [load_term_matrix(path=os.path.join(fixture_dir, "tool_list"), column=column)
+                     for column in ("Topics", "Operations")]
+
+    # The counting of `count_term_frequency.count_terms`
+    def run() -> int:
+        for term_matrix in term_matrices:
+            top_terms_per_level(counts=count_term_hierarchy(term_matrix=term_matrix, index=index), top_n=5)
+        return len(term_matrices[0].tool_ids)
+    return run
+
+
+@case
+def score_domains(fixture_dir: str) -> Callable[[], int]:
+    """
+    Score the tools against the term categories of the Resources directory.
+    """
+    from biotools_utils import load_categories, load_term_matrix, score_tools
+
+    categories = load_categories(path=os.path.join(RESOURCES_DIR, "term_categories.json"))
+    term_matrices = [load_term_matrix(path=os.path.join(fixture_dir, "tool_list"), column=column)
+                     for column in ("Topics", "Operations")]
+    return lambda: len(score_tools(term_matrices=term_matrices, categories=categories))
+
+
+@case
+def parse_licenses(fixture_dir: str) -> Callable[[], int]:
+    """
+    Parse the SPDX license list fixture and classify the license of every tool.
+    """
+    from biotools_utils import parse_license_list
+
+    tools = _load_tools(fixture_dir)
+    # Every fourth tool has a free-text license, as entered in bio.tools
+    texts = [LICENSE_TEXTS[row % len(LICENSE_TEXTS)] if row % 4 == 0 else tool.get("license") or ""
+             for row, tool in enumerate(tools)]
+
+    def run() -> int:
+        licenses = parse_license_list(cache_dir=os.path.join(fixture_dir, "licenses"), offline=True)
+        return len(licenses.classify(texts))
+    return run
+
+
+@case
+def validate_tools(fixture_dir: str) -> Callable[[], int]:
+    """
+    Validate the schema, licenses and EDAM terms of every tool in one process.
+    """
+    from biotools_utils import ToolValidator, parse_license_list
+
+    tools = _load_tools(fixture_dir)
+    validator = ToolValidator(licenses=parse_license_list(cache_dir=os.path.join(fixture_dir, "licenses"),
+                                                          offline=True),
+                              index=_load_edam_index(fixture_dir), check_schema=True)
+
+    def run() -> int:
+        for tool in tools:
+            validator.validate(tool)
+        return len(tools)
+    return run
+
+
+@case
+def convert_store(fixture_dir: str) -> Callable[[], int]:
+    """
+    Convert the catalogue dump to a columnar tool store.
+    """
+    from biotools_utils import convert_json_dump
+
+    store_dir = tempfile.mkdtemp(dir=fixture_dir)
+    return lambda: len(convert_json_dump(json_path=os.path.join(fixture_dir, "all_tools.json"),
+                                         store_path=os.path.join(store_dir, "store")))
+
+
+@case
+def similar_tools(fixture_dir: str) -> Callable[[], int]:
+    """
+    Find the 10 most similar tools of every tool by their topics and operations.
+    """
+    from biotools_utils import combine_term_matrices, load_term_matrix, top_k_similar
+
+    term_matrix = combine_term_matrices(load_term_matrix(path=os.path.join(fixture_dir, "tool_list"), column=column)
+                                        for column in ("Topics", "Operations"))
+
+    def run() -> int:
+        top_k_similar(term_matrix=term_matrix, k=10)
+        return len(term_matrix.tool_ids)
+    return run
+
+
+@case
+def build_search_index(fixture_dir: str) -> Callable[[], int]:
+    """
+    Build the search index of the tools.
+    """
+    from biotools_utils import SearchIndex
+
+    tools = _load_tools(fixture_dir)
+    index = _load_edam_index(fixture_dir)
+    return lambda: len(SearchIndex.build(tools=tools, edam_index=index))
+
+
+@case
+def suggest_annotations(fixture_dir: str) -> Callable[[], int]:
+    """
+    Suggest EDAM terms for every tool from its name and description.
+    """
+    from biotools_utils import AnnotationSuggester
+
+    tools = _load_tools(fixture_dir)
+    suggester = AnnotationSuggester.load(os.path.join(RESOURCES_DIR, "topic_index.json"),
+                                         os.path.join(RESOURCES_DIR, "operation_index.json"),
+                                         cache_path=os.path.join(fixture_dir, "annotation_suggester.npz"))
+
+    def run() -> int:
+        for tool in tools:
+            suggester.suggest_tool(tool=tool)
+        return len(tools)
+    return run
+
+
+@case
+def diff_snapshots(fixture_dir: str) -> Callable[[], int]:
+    """
+    Compare the catalogue dump with a newer snapshot.
+    """
+    from biotools_utils import diff_snapshots as diff
+
+    def run() -> int:
+        result = diff(old_path=os.path.join(fixture_dir, "all_tools.json"),
+                      new_path=os.path.join(fixture_dir, "all_tools_new.json"),
+                      changelog_path=os.path.join(fixture_dir, "changelog.jsonl"))
+        return result.added + result.removed + result.modified + result.unchanged
+    return run
+
+
+def write_fixtures(fixture_dir: str, number_of_tools: int, seed: int):
+    """
+    Write the inputs of the cases: the catalogue dump, a newer snapshot of it, the tool list stage table and the SPDX
+    license list.
+    :param fixture_dir: The directory of the fixtures.
+    :param number_of_tools: The number of synthetic tools.
+    :param seed: The random seed of the catalogue.
+    """
+    import pandas as pd
+    from biotools_utils import extract_all_terms, save_stage
+
+    tools = list(generate_tools(number_of_tools=number_of_tools, seed=seed))
+    save_tool_list(tools=tools, path=os.path.join(fixture_dir, "all_tools.json"))
+    write_license_cache(cache_dir=os.path.join(fixture_dir, "licenses"), number_of_licenses=SPDX_LIST_SIZE)
+
+    # The tool list of `create_tool_list`, with the terms of each tool as lists
+    terms = extract_all_terms(tools=tools)
+    tool_list = pd.DataFrame({"ID": terms.tool_ids, "Name": [tool["name"] for tool in tools],
+                              "Description": [tool["description"] for tool in tools]}).set_index("ID")
+    tool_list["Topics"] = [terms.get_terms("Topic", row) for row in range(len(tools))]
+    tool_list["Operations"] = [terms.get_terms("Operation", row) for row in range(len(tools))]
+    save_stage(df=tool_list, path=os.path.join(fixture_dir, "tool_list"))
+
+    # A newer snapshot with 1 % of the tools removed, 1 % added and 5 % modified
+    changes = number_of_tools // 100
+    added = [dict(tool, biotoolsID=f"added_{tool['biotoolsID']}")
+             for tool in generate_tools(number_of_tools=changes, seed=seed + 1)]
+    new_tools = [dict(tool, description=f"{tool['description']} Updated.") if row % 20 == 0 else tool
+                 for row, tool in enumerate(tools[changes:])] + added
+    save_tool_list(tools=new_tools, path=os.path.join(fixture_dir, "all_tools_new.json"))
+
+
+def _annotations(term_matrix) -> Set[Tuple[str, str]]:
+    """
+    Get the annotations of a term matrix, which do not depend on the order of its rows and columns.
+    :param term_matrix: The tool by term matrix.
+    :return: The set of the (tool ID, term) pairs.
+    """
+    rows, columns = term_matrix.matrix.nonzero()
+    return {(str(term_matrix.tool_ids[row]), term_matrix.terms[column]) for row, column in zip(rows, columns)}
+
+
+def check_cases(fixture_dir: str):
+    """
+    Check that the optimised paths timed by the cases agree with the reference paths they replace on the fixtures:
+    the single-pass and the per-type term extraction, the term matrices of the extracted terms and of the stage table,
+    the tool store and the dump, and the streaming and the in-memory snapshot diff. It also checks that the common
+    spellings of licenses resolve to their SPDX license IDs.
+    :param fixture_dir: The directory of the fixtures.
+    """
+    from biotools_utils import build_term_matrices, convert_json_dump, diff_snapshots as diff, extract_all_terms, \
+        extract_terms as extract, load_term_matrix, parse_license_list
+
+    licenses = parse_license_list(cache_dir=os.path.join(fixture_dir, "licenses"), offline=True)
+    resolved = {text: classification.license_id
+                for text, classification in zip(LICENSE_SPELLINGS, licenses.classify(LICENSE_SPELLINGS))}
+    assert resolved == LICENSE_SPELLINGS, {text: license_id for text, license_id in resolved.items()
+                                           if license_id != LICENSE_SPELLINGS[text]}
+
+    tools = _load_tools(fixture_dir)
+    extracted = extract_all_terms(tools=tools)
+    for term_type in TERM_TYPES:
+        per_type = extract(tools=tools, term_type=term_type)
+        assert all(set(extracted.get_terms(term_type, row)) ==
+                   {term["uri"].rsplit("/", 1)[-1] for term in per_type.get(tool_id, [])}
+                   for row, tool_id in enumerate(extracted.tool_ids)), ("extract_all_terms differs", term_type)
+
+    term_matrices = build_term_matrices(tools=extracted)
+    for column, term_type in (("Topics", "topic"), ("Operations", "operation")):
+        stage_matrix = load_term_matrix(path=os.path.join(fixture_dir, "tool_list"), column=column)
+        assert _annotations(stage_matrix) == _annotations(term_matrices[term_type]), ("load_term_matrix differs",
+                                                                                      column)
+
+    with tempfile.TemporaryDirectory(dir=fixture_dir) as check_dir:
+        store = convert_json_dump(json_path=os.path.join(fixture_dir, "all_tools.json"),
+                                  store_path=os.path.join(check_dir, "store"))
+        assert store.strings("biotoolsID") == [tool["biotoolsID"] for tool in tools], "the tool store differs"
+
+        old_path = os.path.join(fixture_dir, "all_tools.json")
+        new_path = os.path.join(fixture_dir, "all_tools_new.json")
+        result = diff(old_path=old_path, new_path=new_path, changelog_path=os.path.join(check_dir, "changelog.jsonl"))
+        with open(old_path, "r") as f:
+            old = {tool["biotoolsID"]: tool for tool in json.load(f)}
+        with open(new_path, "r") as f:
+            new = {tool["biotoolsID"]: tool for tool in json.load(f)}
+        assert (result.added, result.removed, result.modified) == \
+            (len(new.keys() - old.keys()), len(old.keys() - new.keys()),
+             sum(old[tool_id] != new[tool_id] for tool_id in old.keys() & new.keys())), "diff_snapshots differs"
+
+
+def _memory_kb() -> Tuple[int, int]:
+    """
+    Get the current and the peak resident set size of the process.
+
+    On Linux, the peak is read from `/proc/self/status`, which unlike `getrusage` does not include the memory of the
+    benchmark process which started this interpreter. Elsewhere both are the peak from `getrusage`.
+    :return: The current and the peak resident set size in kB.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            status = dict(line.split(":", 1) for line in f)
+        return int(status["VmRSS"].split()[0]), int(status["VmHWM"].split()[0])
+    except (OSError, KeyError):
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak_kb, peak_kb
+
+
+def _reset_peak_memory():
+    """
+    Reset the peak resident set size of the process to the current one, where Linux supports it.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _run_case(name: str, fixture_dir: str):
+    """
+    Set up and run a case in the current process, and print the time and memory as JSON.
+    :param name: The name of the case.
+    :param fixture_dir: The directory of the fixtures.
+    """
+    run = CASES[name](fixture_dir)
+    _reset_peak_memory()
+    rss_before_kb, _ = _memory_kb()
+    start = time.perf_counter()
+    number_of_tools = run()
+    seconds = time.perf_counter() - start
+    _, peak_kb = _memory_kb()
+    print(json.dumps({"seconds": seconds, "tools": number_of_tools, "peak_mb": (peak_kb - rss_before_kb) / 1024,
+                      "rss_mb": peak_kb / 1024}))
+
+
+def measure(name: str, fixture_dir: str, repeat: int) -> dict:
+    """
+    Run a case in fresh interpreters, so the cases do not share imports, caches or memory, and keep the fastest run.
+
+    The peak memory is the growth of the peak resident set size while the timed function runs, on top of its inputs.
+    :param name: The name of the case.
+    :param fixture_dir: The directory of the fixtures.
+    :param repeat: The number of runs.
+    :return: The dictionary with the seconds, the number of tools, the peak memory and the resident set size in MB.
+    """
+    best: Optional[dict] = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, __file__, "--run-case", name, fixture_dir], check=True,
+                                capture_output=True, text=True,
+                                env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}).stdout
+        result = json.loads(output.splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+def git_revision() -> str:
+    """
+    Get the commit of the working tree, with '-dirty' if it has uncommitted changes.
+    :return: The short commit hash, or 'unknown' outside a git repository.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BENCHMARKS_DIR,
+                                check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if status else commit
+
+
+def read_results(path: str, revision: str) -> Dict[tuple, dict]:
+    """
+    Read the latest results of a commit from the results file.
+    :param path: The JSON Lines results file.
+    :param revision: The commit, or a prefix of it.
+    :return: The dictionary with the number of tools and the case, and the result.
+    """
+    results: Dict[tuple, dict] = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, "r") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["revision"].startswith(revision):
+                results[(record["size"], record["case"])] = record
+    return results
+
+
+def main():
+    parser = ArgumentParser(description="Time the hot paths of the package on synthetic catalogues, and keep the "
+                                        "results per commit")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="The numbers of tools of the synthetic catalogues.")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES), help="The cases to run.")
+    parser.add_argument("--seed", type=int, default=42, help="The random seed of the catalogues.")
+    parser.add_argument("--repeat", type=int, default=1, help="The number of runs of each case, keeping the fastest.")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_FILE,
+                        help="The JSON Lines file the results are appended to.")
+    parser.add_argument("--compare", metavar="COMMIT", help="Compare the times with the results of this commit.")
+    parser.add_argument("--run-case", nargs=2, metavar=("CASE", "FIXTURE_DIR"), help=SUPPRESS)
+    args: Namespace = parser.parse_args()
+    if args.run_case is not None:
+        _run_case(name=args.run_case[0], fixture_dir=args.run_case[1])
+        return
+
+    revision = git_revision()
+    baseline = read_results(path=args.results, revision=args.compare) if args.compare else {}
+    print(f"Revision {revision}, Python {platform.python_version()}, {os.cpu_count()} CPUs")
+    print(f"{'tools':>7} {'case':<20} {'seconds':>9} {'tools/s':>10} {'peak MB':>8} {'RSS MB':>7}"
+          f"{f'  vs {args.compare}' if args.compare else ''}")
+    records: List[dict] = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as fixture_dir:
+            write_fixtures(fixture_dir=fixture_dir, number_of_tools=size, seed=args.seed)
+            check_cases(fixture_dir=fixture_dir)
+            for name in args.cases:
+                result = measure(name=name, fixture_dir=fixture_dir, repeat=args.repeat)
+                record = {"revision": revision, "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "size": size,
+                          "case": name, "seed": args.seed, "python": platform.python_version(), **result}
+                records.append(record)
+                previous = baseline.get((size, name))
+                change = f"  {previous['seconds'] / result['seconds']:.2f}x" if previous else ""
+                print(f"{size:>7} {name:<20} {result['seconds']:>9.3f} {result['tools'] / result['seconds']:>10.0f} "
+                      f"{result['peak_mb']:>8.1f} {result['rss_mb']:>7.1f}{change}", flush=True)
+
+    with open(args.results, "a") as f:
+        for record in records:
+            f.write(json.dumps(record))
+            f.write("\n")
+    print(f"Appended {len(records)} results to '{args.results}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Seeded generator of synthetic bio.tools catalogues for the benchmarks
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import os
+import random
+from typing import Iterator
+
+RESOURCES_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "automatic_domain_assignment_test",
+                                  "Resources")
+EDAM_PREFIX: str = "http://edamontology.org/"
+COLLECTIONS: list = ["Proteomics", "ms-utils", "BioConductor", "Galaxy", "RNA", "EMBOSS", "Rare Disease",
+                     "de.NBI", "ELIXIR-UK", "Animal and Crop Genomics"]
+LICENSES: list = ["GPL-3.0", "MIT", "Apache-2.0", "GPL-2.0", "BSD-3-Clause", "LGPL-2.1", "Artistic-2.0",
+                  "Proprietary", "Not licensed", "Other", "CC-BY-4.0", "AGPL-3.0"]
+# SPDX license list entries for the licenses above, as (ID, name, OSI approved, deprecated)
+SPDX_LICENSES: list = [
+    ("GPL-3.0", "GNU General Public License v3.0 only", True, True),
+    ("GPL-3.0-only", "GNU General Public License v3.0 only", True, False),
+    ("GPL-3.0-or-later", "GNU General Public License v3.0 or later", True, False),
+    ("GPL-3.0+", "GNU General Public License v3.0 or later", True, True),
+    ("GPL-2.0", "GNU General Public License v2.0 only", True, True),
+    ("GPL-2.0-only", "GNU General Public License v2.0 only", True, False),
+    ("GPL-2.0-or-later", "GNU General Public License v2.0 or later", True, False),
+    ("GPL-2.0+", "GNU General Public License v2.0 or later", True, True),
+    ("LGPL-2.1", "GNU Lesser General Public License v2.1 only", True, True),
+    ("LGPL-2.1-only", "GNU Lesser General Public License v2.1 only", True, False),
+    ("LGPL-3.0", "GNU Lesser General Public License v3.0 only", True, True),
+    ("LGPL-3.0-only", "GNU Lesser General Public License v3.0 only", True, False),
+    ("AGPL-3.0", "GNU Affero General Public License v3.0", True, True),
+    ("AGPL-3.0-only", "GNU Affero General Public License v3.0 only", True, False),
+    ("MIT", "MIT License", True, False),
+    ("Apache-2.0", "Apache License 2.0", True, False),
+    ("BSD-2-Clause", 'BSD 2-Clause "Simplified" License', True, False),
+    ("BSD-3-Clause", 'BSD 3-Clause "New" or "Revised" License', True, False),
+    ("Artistic-2.0", "Artistic License 2.0", True, False),
+    ("CC-BY-4.0", "Creative Commons Attribution 4.0 International", False, False)]
+# The number of licenses in the SPDX license list, which the fuzzy license matching compares against
+SPDX_LIST_SIZE: int = 600
+# Free-text licenses as entered in bio.tools, which resolve by normalising or by fuzzy matching
+LICENSE_TEXTS: list = ["GNU GPL v3", "GPLv3+", "GNU General Public License v2.0", "Apache License, Version 2.0",
+                       "MIT license", "BSD 3-Clause License", "Artistic License 2", "Apache Licence 2.0",
+                       "GNU Lesser General Public License v2.1", "Creative Commons Attribution 4.0", "GPL >= 3"]
+# Common free-text spellings of licenses in bio.tools, and the SPDX license ID each must resolve to
+LICENSE_SPELLINGS: dict = {"GPLv3": "GPL-3.0-only", "GNU GPL v3": "GPL-3.0-only",
+                           "GNU General Public License v3": "GPL-3.0-only", "GPLv3+": "GPL-3.0-or-later",
+                           "GPL >= 3": "GPL-3.0-or-later", "GPLv2+": "GPL-2.0-or-later", "LGPL v3": "LGPL-3.0-only",
+                           "GNU Lesser General Public License v2.1": "LGPL-2.1-only", "AGPLv3": "AGPL-3.0-only",
+                           "3-clause BSD": "BSD-3-Clause", "BSD 3-Clause License": "BSD-3-Clause",
+                           "Apache License, Version 2.0": "Apache-2.0", "Apache Licence 2.0": "Apache-2.0",
+                           "MIT license": "MIT", "Artistic License 2": "Artistic-2.0"}
+
+
+def _load_index(file_name: str) -> dict:
+    """
+    Load an EDAM index from the Resources directory.
+    :param file_name: The file name of the index.
+    :return: The dictionary with the term ID and the term.
+    """
+    with open(os.path.join(RESOURCES_DIR, file_name), "r") as f:
+        return json.load(f)["data"]
+
+
+def write_license_cache(cache_dir: str, number_of_licenses: int = 0):
+    """
+    Write an SPDX license list to a cache directory, so `parse_license_list(cache_dir, offline=True)` works without
+    network access.
+    :param cache_dir: The cache directory.
+    :param number_of_licenses: The number of licenses of the list, e.g. `SPDX_LIST_SIZE`. The licenses of
+        `SPDX_LICENSES` are padded with made-up licenses. If 0, only the licenses of `SPDX_LICENSES` are written.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    licenses = [{"licenseId": license_id, "name": name, "isOsiApproved": osi_approved, "isFsfLibre": osi_approved,
+                 "isDeprecatedLicenseId": deprecated} for license_id, name, osi_approved, deprecated in SPDX_LICENSES]
+    licenses += [{"licenseId": f"Synthetic-{number // 10}.{number % 10}",
+                  "name": f"Synthetic Public License {number // 10}.{number % 10}", "isOsiApproved": number % 3 == 0,
+                  "isFsfLibre": number % 4 == 0, "isDeprecatedLicenseId": number % 20 == 0}
+                 for number in range(max(number_of_licenses - len(licenses), 0))]
+    with open(os.path.join(cache_dir, "licenses.json"), "w") as f:
+        json.dump({"licenses": licenses}, f)
+    with open(os.path.join(cache_dir, "licenses.meta.json"), "w") as f:
+        json.dump({"fetched_at": 0}, f)
+
+
+def generate_tools(number_of_tools: int, seed: int = 42) -> Iterator[dict]:
+    """
+    Generate tool records with the structure of the bio.tools API.
+
+    The topics and operations are drawn from the EDAM indexes in the Resources directory with a skewed distribution, so
+    a few terms are common and most terms are rare as in the real registry. The same seed always gives the same tools.
+    :param number_of_tools: The number of tools.
+    :param seed: The random seed.
+    :return: The iterator over the tools.
+    """
+    rng = random.Random(seed)
+    topic_index = _load_index("topic_index.json")
+    operation_index = _load_index("operation_index.json")
+    topics = sorted(topic_index)
+    operations = sorted(operation_index)
+    topic_weights = [1 / (rank + 1) for rank in range(len(topics))]
+    operation_weights = [1 / (rank + 1) for rank in range(len(operations))]
+    rng.shuffle(topic_weights)
+    rng.shuffle(operation_weights)
+    data_terms = [f"data_{number:04d}" for number in rng.sample(range(6, 3800), 300)]
+    format_terms = [f"format_{number:04d}" for number in rng.sample(range(1900, 3900), 300)]
+
+    def term(term_id: str, name: str) -> dict:
+        return {"uri": f"{EDAM_PREFIX}{term_id}", "term": name}
+
+    def io_terms() -> list:
+        return [{"data": term(data_id, data_id),
+                 "format": [term(format_id, format_id) for format_id in rng.sample(format_terms, rng.randint(0, 3))]}
+                for data_id in rng.sample(data_terms, rng.randint(0, 2))]
+
+    for number in range(number_of_tools):
+        tool_topics = set(rng.choices(topics, weights=topic_weights, k=rng.randint(0, 5)))
+        functions = []
+        for _ in range(rng.choice((0, 1, 1, 1, 2))):
+            function_operations = set(rng.choices(operations, weights=operation_weights, k=rng.randint(1, 4)))
+            functions.append({"operation": [term(op, operation_index[op]["name"]) for op in function_operations],
+                              "input": io_terms(), "output": io_terms(), "note": None, "cmd": None})
+        described_terms = [topic_index[topic]["name"] for topic in tool_topics] + \
+                          [op["term"] for function in functions for op in function["operation"]]
+        description = f"Tool {number} for " + (", ".join(described_terms).lower() or "general bioinformatics") + "."
+        yield {"biotoolsID": f"synthetic_tool_{number:06d}", "name": f"Synthetic tool {number}",
+               "description": description, "homepage": f"https://example.org/tool/{number}",
+               "collectionID": rng.sample(COLLECTIONS, rng.choice((0, 0, 1, 1, 2))),
+               "topic": [term(topic, topic_index[topic]["name"]) for topic in tool_topics],
+               "function": functions, "license": rng.choice(LICENSES),
+               "lastUpdate": f"2022-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00.000000Z"}
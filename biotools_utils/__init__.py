@@ -16,5 +16,80 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 """
-from .spdx_license_parser import LicensesData, parse_license_list
-from .edam_term_extractor import extract_terms
+import importlib
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+# The public names of each submodule. They are imported on first access, so importing the package, or one light
+# submodule, does not load pandas, scikit-learn or requests before they are needed.
+_SUBMODULE_NAMES: Dict[str, Tuple[str, ...]] = {
+    "spdx_license_parser": ("LicenseClassification", "LicensesData", "normalize_license", "parse_license_list"),
+    "edam_term_extractor": ("ExtractedTerms", "TermExtractor", "extract_all_terms", "extract_terms"),
+    "tool_harvester": ("harvest_tools", "save_tool_list"),
+    "catalogue_sync": ("SyncReport", "iter_catalogue", "sync_catalogue"),
+    "tool_stream": ("iter_tools", "save_json_lines"),
+    "tool_store": ("ToolStore", "build_tool_store", "convert_json_dump"),
+    "term_matrix": ("TermMatrix", "build_term_matrix", "build_term_matrices", "combine_term_matrices",
+                    "term_matrix_from_strings", "term_matrix_from_transactions"),
+    "edam_index": ("EdamIndex",),
+    "term_counter": ("count_term_hierarchy", "top_terms_per_level"),
+    "domain_scoring": ("DomainCategories", "compile_categories", "load_categories", "score_tools"),
+    "tool_validator": ("ToolValidator", "ValidationIssue", "ValidationReport", "read_report", "validate_catalogue"),
+    "tool_similarity": ("MinHashLSH", "find_duplicates", "pair_similarity", "similar_tools", "top_k_similar"),
+    "tool_clustering": ("ClusteringResult", "cluster_kmeans", "cluster_knn_graph", "tfidf_vectors"),
+    "association_rules": ("association_rules", "frequent_itemsets"),
+    "domain_classifier": ("DomainClassifier", "collection_labels", "seed_labels"),
+    "stage_io": ("ensure_tool_list", "export_excel", "load_stage", "load_term_matrix", "save_stage"),
+    "pipeline_cache": ("CacheStats", "StageCache", "code_version"),
+    "search_index": ("SearchIndex", "tokenize"),
+    "annotation_suggester": ("AnnotationSuggester", "Suggestion", "SuggestionReport", "read_suggestions",
+                             "suggest_catalogue", "suggest_tools"),
+    "snapshot_diff": ("SnapshotDiff", "diff_snapshots", "read_changelog"),
+}
+# Note that `association_rules` is also the name of its submodule, so once the submodule has been imported by its
+# full name, e.g. `import biotools_utils.association_rules`, the package attribute is the submodule
+_ATTRIBUTE_MODULES: Dict[str, str] = {name: module for module, names in _SUBMODULE_NAMES.items() for name in names}
+
+__all__: List[str] = list(_ATTRIBUTE_MODULES)
+
+
+def __getattr__(name: str):
+    """
+    Import the submodule of a public name on first access, and keep the name in the package namespace.
+    :param name: The attribute name.
+    :return: The attribute.
+    """
+    module = _ATTRIBUTE_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .spdx_license_parser import LicenseClassification, LicensesData, normalize_license, parse_license_list
+    from .edam_term_extractor import ExtractedTerms, TermExtractor, extract_all_terms, extract_terms
+    from .tool_harvester import harvest_tools, save_tool_list
+    from .catalogue_sync import SyncReport, iter_catalogue, sync_catalogue
+    from .tool_stream import iter_tools, save_json_lines
+    from .tool_store import ToolStore, build_tool_store, convert_json_dump
+    from .term_matrix import TermMatrix, build_term_matrix, build_term_matrices, combine_term_matrices, \
+        term_matrix_from_strings, term_matrix_from_transactions
+    from .edam_index import EdamIndex
+    from .term_counter import count_term_hierarchy, top_terms_per_level
+    from .domain_scoring import DomainCategories, compile_categories, load_categories, score_tools
+    from .tool_validator import ToolValidator, ValidationIssue, ValidationReport, read_report, validate_catalogue
+    from .tool_similarity import MinHashLSH, find_duplicates, pair_similarity, similar_tools, top_k_similar
+    from .tool_clustering import ClusteringResult, cluster_kmeans, cluster_knn_graph, tfidf_vectors
+    from .association_rules import association_rules, frequent_itemsets
+    from .domain_classifier import DomainClassifier, collection_labels, seed_labels
+    from .stage_io import ensure_tool_list, export_excel, load_stage, load_term_matrix, save_stage
+    from .pipeline_cache import CacheStats, StageCache, code_version
+    from .search_index import SearchIndex, tokenize
+    from .annotation_suggester import AnnotationSuggester, Suggestion, SuggestionReport, read_suggestions, \
+        suggest_catalogue, suggest_tools
+    from .snapshot_diff import SnapshotDiff, diff_snapshots, read_changelog
@@ -0,0 +1,238 @@
+"""
+Command line interface with one subcommand per catalogue task, e.g. `python -m biotools_utils validate`
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import os
+import sys
+from typing import List, Optional
+
+# The subcommands import their modules when they run, so e.g. `diff` starts without loading pandas or scikit-learn
+RESOURCES_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "automatic_domain_assignment_test", "Resources")
+INDEX_PATHS: List[str] = [os.path.join(RESOURCES_DIR, "topic_index.json"),
+                          os.path.join(RESOURCES_DIR, "operation_index.json")]
+LICENSE_STR: str = """
+biotools-utils  Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+class CustomArgumentParser(ArgumentParser):
+    def error(self, message: str):
+        sys.stdout.write(LICENSE_STR)
+        sys.stdout.write("\n")
+        sys.stderr.write('error: %s\n' % message)
+        self.print_help()
+        exit(2)
+
+
+def harvest(args: Namespace):
+    from .tool_harvester import BIOTOOLS_API_URL, harvest_tools, save_tool_list
+
+    tools = harvest_tools(base_url=args.base_url or BIOTOOLS_API_URL, checkpoint_dir=args.checkpoint_dir,
+                          workers=args.workers, requests_per_second=args.rate)
+    number_of_tools = save_tool_list(tools=tools, path=args.output)
+    print(f"Harvested {number_of_tools} tools to '{args.output}'")
+
+
+def sync(args: Namespace):
+    from .catalogue_sync import sync_catalogue
+    from .tool_harvester import BIOTOOLS_API_URL
+
+    report = sync_catalogue(store_dir=args.store, base_url=args.base_url or BIOTOOLS_API_URL,
+                            requests_per_second=args.rate, workers=args.workers, reconcile_every=args.reconcile_every)
+    print(f"{len(report.added)} added, {len(report.updated)} updated and {len(report.deleted)} deleted tools in "
+          f"{report.requests} requests ({report.requests_avoided} fewer than a full harvest)")
+    if report.aborted_requests > 0:
+        print(f"Tools were deleted, so the full list was harvested after {report.aborted_requests} requests of the "
+              f"incremental sync")
+
+
+def convert(args: Namespace):
+    from .tool_store import convert_json_dump
+
+    store = convert_json_dump(json_path=args.dump, store_path=args.store, collection_id=args.collection)
+    print(f"Converted {len(store)} tools to '{args.store}'")
+
+
+def validate(args: Namespace):
+    from .edam_index import EdamIndex
+    from .spdx_license_parser import DEFAULT_CACHE_DIR, parse_license_list
+    from .tool_validator import ToolValidator, validate_catalogue
+
+    validator = ToolValidator(licenses=parse_license_list(cache_dir=args.license_cache or DEFAULT_CACHE_DIR,
+                                                          offline=args.offline),
+                              index=EdamIndex.load(*args.index), check_schema=args.schema)
+    report = validate_catalogue(path=args.dump, report_path=args.report, validator=validator, workers=args.workers)
+    print(f"Validated {report.tools} tools in {report.seconds:.1f} s ({report.tools_per_second:.0f} tools/s)")
+    print(f"{report.tools_with_issues} tools with issues")
+    for issue, count in report.issues.most_common():
+        print(f"  {issue}: {count}")
+
+
+def diff(args: Namespace):
+    from .snapshot_diff import DEFAULT_RUN_SIZE, diff_snapshots
+
+    result = diff_snapshots(old_path=args.old, new_path=args.new, changelog_path=args.changelog,
+                            run_size=args.run_size or DEFAULT_RUN_SIZE)
+    print(f"Compared the snapshots in {result.seconds:.1f} s")
+    print(f"{result.added} added, {result.removed} removed, {result.modified} modified and {result.unchanged} "
+          f"unchanged tools")
+    for field_name, count in result.field_changes.most_common():
+        print(f"  {field_name}: {count}")
+
+
+def index(args: Namespace):
+    from .edam_index import EdamIndex
+    from .search_index import SearchIndex
+    from .tool_stream import iter_tools
+
+    search_index = SearchIndex.build(tools=iter_tools(path=args.dump), edam_index=EdamIndex.load(*args.index))
+    search_index.save(path=args.search_index)
+    print(f"Indexed {len(search_index)} tools in '{args.search_index}'")
+
+
+def search(args: Namespace):
+    from .search_index import SearchIndex
+
+    search_index = SearchIndex.load(path=args.search_index)
+    for tool_id, score in search_index.search(query=args.query, k=args.k, collections=args.collection,
+                                              topics=args.topic, require_all=args.all):
+        print(f"{score:8.3f}  {tool_id}")
+
+
+def suggest(args: Namespace):
+    from .annotation_suggester import AnnotationSuggester, suggest_catalogue
+
+    suggester = AnnotationSuggester.load(*args.index, cache_path=args.cache)
+    report = suggest_catalogue(path=args.dump, report_path=args.report, suggester=suggester, workers=args.workers,
+                               max_suggestions=args.max_suggestions,
+                               only_missing_operations=args.only_missing_operations)
+    print(f"{report.tools_with_suggestions} of {report.tools} tools got {report.suggested_operations} suggested "
+          f"operations in {report.seconds:.2f} s ({report.tools_per_second:.0f} tools/s)")
+
+
+def create_parser() -> CustomArgumentParser:
+    """
+    Create the argument parser with one subparser per subcommand.
+    :return: The argument parser.
+    """
+    parser = CustomArgumentParser(prog="biotools-utils", description="Utilities for the bio.tools catalogue",
+                                  add_help=True)
+    subparsers = parser.add_subparsers(title="subcommands", dest="command", required=True,
+                                       parser_class=CustomArgumentParser)
+
+    subparser = subparsers.add_parser("harvest", help="Harvest all tools from the bio.tools API to a JSON file.")
+    subparser.add_argument("output", help="The JSON file of the tool list.")
+    subparser.add_argument("--checkpoint-dir", help="The directory of the harvested pages, so an interrupted harvest "
+                                                    "resumes where it stopped.")
+    subparser.add_argument("--workers", "-w", help="The number of concurrent requests.", type=int, default=4)
+    subparser.add_argument("--rate", "-r", help="The number of requests per second.", type=float, default=4.0)
+    subparser.add_argument("--base-url", help="The URL of the tool list endpoint of the API. Defaults to "
+                                              "'https://bio.tools/api/t/'.")
+    subparser.set_defaults(handler=harvest)
+
+    subparser = subparsers.add_parser("sync", help="Bring a local catalogue store up to date with bio.tools.")
+    subparser.add_argument("store", help="The directory of the catalogue store.")
+    subparser.add_argument("--workers", "-w", help="The number of concurrent requests.", type=int, default=4)
+    subparser.add_argument("--rate", "-r", help="The number of requests per second.", type=float, default=4.0)
+    subparser.add_argument("--base-url", help="The URL of the tool list endpoint of the API. Defaults to "
+                                              "'https://bio.tools/api/t/'.")
+    subparser.add_argument("--reconcile-every", help="The number of incremental syncs between two full harvests, which "
+                                                     "find the deletions the tool count misses.", type=int, default=30)
+    subparser.set_defaults(handler=sync)
+
+    subparser = subparsers.add_parser("convert", help="Convert a tool list dump to a columnar tool store.")
+    subparser.add_argument("dump", help="The tool list dump, a JSON array or JSON Lines file.")
+    subparser.add_argument("store", help="The directory of the tool store.")
+    subparser.add_argument("--collection", help="Only convert the tools of this collection.")
+    subparser.set_defaults(handler=convert)
+
+    subparser = subparsers.add_parser("validate", help="Validate the licenses and EDAM terms of a tool list dump.")
+    subparser.add_argument("dump", help="The tool list dump, a JSON array or JSON Lines file.")
+    subparser.add_argument("report", help="The JSON Lines report with one line per tool with issues.")
+    subparser.add_argument("--index", help="The EDAM index files.", nargs="+", default=INDEX_PATHS)
+    subparser.add_argument("--license-cache", help="The cache directory of the SPDX license list. Defaults to "
+                                                   "'~/.cache/biotools_utils'.")
+    subparser.add_argument("--offline", help="Only use the cached SPDX license list.", action="store_true")
+    subparser.add_argument("--schema", help="Also check the required fields of the records.", action="store_true")
+    subparser.add_argument("--workers", "-w", help="The number of processes. Defaults to the number of CPUs.",
+                           type=int)
+    subparser.set_defaults(handler=validate)
+
+    subparser = subparsers.add_parser("diff", help="List the tools added, removed and modified between two dumps.")
+    subparser.add_argument("old", help="The older dump, a JSON array or JSON Lines file.")
+    subparser.add_argument("new", help="The newer dump, a JSON array or JSON Lines file.")
+    subparser.add_argument("--changelog", "-c", help="The JSON Lines changelog with one line per changed tool.",
+                           required=True)
+    subparser.add_argument("--run-size", help="The number of tools sorted in memory at a time.", type=int)
+    subparser.set_defaults(handler=diff)
+
+    subparser = subparsers.add_parser("index", help="Build the search index of a tool list dump.")
+    subparser.add_argument("dump", help="The tool list dump, a JSON array or JSON Lines file.")
+    subparser.add_argument("search_index", help="The directory of the search index.")
+    subparser.add_argument("--index", help="The EDAM index files, used for the term names and the sub-topics.",
+                           nargs="+", default=INDEX_PATHS)
+    subparser.set_defaults(handler=index)
+
+    subparser = subparsers.add_parser("search", help="Search the tools of a search index.")
+    subparser.add_argument("search_index", help="The directory of the search index.")
+    subparser.add_argument("query", help="The query.")
+    subparser.add_argument("-k", help="The number of results.", type=int, default=10)
+    subparser.add_argument("--collection", help="Only find tools of these collections.", nargs="+")
+    subparser.add_argument("--topic", help="Only find tools with these topics or their descendants.", nargs="+")
+    subparser.add_argument("--all", help="Only find tools with all the words of the query.", action="store_true")
+    subparser.set_defaults(handler=search)
+
+    subparser = subparsers.add_parser("suggest", help="Suggest EDAM terms for the tools of a tool list dump.")
+    subparser.add_argument("dump", help="The tool list dump, a JSON array or JSON Lines file.")
+    subparser.add_argument("report", help="The JSON Lines report with one line per tool with suggestions.")
+    subparser.add_argument("--index", help="The EDAM index files.", nargs="+", default=INDEX_PATHS)
+    subparser.add_argument("--cache", help="The cache file of the compiled suggester.",
+                           default=os.path.join(RESOURCES_DIR, "annotation_suggester.npz"))
+    subparser.add_argument("--max-suggestions", help="The number of suggestions per tool.", type=int, default=5)
+    subparser.add_argument("--only-missing-operations", help="Only suggest operations for tools without operations.",
+                           action="store_true")
+    subparser.add_argument("--workers", "-w", help="The number of processes. Defaults to the number of CPUs.",
+                           type=int)
+    subparser.set_defaults(handler=suggest)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Run a subcommand.
+    :param argv: The arguments, defaults to the command line arguments.
+    """
+    args: Namespace = create_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,518 @@
+"""
+Suggestion of EDAM topics and operations for tools from the EDAM term names and synonyms in their descriptions
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .edam_index import index_sources, same_index_sources
+from .edam_term_extractor import EDAM_PREFIX
+from .search_index import tokenize
+from .tool_stream import iter_tools
+
+# The fields needed for the suggestions, so the other fields are dropped before the tools are sent to the workers
+SUGGESTION_FIELDS: Tuple[str, ...] = ("name", "description", "topic", "function")
+# The kinds of the patterns, where a narrow synonym is weaker evidence than the name or an exact synonym
+NAME, EXACT_SYNONYM, NARROW_SYNONYM = 0, 1, 2
+KIND_NAMES: Tuple[str, ...] = ("name", "exact_synonym", "narrow_synonym")
+CACHE_FORMAT_VERSION: int = 1
+
+
+@dataclass
+class Suggestion:
+    term_id: str
+    name: str
+    depth: int
+    count: int
+    matched: str
+    kind: str
+
+
+@dataclass
+class SuggestionReport:
+    tools: int = 0
+    tools_with_suggestions: int = 0
+    suggested_operations: int = 0
+    seconds: float = 0.0
+
+    @property
+    def tools_per_second(self) -> float:
+        """
+        The number of tools processed per second.
+        """
+        return self.tools / self.seconds if self.seconds > 0 else 0.0
+
+
+class AnnotationSuggester:
+    """
+    Suggester of EDAM topics and operations from the names and synonyms of the terms found in tool descriptions.
+
+    The names, exact synonyms and narrow synonyms of all terms are split into words and compiled into one Aho-Corasick
+    automaton over word codes, so a description is scanned in a single pass over its words, whatever the number of
+    patterns. Words that are in no pattern reset the automaton without a lookup in the trie. Plural words are matched
+    to singular patterns, e.g. 'sequence alignments' to 'Sequence alignment'. Only the leftmost longest matches are
+    kept, so the words of 'peptide identification' do not also match 'Peptide'.
+
+    The terms found are ranked by their depth in the EDAM hierarchy, as deeper terms are more specific, then by the
+    kind of pattern and the number of matches. Terms the tool already has, and their ancestors, are not suggested,
+    and neither are the ancestors of other suggested terms.
+    """
+
+    def __init__(self, words: List[str], transitions: Tuple[np.ndarray, np.ndarray, np.ndarray], fail: np.ndarray,
+                 output_offsets: np.ndarray, output_patterns: np.ndarray, pattern_terms: np.ndarray,
+                 pattern_kinds: np.ndarray, pattern_texts: List[str], term_ids: List[str], names: List[str],
+                 depths: np.ndarray, ancestor_offsets: np.ndarray, ancestor_codes: np.ndarray):
+        """
+        Create the suggester from the arrays of a compiled automaton. Use `AnnotationSuggester.load` or
+        `AnnotationSuggester.from_index_data` to create a suggester.
+        :param words: The words of the patterns in code order.
+        :param transitions: The state, word code and next state of each edge of the trie.
+        :param fail: The failure state of each state.
+        :param output_offsets: The offsets of the patterns ending in each state in `output_patterns`.
+        :param output_patterns: The patterns ending in the states, including those of the failure states.
+        :param pattern_terms: The term code of each pattern.
+        :param pattern_kinds: The kind of each pattern, e.g. `NAME`.
+        :param pattern_texts: The words of each pattern separated by spaces.
+        :param term_ids: The term IDs in code order.
+        :param names: The term names in code order.
+        :param depths: The depth of each term, where the root has depth 0.
+        :param ancestor_offsets: The offsets of the ancestors of each term in `ancestor_codes`.
+        :param ancestor_codes: The codes of the ancestors of the terms, without the terms themselves.
+        """
+        self.words: Dict[str, int] = {word: code for code, word in enumerate(words)}
+        self.pattern_texts: List[str] = list(pattern_texts)
+        self.term_ids: List[str] = list(term_ids)
+        self.names: List[str] = list(names)
+        self.depths: np.ndarray = depths
+        self.codes: Dict[str, int] = {term_id: code for code, term_id in enumerate(self.term_ids)}
+        self._arrays: Dict[str, np.ndarray] = {
+            "transition_states": transitions[0], "transition_words": transitions[1], "transition_next": transitions[2],
+            "fail": fail, "output_offsets": output_offsets, "output_patterns": output_patterns,
+            "pattern_terms": pattern_terms, "pattern_kinds": pattern_kinds, "depths": depths,
+            "ancestor_offsets": ancestor_offsets, "ancestor_codes": ancestor_codes}
+
+        # The automaton is scanned with Python dictionaries and lists, which are faster than array lookups per word
+        self._goto: List[Dict[int, int]] = [{} for _ in range(len(fail))]
+        for state, word, next_state in zip(transitions[0].tolist(), transitions[1].tolist(), transitions[2].tolist()):
+            self._goto[state][word] = next_state
+        self._fail: List[int] = fail.tolist()
+        self._outputs: List[Tuple[int, ...]] = [tuple(output_patterns[start:stop].tolist())
+                                                for start, stop in zip(output_offsets[:-1], output_offsets[1:])]
+        self._pattern_terms: List[int] = pattern_terms.tolist()
+        self._pattern_kinds: List[int] = pattern_kinds.tolist()
+        self._pattern_lengths: List[int] = [len(text.split(" ")) for text in self.pattern_texts]
+        self._depths: List[int] = depths.tolist()
+        self._ancestors: List[Tuple[int, ...]] = [tuple(ancestor_codes[start:stop].tolist())
+                                                  for start, stop in zip(ancestor_offsets[:-1], ancestor_offsets[1:])]
+
+    @classmethod
+    def from_index_data(cls, *indexes: dict) -> "AnnotationSuggester":
+        """
+        Compile the suggester from the 'data' dictionaries of one or more index files.
+        :param indexes: The dictionaries with the term ID and the term.
+        :return: The suggester.
+        """
+        term_ids: List[str] = []
+        names: List[str] = []
+        depths: List[int] = []
+        term_paths: List[List[List[str]]] = []
+        patterns: Dict[Tuple[int, ...], Tuple[int, int]] = {}
+        words: Dict[str, int] = {}
+        for index in indexes:
+            for term_id, term in index.items():
+                paths = [path["key"].split("||") for path in term["path"]] or [[term_id]]
+                depth = min(len(path) for path in paths) - 1
+                # The roots, e.g. 'Topic' and 'Operation', would match almost every description
+                if depth == 0:
+                    continue
+                code = len(term_ids)
+                term_ids.append(term_id)
+                names.append(term["name"])
+                depths.append(depth)
+                term_paths.append(paths)
+                texts = [(term["name"], NAME)] + [(synonym, EXACT_SYNONYM) for synonym in term["exact_synonyms"]] + \
+                        [(synonym, NARROW_SYNONYM) for synonym in term["narrow_synonyms"]]
+                for text, kind in texts:
+                    pattern = tuple(words.setdefault(word, len(words)) for word in _words(text))
+                    # A phrase shared by several terms, e.g. a synonym of two terms, keeps the strongest kind
+                    if len(pattern) > 0 and (pattern not in patterns or kind < patterns[pattern][1]):
+                        patterns[pattern] = (code, kind)
+
+        codes = {term_id: code for code, term_id in enumerate(term_ids)}
+        ancestor_lists = [sorted({codes[path_term] for path in paths for path_term in path
+                                  if path_term in codes and path_term != term_id})
+                          for term_id, paths in zip(term_ids, term_paths)]
+        pattern_list = list(patterns)
+        word_list = list(words)
+        transitions, fail, outputs = _compile_automaton(pattern_list)
+        return cls(words=word_list, transitions=transitions, fail=fail,
+                   output_offsets=_offsets(outputs), output_patterns=_concatenate(outputs),
+                   pattern_terms=np.array([patterns[pattern][0] for pattern in pattern_list], dtype=np.int32),
+                   pattern_kinds=np.array([patterns[pattern][1] for pattern in pattern_list], dtype=np.int8),
+                   pattern_texts=[" ".join(word_list[word] for word in pattern) for pattern in pattern_list],
+                   term_ids=term_ids, names=names, depths=np.array(depths, dtype=np.int16),
+                   ancestor_offsets=_offsets(ancestor_lists), ancestor_codes=_concatenate(ancestor_lists))
+
+    @classmethod
+    def load(cls, *index_paths: str, cache_path: Optional[str] = None) -> "AnnotationSuggester":
+        """
+        Load the suggester from one or more index files, e.g. `topic_index.json` and `operation_index.json`.
+
+        If a cache path is given, the compiled automaton is read from the binary cache when it is newer than the index
+        files and was built from the same index files, and the cache is written otherwise.
+        :param index_paths: The paths of the index files.
+        :param cache_path: The path of the binary cache, or None to always compile the index files.
+        :return: The suggester.
+        """
+        if cache_path is not None and os.path.exists(cache_path) and \
+                all(os.path.getmtime(cache_path) >= os.path.getmtime(path) for path in index_paths):
+            cached = cls.load_cache(cache_path, index_paths=index_paths)
+            if cached is not None:
+                return cached
+
+        indexes = []
+        for path in index_paths:
+            with open(path, "r") as f:
+                indexes.append(json.load(f)["data"])
+        suggester = cls.from_index_data(*indexes)
+        if cache_path is not None:
+            suggester.save(cache_path, index_paths=index_paths)
+        return suggester
+
+    @classmethod
+    def load_cache(cls, cache_path: str,
+                   index_paths: Optional[Sequence[str]] = None) -> Optional["AnnotationSuggester"]:
+        """
+        Load the suggester from a binary cache written by `save`.
+        :param cache_path: The path of the cache.
+        :param index_paths: The paths of the index files the cache must have been built from, or None to not check.
+        :return: The suggester, or None if the cache has another format or was built from other index files.
+        """
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if "format_version" not in cache or int(cache["format_version"]) != CACHE_FORMAT_VERSION:
+                return None
+            if index_paths is not None and not same_index_sources(cache=cache, index_paths=index_paths):
+                return None
+            return cls(words=cache["words"].tolist(),
+                       transitions=(cache["transition_states"], cache["transition_words"], cache["transition_next"]),
+                       fail=cache["fail"], output_offsets=cache["output_offsets"],
+                       output_patterns=cache["output_patterns"], pattern_terms=cache["pattern_terms"],
+                       pattern_kinds=cache["pattern_kinds"], pattern_texts=cache["pattern_texts"].tolist(),
+                       term_ids=cache["term_ids"].tolist(),
+                       names=cache["names"].tolist(), depths=cache["depths"],
+                       ancestor_offsets=cache["ancestor_offsets"], ancestor_codes=cache["ancestor_codes"])
+
+    def save(self, cache_path: str, index_paths: Sequence[str] = ()):
+        """
+        Save the compiled automaton to a binary cache.
+        :param cache_path: The path of the cache.
+        :param index_paths: The paths of the index files the suggester was compiled from, which are recorded in the
+            cache.
+        """
+        with open(cache_path, "wb") as f:
+            np.savez(f, format_version=np.array(CACHE_FORMAT_VERSION), words=np.array(list(self.words)),
+                     pattern_texts=np.array(self.pattern_texts), term_ids=np.array(self.term_ids),
+                     names=np.array(self.names), **self._arrays, **index_sources(index_paths))
+
+    def __len__(self) -> int:
+        return len(self.term_ids)
+
+    def match(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        Find the patterns in a text.
+
+        The automaton reports every pattern ending at each word, including the patterns inside longer matches, e.g.
+        'Sequence' inside 'sequence alignment'. Of the overlapping matches, only the leftmost longest are kept.
+        :param text: The text, e.g. a tool description.
+        :return: The iterator over the pattern code and the word position after the end of each match.
+        """
+        goto, fail, outputs, word_codes, lengths = self._goto, self._fail, self._outputs, self.words, \
+            self._pattern_lengths
+        found: List[Tuple[int, int, int]] = []
+        state = 0
+        for position, word in enumerate(_words(text)):
+            code = word_codes.get(word)
+            if code is None:
+                state = 0
+                continue
+            while state and code not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(code, 0)
+            for pattern in outputs[state]:
+                found.append((position + 1 - lengths[pattern], -lengths[pattern], pattern))
+
+        covered = 0
+        for start, negative_length, pattern in sorted(found):
+            if start >= covered:
+                covered = start - negative_length
+                yield pattern, covered
+
+    def suggest(self, text: str, existing: Iterable[str] = (), max_suggestions: Optional[int] = 5,
+                term_type: Optional[str] = None) -> List[Suggestion]:
+        """
+        Suggest terms for a text.
+        :param text: The text, e.g. the name and description of a tool.
+        :param existing: The term IDs the tool already has, which are not suggested, nor their ancestors.
+        :param max_suggestions: The largest number of suggestions, or None for all.
+        :param term_type: Only suggest terms of this type, e.g. 'operation', or None for all types.
+        :return: The suggestions, from the most to the least specific.
+        """
+        excluded: Set[int] = set()
+        for term_id in existing:
+            code = self.codes.get(term_id)
+            if code is not None:
+                excluded.add(code)
+                excluded.update(self._ancestors[code])
+
+        counts: Dict[int, int] = {}
+        kinds: Dict[int, int] = {}
+        patterns: Dict[int, int] = {}
+        for pattern, _ in self.match(text):
+            term = self._pattern_terms[pattern]
+            if term in excluded or (term_type is not None and not self.term_ids[term].startswith(term_type)):
+                continue
+            counts[term] = counts.get(term, 0) + 1
+            if term not in kinds or self._pattern_kinds[pattern] < kinds[term]:
+                kinds[term] = self._pattern_kinds[pattern]
+                patterns[term] = pattern
+        implied = {ancestor for term in counts for ancestor in self._ancestors[term]}
+        terms = sorted((term for term in counts if term not in implied),
+                       key=lambda term: (-self._depths[term], kinds[term], -counts[term], self.term_ids[term]))
+        return [Suggestion(term_id=self.term_ids[term], name=self.names[term], depth=self._depths[term],
+                           count=counts[term], matched=self.pattern_texts[patterns[term]],
+                           kind=KIND_NAMES[kinds[term]]) for term in terms[:max_suggestions]]
+
+    def suggest_tool(self, tool: dict, max_suggestions: Optional[int] = 5,
+                     term_type: Optional[str] = None) -> List[Suggestion]:
+        """
+        Suggest terms for a tool from its name and description.
+        :param tool: The tool.
+        :param max_suggestions: The largest number of suggestions, or None for all.
+        :param term_type: Only suggest terms of this type, e.g. 'operation', or None for all types.
+        :return: The suggestions, from the most to the least specific.
+        """
+        return self.suggest(text=f"{tool.get('name') or ''}. {tool.get('description') or ''}",
+                            existing=_tool_terms(tool), max_suggestions=max_suggestions, term_type=term_type)
+
+
+def suggest_tools(tools: Iterable[dict], suggester: AnnotationSuggester, max_suggestions: Optional[int] = 5,
+                  term_type: Optional[str] = None) -> Iterator[Tuple[str, List[Suggestion]]]:
+    """
+    Suggest terms for tools in the current process.
+    :param tools: The tools.
+    :param suggester: The suggester.
+    :param max_suggestions: The largest number of suggestions per tool, or None for all.
+    :param term_type: Only suggest terms of this type, e.g. 'operation', or None for all types.
+    :return: The iterator over the tool ID and the suggestions of each tool.
+    """
+    for tool in tools:
+        yield tool["biotoolsID"], suggester.suggest_tool(tool=tool, max_suggestions=max_suggestions,
+                                                         term_type=term_type)
+
+
+def suggest_catalogue(path: str, report_path: str, suggester: AnnotationSuggester, workers: Optional[int] = None,
+                      chunk_size: int = 500, max_suggestions: Optional[int] = 5,
+                      only_missing_operations: bool = False) -> SuggestionReport:
+    """
+    Suggest terms for every tool of a catalogue dump and write the suggestions to a report.
+
+    The dump is streamed with `iter_tools`, and chunks of tools are processed by a pool of processes, with a bounded
+    number of chunks in flight, as in `validate_catalogue`. The report is a JSON Lines file with one line per tool with
+    suggestions, e.g.
+    {"biotoolsID": "tool", "suggestions": [["operation_3767", "Protein identification", 3, 1, "protein identification",
+    "name"]]}, in the order of the dump.
+    :param path: The path of the dump, a JSON array or JSON Lines file.
+    :param report_path: The path of the report.
+    :param suggester: The suggester.
+    :param workers: The number of processes, where 1 runs in the current process. Defaults to the number of CPUs.
+    :param chunk_size: The number of tools sent to a process at a time.
+    :param max_suggestions: The largest number of suggestions per tool, or None for all.
+    :param only_missing_operations: Whether to only suggest operations for the tools without operations.
+    :return: The summary of the suggestions.
+    """
+    workers = workers or os.cpu_count() or 1
+    report = SuggestionReport()
+    start = time.perf_counter()
+    tools = iter_tools(path=path, fields=SUGGESTION_FIELDS)
+    if only_missing_operations:
+        tools = (tool for tool in tools
+                 if not any(function.get("operation") for function in tool.get("function") or []))
+    term_type = "operation" if only_missing_operations else None
+
+    tmp_path = f"{report_path}.part"
+    with open(tmp_path, "w") as f:
+        if workers == 1:
+            _write_results(results=suggest_tools(tools=tools, suggester=suggester, max_suggestions=max_suggestions,
+                                                 term_type=term_type), f=f, report=report)
+        else:
+            chunks = iter(lambda: list(itertools.islice(tools, chunk_size)), [])
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(suggester, max_suggestions, term_type)) as executor:
+                pending: Deque[Future] = deque(executor.submit(_suggest_chunk, chunk)
+                                               for chunk in itertools.islice(chunks, workers * 2))
+                while pending:
+                    results = pending.popleft().result()
+                    for chunk in itertools.islice(chunks, 1):
+                        pending.append(executor.submit(_suggest_chunk, chunk))
+                    _write_results(results=results, f=f, report=report)
+    os.replace(tmp_path, report_path)
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def read_suggestions(report_path: str) -> Iterator[Tuple[str, List[Suggestion]]]:
+    """
+    Read a report written by `suggest_catalogue`.
+    :param report_path: The path of the report.
+    :return: The iterator over the tool ID and the suggestions of each tool with suggestions.
+    """
+    with open(report_path, "r") as f:
+        for line in f:
+            entry = json.loads(line)
+            yield entry["biotoolsID"], [Suggestion(*suggestion) for suggestion in entry["suggestions"]]
+
+
+def _words(text: str) -> List[str]:
+    """
+    Split a text into words, with plural words made singular, so names and descriptions are split the same way.
+    :param text: The text.
+    :return: The words.
+    """
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")) else word
+            for word in tokenize(text)]
+
+
+def _tool_terms(tool: dict) -> List[str]:
+    """
+    Get the IDs of the topics and operations of a tool.
+    :param tool: The tool.
+    :return: The term IDs.
+    """
+    terms = list(tool.get("topic") or []) + [operation for function in tool.get("function") or []
+                                             for operation in function.get("operation") or []]
+    return [term["uri"][len(EDAM_PREFIX):] for term in terms if term.get("uri", "").startswith(EDAM_PREFIX)]
+
+
+def _compile_automaton(patterns: List[Tuple[int, ...]]) -> Tuple[Tuple[np.ndarray, np.ndarray, np.ndarray],
+                                                                 np.ndarray, List[List[int]]]:
+    """
+    Compile patterns of word codes into an Aho-Corasick automaton.
+    :param patterns: The patterns.
+    :return: The edges of the trie, the failure state of each state and the patterns ending in each state.
+    """
+    goto: List[Dict[int, int]] = [{}]
+    outputs: List[List[int]] = [[]]
+    for pattern_code, pattern in enumerate(patterns):
+        state = 0
+        for word in pattern:
+            if word not in goto[state]:
+                goto[state][word] = len(goto)
+                goto.append({})
+                outputs.append([])
+            state = goto[state][word]
+        outputs[state].append(pattern_code)
+
+    # The failure state of a state is the state of its longest proper suffix in the trie, found breadth first
+    fail = [0] * len(goto)
+    queue: Deque[int] = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for word, next_state in goto[state].items():
+            queue.append(next_state)
+            suffix = fail[state]
+            while suffix and word not in goto[suffix]:
+                suffix = fail[suffix]
+            fail[next_state] = goto[suffix].get(word, 0)
+            outputs[next_state].extend(outputs[fail[next_state]])
+
+    edges = [(state, word, next_state) for state, state_edges in enumerate(goto)
+             for word, next_state in state_edges.items()]
+    transitions = tuple(np.array([edge[i] for edge in edges], dtype=np.int32) for i in range(3))
+    return transitions, np.array(fail, dtype=np.int32), outputs
+
+
+def _offsets(lists: List[List[int]]) -> np.ndarray:
+    """
+    Get the offsets of lists concatenated with `_concatenate`.
+    :param lists: The lists.
+    :return: The offsets, with the end of the last list at the end.
+    """
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(values) for values in lists], out=offsets[1:])
+    return offsets
+
+
+def _concatenate(lists: List[List[int]]) -> np.ndarray:
+    """
+    Concatenate lists of codes into one array.
+    :param lists: The lists.
+    :return: The codes.
+    """
+    return np.array([value for values in lists for value in values], dtype=np.int32)
+
+
+def _write_results(results: Iterable[Tuple[str, List[Suggestion]]], f, report: SuggestionReport):
+    """
+    Write the tools with suggestions to the report file, and count the tools and suggestions.
+    :param results: The tool ID and the suggestions of each tool.
+    :param f: The report file.
+    :param report: The summary to update.
+    """
+    for tool_id, suggestions in results:
+        report.tools += 1
+        if len(suggestions) == 0:
+            continue
+        report.tools_with_suggestions += 1
+        report.suggested_operations += sum(suggestion.term_id.startswith("operation") for suggestion in suggestions)
+        f.write(json.dumps({"biotoolsID": tool_id,
+                            "suggestions": [[suggestion.term_id, suggestion.name, suggestion.depth, suggestion.count,
+                                             suggestion.matched, suggestion.kind] for suggestion in suggestions]}))
+        f.write("\n")
+
+
+_worker_suggester: Optional[AnnotationSuggester] = None
+_worker_max_suggestions: Optional[int] = 5
+_worker_term_type: Optional[str] = None
+
+
+def _init_worker(suggester: AnnotationSuggester, max_suggestions: Optional[int], term_type: Optional[str]):
+    """
+    Keep the suggester in a worker process, so it is only sent once per process instead of once per chunk.
+    :param suggester: The suggester.
+    :param max_suggestions: The largest number of suggestions per tool, or None for all.
+    :param term_type: Only suggest terms of this type, or None for all types.
+    """
+    global _worker_suggester, _worker_max_suggestions, _worker_term_type
+    _worker_suggester, _worker_max_suggestions, _worker_term_type = suggester, max_suggestions, term_type
+
+
+def _suggest_chunk(tools: List[dict]) -> List[Tuple[str, List[Suggestion]]]:
+    """
+    Suggest terms for a chunk of tools in a worker process.
+    :param tools: The tools.
+    :return: The tool ID and the suggestions of each tool.
+    """
+    return list(suggest_tools(tools=tools, suggester=_worker_suggester, max_suggestions=_worker_max_suggestions,
+                              term_type=_worker_term_type))
@@ -0,0 +1,176 @@
+"""
+Frequent itemset and association rule mining over the EDAM terms of tools
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .term_matrix import TermMatrix
+
+# An item and the bitset of the tools having it, with bit i set for the tool in row i, and the number of these tools
+_Item = Tuple[int, int, int]
+
+
+def frequent_itemsets(term_matrix: TermMatrix, min_support: float = 0.01, max_length: Optional[int] = None,
+                      workers: int = 1) -> pd.DataFrame:
+    """
+    Find the sets of terms shared by at least `min_support` of the tools with Eclat.
+
+    Each term is kept as the bitset of the tools having it, as a Python integer, so the support of an itemset is the
+    number of set bits of the AND of the bitsets of its terms. The itemsets are found depth first, where the itemsets
+    starting with each term form an independent prefix class, and the prefix classes are spread over a pool of
+    processes if `workers` is above 1.
+    :param term_matrix: The tool by term matrix, e.g. combining the topics and operations with `combine_term_matrices`.
+    :param min_support: The smallest fraction of the tools having all terms of an itemset.
+    :param max_length: The largest number of terms in an itemset, or None for no limit.
+    :param workers: The number of processes.
+    :return: The dataframe with the 'Itemset' column with the sorted tuple of terms, and the 'Count' and 'Support'
+        columns, by decreasing support.
+    """
+    number_of_tools = term_matrix.matrix.shape[0]
+    min_count = max(1, math.ceil(min_support * number_of_tools))
+    items = _item_bitsets(term_matrix=term_matrix, min_count=min_count)
+
+    if workers > 1 and len(items) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(items, min_count, max_length)) as executor:
+            classes = list(executor.map(_mine_prefix_class_in_worker, range(len(items))))
+    else:
+        classes = [_mine_prefix_class(items=items, position=position, min_count=min_count, max_length=max_length)
+                   for position in range(len(items))]
+
+    itemsets = [(tuple(sorted(term_matrix.terms[item] for item in itemset)), count)
+                for prefix_class in classes for itemset, count in prefix_class]
+    itemsets_df = pd.DataFrame(itemsets, columns=["Itemset", "Count"])
+    itemsets_df["Support"] = itemsets_df["Count"] / max(number_of_tools, 1)
+    return itemsets_df.sort_values(["Count", "Itemset"], ascending=[False, True], ignore_index=True)
+
+
+def association_rules(itemsets: pd.DataFrame, min_confidence: float = 0.5, min_lift: Optional[float] = None,
+                      antecedent_prefix: Optional[str] = None,
+                      consequent_prefix: Optional[str] = None) -> pd.DataFrame:
+    """
+    Generate the association rules X ⇒ Y from frequent itemsets, where X and Y split an itemset.
+
+    The confidence of a rule is support(X ∪ Y) / support(X), and its lift is the confidence / support(Y). The prefixes
+    restrict the terms on each side, e.g. 'topic_' and 'operation_' for the rules "topics ⇒ operations".
+    :param itemsets: The frequent itemsets from `frequent_itemsets`.
+    :param min_confidence: The smallest confidence of a rule.
+    :param min_lift: The smallest lift of a rule, or None for no limit.
+    :param antecedent_prefix: Only keep the rules where all antecedent terms start with this prefix.
+    :param consequent_prefix: Only keep the rules where all consequent terms start with this prefix.
+    :return: The dataframe with the 'Antecedent', 'Consequent', 'Support', 'Confidence' and 'Lift' columns, by
+        decreasing confidence and lift.
+    """
+    supports: Dict[tuple, float] = dict(zip(itemsets["Itemset"], itemsets["Support"]))
+    rules: List[tuple] = []
+    for itemset, support in supports.items():
+        for size in range(1, len(itemset)):
+            for antecedent in itertools.combinations(itemset, size):
+                if antecedent_prefix is not None and not all(term.startswith(antecedent_prefix)
+                                                             for term in antecedent):
+                    continue
+                consequent = tuple(term for term in itemset if term not in antecedent)
+                if consequent_prefix is not None and not all(term.startswith(consequent_prefix)
+                                                             for term in consequent):
+                    continue
+                # All subsets of a frequent itemset are frequent, so both sides have a support
+                confidence = support / supports[antecedent]
+                lift = confidence / supports[consequent]
+                if confidence >= min_confidence and (min_lift is None or lift >= min_lift):
+                    rules.append((antecedent, consequent, support, confidence, lift))
+
+    rules_df = pd.DataFrame(rules, columns=["Antecedent", "Consequent", "Support", "Confidence", "Lift"])
+    return rules_df.sort_values(["Confidence", "Lift"], ascending=False, ignore_index=True)
+
+
+def _item_bitsets(term_matrix: TermMatrix, min_count: int) -> List[_Item]:
+    """
+    Convert the frequent terms to bitsets of the tools having them.
+    :param term_matrix: The tool by term matrix.
+    :param min_count: The smallest number of tools having a term.
+    :return: The frequent items by increasing count, which keeps the prefix classes of the frequent terms small.
+    """
+    matrix = term_matrix.matrix.tocsc()
+    matrix.sum_duplicates()
+    counts = np.diff(matrix.indptr)
+    items: List[_Item] = []
+    for column in np.flatnonzero(counts >= min_count):
+        bits = np.zeros(matrix.shape[0], dtype=np.uint8)
+        bits[matrix.indices[matrix.indptr[column]:matrix.indptr[column + 1]]] = 1
+        items.append((int(column), int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little"),
+                      int(counts[column])))
+    return sorted(items, key=lambda item: (item[2], item[0]))
+
+
+def _mine_prefix_class(items: List[_Item], position: int, min_count: int,
+                       max_length: Optional[int]) -> List[Tuple[Tuple[int, ...], int]]:
+    """
+    Find the frequent itemsets starting with the item at a position, extended by the items after it.
+    :param items: The frequent items.
+    :param position: The position of the first item.
+    :param min_count: The smallest number of tools having an itemset.
+    :param max_length: The largest number of items in an itemset, or None for no limit.
+    :return: The itemsets, as the tuple of the term columns and the count.
+    """
+    item, bits, count = items[position]
+    itemsets: List[Tuple[Tuple[int, ...], int]] = []
+    stack: List[Tuple[Tuple[int, ...], int, int, List[_Item]]] = [((item,), bits, count, items[position + 1:])]
+    while stack:
+        prefix, prefix_bits, prefix_count, candidates = stack.pop()
+        itemsets.append((prefix, prefix_count))
+        if max_length is not None and len(prefix) >= max_length:
+            continue
+        extensions: List[_Item] = []
+        for other, other_bits, _ in candidates:
+            joined = prefix_bits & other_bits
+            joined_count = joined.bit_count()
+            if joined_count >= min_count:
+                extensions.append((other, joined, joined_count))
+        for index, (other, joined, joined_count) in enumerate(extensions):
+            stack.append((prefix + (other,), joined, joined_count, extensions[index + 1:]))
+    return itemsets
+
+
+_worker_items: List[_Item] = []
+_worker_min_count: int = 1
+_worker_max_length: Optional[int] = None
+
+
+def _init_worker(items: List[_Item], min_count: int, max_length: Optional[int]):
+    """
+    Keep the item bitsets in a worker process, so they are only sent once per process.
+    :param items: The frequent items.
+    :param min_count: The smallest number of tools having an itemset.
+    :param max_length: The largest number of items in an itemset.
+    """
+    global _worker_items, _worker_min_count, _worker_max_length
+    _worker_items, _worker_min_count, _worker_max_length = items, min_count, max_length
+
+
+def _mine_prefix_class_in_worker(position: int) -> List[Tuple[Tuple[int, ...], int]]:
+    """
+    Find the frequent itemsets of a prefix class in a worker process.
+    :param position: The position of the first item.
+    :return: The itemsets, as the tuple of the term columns and the count.
+    """
+    return _mine_prefix_class(items=_worker_items, position=position, min_count=_worker_min_count,
+                              max_length=_worker_max_length)
@@ -0,0 +1,321 @@
+"""
+Incremental synchronisation of a local copy of the bio.tools catalogue
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+
+import requests
+
+from .http_utils import REQUEST_TIMEOUT, TokenBucket, create_session
+from .tool_harvester import BIOTOOLS_API_URL, harvest_tools
+from .tool_stream import iter_tools
+
+CATALOGUE_FILE: str = "catalogue.jsonl"
+STATE_FILE: str = "sync_state.json"
+# The number of incremental syncs after which the full list is walked again, to find deletions the count misses
+RECONCILE_EVERY: int = 30
+
+
+@dataclass
+class SyncReport:
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    requests: int = 0
+    bytes_downloaded: int = 0
+    full_harvest_requests: int = 0
+    full_harvest_bytes: int = 0
+    full_harvest: bool = False
+    aborted_requests: int = 0
+    aborted_bytes: int = 0
+
+    @property
+    def requests_avoided(self) -> int:
+        """
+        The number of requests saved compared with a full harvest.
+        """
+        return max(0, self.full_harvest_requests - self.requests)
+
+    @property
+    def bytes_avoided(self) -> int:
+        """
+        The estimated number of bytes saved compared with a full harvest.
+        """
+        return max(0, self.full_harvest_bytes - self.bytes_downloaded)
+
+
+def sync_catalogue(store_dir: str, base_url: str = BIOTOOLS_API_URL, session: Optional[requests.Session] = None,
+                   requests_per_second: float = 4.0, workers: int = 4,
+                   reconcile_every: int = RECONCILE_EVERY) -> SyncReport:
+    """
+    Bring the local catalogue store up to date with bio.tools.
+
+    The first sync harvests the full catalogue. Later syncs request the tool list sorted by `lastUpdate`, newest first,
+    and stop at the first tool that is not newer than the previous sync. The first page is requested with the HTTP
+    validators from the previous sync, so an unchanged catalogue costs a single `304 Not Modified` request. Deletions
+    are detected from the tool count reported by the API, and only then is the full list of tools walked to find them.
+    The requests of the incremental sync before that are reported as aborted, and not as part of the full harvest.
+    The count misses a deletion that coincides with an addition the sorted list did not show, e.g. a new tool without
+    `lastUpdate`, so the full list is also walked after every `reconcile_every` incremental syncs. A full harvest drops
+    the HTTP validators, so the next incremental sync fetches the first page again instead of getting a `304`.
+    :param store_dir: The directory with the local catalogue store.
+    :param base_url: The URL of the tool list endpoint.
+    :param session: The session to use. A pooled session is created if not given.
+    :param requests_per_second: The sustained number of requests per second.
+    :param workers: The number of concurrent requests used for full harvests.
+    :param reconcile_every: The number of incremental syncs between two full harvests.
+    :return: The report of the sync.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    state = _load_state(store_dir=store_dir)
+    own_session = session is None
+    if session is None:
+        session = create_session(pool_size=workers)
+
+    # Count the requests and bytes of every response on the session
+    traffic = {"requests": 0, "bytes": 0}
+
+    def count_response(resp: requests.Response, *args, **kwargs):
+        traffic["requests"] += 1
+        traffic["bytes"] += len(resp.content)
+
+    session.hooks["response"].append(count_response)
+    aborted = {"requests": 0, "bytes": 0}
+    try:
+        report: Optional[SyncReport] = None
+        if state is not None and state.get("incremental_syncs", 0) < reconcile_every:
+            report = _incremental_sync(store_dir=store_dir, state=state, base_url=base_url, session=session,
+                                       requests_per_second=requests_per_second)
+            if report is None:
+                # Tools were deleted, so the requests so far are not part of the full harvest which finds them
+                aborted = dict(traffic)
+        if report is None:
+            report = _full_sync(store_dir=store_dir, base_url=base_url, session=session,
+                                requests_per_second=requests_per_second, workers=workers,
+                                known_tools=state["tools"] if state is not None else {})
+    finally:
+        session.hooks["response"].remove(count_response)
+        if own_session:
+            session.close()
+
+    report.requests = traffic["requests"]
+    report.bytes_downloaded = traffic["bytes"]
+    if report.full_harvest:
+        report.aborted_requests = aborted["requests"]
+        report.aborted_bytes = aborted["bytes"]
+        report.full_harvest_requests = report.requests - report.aborted_requests
+        report.full_harvest_bytes = report.bytes_downloaded - report.aborted_bytes
+        _update_state_costs(store_dir=store_dir, report=report)
+    return report
+
+
+def iter_catalogue(store_dir: str) -> Iterator[dict]:
+    """
+    Iterate over the tools in the local catalogue store.
+    :param store_dir: The directory with the local catalogue store.
+    :return: The iterator over the tools.
+    """
+    catalogue_path = os.path.join(store_dir, CATALOGUE_FILE)
+    if os.path.exists(catalogue_path):
+        yield from iter_tools(path=catalogue_path)
+
+
+def _incremental_sync(store_dir: str, state: dict, base_url: str, session: requests.Session,
+                      requests_per_second: float) -> Optional[SyncReport]:
+    """
+    Fetch the tools updated since the last sync, newest first.
+    :param store_dir: The directory with the local catalogue store.
+    :param state: The state of the last sync.
+    :param base_url: The URL of the tool list endpoint.
+    :param session: The session.
+    :param requests_per_second: The sustained number of requests per second.
+    :return: The report of the sync, or None if tools were deleted and the full list must be walked to find them.
+    """
+    known_tools: Dict[str, str] = state["tools"]
+    watermark: str = state["last_update"]
+    report = _new_report(state=state)
+    bucket = TokenBucket(rate=requests_per_second)
+    query = {"format": "json", "sort": "lastUpdate", "ord": "desc"}
+
+    changed: Dict[str, dict] = {}
+    remote_count: Optional[int] = None
+    validators: dict = state.get("validators", {})
+    page: Optional[int] = 1
+    while page is not None:
+        headers = {}
+        if page == 1 and "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if page == 1 and "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        bucket.acquire()
+        resp = session.get(base_url, params={**query, "page": page}, headers=headers,
+                           timeout=REQUEST_TIMEOUT)
+        if resp.status_code == 304:
+            _save_state(store_dir=store_dir, known_tools=known_tools, validators=validators,
+                        full_harvest_requests=state["full_harvest_requests"],
+                        full_harvest_bytes_per_tool=state["full_harvest_bytes_per_tool"],
+                        incremental_syncs=state.get("incremental_syncs", 0) + 1)
+            return report
+        resp.raise_for_status()
+        resp_json = resp.json()
+
+        if page == 1:
+            remote_count = resp_json["count"]
+            validators = {key: resp.headers[header] for key, header in (("etag", "ETag"),
+                                                                        ("last_modified", "Last-Modified"))
+                          if header in resp.headers}
+
+        reached_watermark = False
+        for tool in resp_json["list"]:
+            last_update = tool.get("lastUpdate") or ""
+            if last_update < watermark:
+                reached_watermark = True
+                break
+            if known_tools.get(tool["biotoolsID"]) != last_update:
+                changed[tool["biotoolsID"]] = tool
+        page = page + 1 if resp_json["next"] is not None and not reached_watermark else None
+
+    # The count no longer adds up if tools were deleted, so walk the full list to find them
+    new_ids: Set[str] = set(changed) - set(known_tools)
+    if remote_count is not None and remote_count != len(known_tools) + len(new_ids):
+        return None
+
+    for tool_id, tool in changed.items():
+        (report.added if tool_id in new_ids else report.updated).append(tool_id)
+        known_tools[tool_id] = tool.get("lastUpdate") or ""
+    _rewrite_catalogue(store_dir=store_dir, changed=changed, deleted=set())
+    _save_state(store_dir=store_dir, known_tools=known_tools, validators=validators,
+                full_harvest_requests=state["full_harvest_requests"],
+                full_harvest_bytes_per_tool=state["full_harvest_bytes_per_tool"],
+                incremental_syncs=state.get("incremental_syncs", 0) + 1)
+    return report
+
+
+def _full_sync(store_dir: str, base_url: str, session: requests.Session, requests_per_second: float, workers: int,
+               known_tools: Dict[str, str]) -> SyncReport:
+    """
+    Harvest the full catalogue into the store, and compare it with the tools known from the previous sync.
+
+    The HTTP validators are not kept, as they belong to the sorted tool list before the harvest.
+    :param store_dir: The directory with the local catalogue store.
+    :param base_url: The URL of the tool list endpoint.
+    :param session: The session.
+    :param requests_per_second: The sustained number of requests per second.
+    :param workers: The number of concurrent requests.
+    :param known_tools: The dictionary with the tool ID and last update of the previous sync.
+    :return: The report of the sync.
+    """
+    report = SyncReport(full_harvest=True)
+    harvested_tools: Dict[str, str] = {}
+    catalogue_path = os.path.join(store_dir, CATALOGUE_FILE)
+    with open(f"{catalogue_path}.part", "w") as f:
+        for tool in harvest_tools(base_url=base_url, session=session, requests_per_second=requests_per_second,
+                                  burst=workers, workers=workers):
+            f.write(json.dumps(tool))
+            f.write("\n")
+
+            tool_id = tool["biotoolsID"]
+            harvested_tools[tool_id] = tool.get("lastUpdate") or ""
+            if tool_id not in known_tools:
+                report.added.append(tool_id)
+            elif known_tools[tool_id] != harvested_tools[tool_id]:
+                report.updated.append(tool_id)
+    os.replace(f"{catalogue_path}.part", catalogue_path)
+
+    report.deleted = sorted(set(known_tools) - set(harvested_tools))
+    _save_state(store_dir=store_dir, known_tools=harvested_tools, validators={}, full_harvest_requests=0,
+                full_harvest_bytes_per_tool=0.0)
+    return report
+
+
+def _new_report(state: dict) -> SyncReport:
+    """
+    Create the report of an incremental sync, with the estimated cost of a full harvest.
+    :param state: The state of the last sync.
+    :return: The report.
+    """
+    return SyncReport(full_harvest_requests=state["full_harvest_requests"],
+                      full_harvest_bytes=int(len(state["tools"]) * state["full_harvest_bytes_per_tool"]))
+
+
+def _rewrite_catalogue(store_dir: str, changed: Dict[str, dict], deleted: Set[str]):
+    """
+    Apply the changed and deleted tools to the catalogue file, one line at a time.
+    :param store_dir: The directory with the local catalogue store.
+    :param changed: The dictionary with the tool ID and the new or updated tool.
+    :param deleted: The set of deleted tool IDs.
+    """
+    if len(changed) == 0 and len(deleted) == 0:
+        return
+    catalogue_path = os.path.join(store_dir, CATALOGUE_FILE)
+    with open(f"{catalogue_path}.part", "w") as f:
+        for tool in iter_catalogue(store_dir=store_dir):
+            if tool["biotoolsID"] not in changed and tool["biotoolsID"] not in deleted:
+                f.write(json.dumps(tool))
+                f.write("\n")
+        for tool in changed.values():
+            f.write(json.dumps(tool))
+            f.write("\n")
+    os.replace(f"{catalogue_path}.part", catalogue_path)
+
+
+def _load_state(store_dir: str) -> Optional[dict]:
+    """
+    Load the state of the last sync.
+    :param store_dir: The directory with the local catalogue store.
+    :return: The state, or None if the store has never been synced.
+    """
+    state_path = os.path.join(store_dir, STATE_FILE)
+    if not os.path.exists(state_path) or not os.path.exists(os.path.join(store_dir, CATALOGUE_FILE)):
+        return None
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+
+def _save_state(store_dir: str, known_tools: Dict[str, str], validators: dict, full_harvest_requests: int,
+                full_harvest_bytes_per_tool: float, incremental_syncs: int = 0):
+    """
+    Save the state of the sync.
+    :param store_dir: The directory with the local catalogue store.
+    :param known_tools: The dictionary with the tool ID and last update.
+    :param validators: The HTTP validators of the first page of the tool list sorted by last update.
+    :param full_harvest_requests: The number of requests of the last full harvest.
+    :param full_harvest_bytes_per_tool: The number of bytes per tool downloaded by the last full harvest.
+    :param incremental_syncs: The number of incremental syncs since the last full harvest.
+    """
+    state = {"last_update": max(known_tools.values(), default=""), "tools": known_tools, "validators": validators,
+             "full_harvest_requests": full_harvest_requests,
+             "full_harvest_bytes_per_tool": full_harvest_bytes_per_tool, "incremental_syncs": incremental_syncs}
+    state_path = os.path.join(store_dir, STATE_FILE)
+    with open(f"{state_path}.part", "w") as f:
+        json.dump(state, f)
+    os.replace(f"{state_path}.part", state_path)
+
+
+def _update_state_costs(store_dir: str, report: SyncReport):
+    """
+    Record the cost of a full harvest in the state, which is used to report the savings of later syncs.
+    :param store_dir: The directory with the local catalogue store.
+    :param report: The report of the full harvest.
+    """
+    state = _load_state(store_dir=store_dir)
+    _save_state(store_dir=store_dir, known_tools=state["tools"], validators=state["validators"],
+                full_harvest_requests=report.full_harvest_requests,
+                full_harvest_bytes_per_tool=report.full_harvest_bytes / max(1, len(state["tools"])))
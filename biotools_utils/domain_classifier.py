@@ -0,0 +1,234 @@
+"""
+Trainable classifier assigning tools to domains from their EDAM terms and descriptions
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import itertools
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .domain_scoring import DomainCategories, score_tools
+from .edam_term_extractor import TermExtractor
+from .term_matrix import TermMatrix, build_term_matrices
+
+
+def seed_labels(term_matrices: Iterable[TermMatrix], categories: DomainCategories,
+                domain: str = "Domain") -> pd.DataFrame:
+    """
+    Derive weak domain labels from the seed terms of the term categories.
+
+    A tool is in a domain if it has a term of one of the domain's 'Yes' categories, e.g. 'TopicYes', and is not in the
+    domain if it has no term of any of its categories. Tools with only terms of 'Maybe' categories are left unlabelled.
+    :param term_matrices: The tool by term matrices, e.g. of the topics and the operations, with the same tools.
+    :param categories: The compiled categories, either of one domain or of several domains as 'Domain.Category'.
+    :param domain: The domain name used for categories without a domain prefix.
+    :return: The dataframe indexed by the tool ID with one column per domain, with 1 for tools in the domain, 0 for
+        tools not in the domain and NaN for unlabelled tools.
+    """
+    scores = score_tools(term_matrices=term_matrices, categories=categories)
+    domain_columns: Dict[str, List[str]] = {}
+    for name in categories.names:
+        domain_columns.setdefault(name.rsplit(".", 1)[0] if "." in name else domain, []).append(name)
+
+    labels = pd.DataFrame(index=scores.index)
+    for domain_name, columns in domain_columns.items():
+        yes = scores[[column for column in columns if column.endswith("Yes")]].sum(axis=1) > 0
+        any_term = scores[columns].sum(axis=1) > 0
+        labels[domain_name] = np.where(yes, 1.0, np.where(any_term, np.nan, 0.0))
+    return labels
+
+
+def collection_labels(tools: Iterable[dict], domains: Sequence[str]) -> pd.DataFrame:
+    """
+    Label the tools by their membership of the collections named like the domains, e.g. 'Proteomics'.
+    :param tools: The tools.
+    :param domains: The domains, which are also the collection IDs.
+    :return: The dataframe indexed by the tool ID with one column per domain, with 1 for tools in the collection and
+        0 otherwise.
+    """
+    tool_ids: List[str] = []
+    rows: List[List[float]] = []
+    for tool in tools:
+        collections = set(tool.get("collectionID") or [])
+        tool_ids.append(tool["biotoolsID"])
+        rows.append([float(domain in collections) for domain in domains])
+    return pd.DataFrame(rows, index=pd.Index(tool_ids, name="ID"), columns=list(domains))
+
+
+class DomainClassifier:
+    """
+    One-vs-rest logistic regression assigning tools to domains.
+
+    The features of a tool are its EDAM terms, one column per term seen while fitting, and optionally the words of its
+    description hashed to a fixed number of columns, so no word vocabulary has to be kept. After fitting, the model is
+    only a weight matrix, so predicting a batch of tools is one sparse product.
+    """
+
+    def __init__(self, term_types: Sequence[str] = ("topic", "operation"), description_features: int = 0,
+                 regularization: float = 1.0):
+        """
+        Create an unfitted classifier.
+        :param term_types: The term types used as features.
+        :param description_features: The number of hashed description word columns, e.g. 2 ** 18, or 0 to not use
+            the descriptions.
+        :param regularization: The inverse regularisation strength `C` of the logistic regressions.
+        """
+        self.term_types: List[str] = [term_type.lower() for term_type in term_types]
+        self.description_features: int = description_features
+        self.regularization: float = regularization
+        self.vocabularies: Dict[str, List[str]] = {}
+        self.domains: List[str] = []
+        self.weights: Optional[np.ndarray] = None
+        self.intercepts: Optional[np.ndarray] = None
+
+    def fit(self, tools: Iterable[dict], labels: Optional[pd.DataFrame] = None,
+            categories: Optional[DomainCategories] = None, domain: str = "Domain") -> "DomainClassifier":
+        """
+        Fit one logistic regression per domain.
+        :param tools: The training tools.
+        :param labels: The dataframe indexed by the tool ID with one column per domain, with 1 for tools in the
+            domain, 0 for tools not in the domain and NaN for unlabelled tools. Tools missing from the dataframe are
+            unlabelled. If None, the labels are derived from the seed terms of the categories with `seed_labels`.
+        :param categories: The term categories used if no labels are given.
+        :param domain: The domain name used for categories without a domain prefix.
+        :return: The fitted classifier.
+        """
+        from sklearn.linear_model import LogisticRegression
+
+        self.vocabularies = {}
+        tool_ids, term_matrices, descriptions = self._extract(tools)
+        self.vocabularies = {term_type: term_matrix.terms for term_type, term_matrix in term_matrices.items()}
+        if labels is None:
+            if categories is None:
+                raise ValueError("Either the labels or the categories are required.")
+            labels = seed_labels(term_matrices=term_matrices.values(), categories=categories, domain=domain)
+        labels = labels.reindex(pd.Index(tool_ids, name="ID"))
+        features = self._features(term_matrices=term_matrices, descriptions=descriptions)
+
+        self.domains = [str(domain_name) for domain_name in labels.columns]
+        self.weights = np.zeros((features.shape[1], len(self.domains)), dtype=np.float32)
+        self.intercepts = np.zeros(len(self.domains), dtype=np.float32)
+        for column, domain_name in enumerate(labels.columns):
+            domain_labels = labels[domain_name].to_numpy(dtype=np.float64)
+            labelled = np.flatnonzero(~np.isnan(domain_labels))
+            if len(np.unique(domain_labels[labelled])) < 2:
+                raise ValueError(f"The domain '{domain_name}' needs both tools in and not in the domain.")
+            model = LogisticRegression(C=self.regularization, solver="liblinear", class_weight="balanced")
+            model.fit(features[labelled], domain_labels[labelled].astype(int))
+            self.weights[:, column] = model.coef_[0]
+            self.intercepts[column] = model.intercept_[0]
+        return self
+
+    def predict_proba(self, tools: Iterable[dict], batch_size: int = 10000) -> pd.DataFrame:
+        """
+        Compute the probability of each tool being in each domain, a batch of tools at a time.
+        :param tools: The tools, e.g. streamed from a dump with `iter_tools`.
+        :param batch_size: The number of tools per batch.
+        :return: The dataframe indexed by the tool ID with one column per domain.
+        """
+        if self.weights is None:
+            raise ValueError("The classifier is not fitted.")
+        tools = iter(tools)
+        frames: List[pd.DataFrame] = []
+        for batch in iter(lambda: list(itertools.islice(tools, batch_size)), []):
+            tool_ids, term_matrices, descriptions = self._extract(batch)
+            logits = self._features(term_matrices=term_matrices, descriptions=descriptions) @ self.weights
+            probabilities = 1 / (1 + np.exp(-(logits + self.intercepts)))
+            frames.append(pd.DataFrame(probabilities, index=pd.Index(tool_ids, name="ID"), columns=self.domains))
+        if len(frames) == 0:
+            return pd.DataFrame(columns=self.domains, index=pd.Index([], name="ID"), dtype=np.float32)
+        return pd.concat(frames)
+
+    def predict_domains(self, tools: Iterable[dict], threshold: float = 0.5,
+                        batch_size: int = 10000) -> Dict[str, List[str]]:
+        """
+        Assign the tools to the domains with a probability of at least the threshold.
+        :param tools: The tools, e.g. streamed from a dump with `iter_tools`.
+        :param threshold: The smallest probability of an assigned domain.
+        :param batch_size: The number of tools per batch.
+        :return: The dictionary with the tool ID and its domains, by decreasing probability.
+        """
+        probabilities = self.predict_proba(tools=tools, batch_size=batch_size)
+        values = probabilities.to_numpy()
+        order = np.argsort(-values, axis=1, kind="stable")
+        return {tool_id: [self.domains[column] for column in order[row] if values[row, column] >= threshold]
+                for row, tool_id in enumerate(probabilities.index)}
+
+    def save(self, path: str):
+        """
+        Save the fitted classifier to a binary file.
+        :param path: The path of the file.
+        """
+        if self.weights is None:
+            raise ValueError("The classifier is not fitted.")
+        vocabularies = {f"vocabulary_{term_type}": np.array(self.vocabularies[term_type], dtype=str)
+                        for term_type in self.term_types}
+        with open(path, "wb") as f:
+            np.savez(f, term_types=np.array(self.term_types, dtype=str), domains=np.array(self.domains, dtype=str),
+                     description_features=np.array(self.description_features),
+                     regularization=np.array(self.regularization), weights=self.weights, intercepts=self.intercepts,
+                     **vocabularies)
+
+    @classmethod
+    def load(cls, path: str) -> "DomainClassifier":
+        """
+        Load a classifier saved with `save`.
+        :param path: The path of the file.
+        :return: The fitted classifier.
+        """
+        with np.load(path, allow_pickle=False) as model:
+            classifier = cls(term_types=model["term_types"].tolist(),
+                             description_features=int(model["description_features"]),
+                             regularization=float(model["regularization"]))
+            classifier.vocabularies = {term_type: model[f"vocabulary_{term_type}"].tolist()
+                                       for term_type in classifier.term_types}
+            classifier.domains = model["domains"].tolist()
+            classifier.weights = model["weights"]
+            classifier.intercepts = model["intercepts"]
+        return classifier
+
+    def _extract(self, tools: Iterable[dict]) -> Tuple[List[str], Dict[str, TermMatrix], List[str]]:
+        """
+        Extract the terms and descriptions of the tools in one pass.
+        :param tools: The tools.
+        :return: The tool IDs, the term matrices with the fitted vocabularies as columns, and the descriptions.
+        """
+        extractor = TermExtractor()
+        descriptions: List[str] = []
+        for tool in tools:
+            extractor.add(tool)
+            descriptions.append(tool.get("description") or "")
+        terms = extractor.result()
+        term_matrices = build_term_matrices(tools=terms, term_types=self.term_types, terms=self.vocabularies or None)
+        return terms.tool_ids, term_matrices, descriptions
+
+    def _features(self, term_matrices: Dict[str, TermMatrix], descriptions: List[str]) -> sparse.csr_matrix:
+        """
+        Combine the term matrices and the hashed descriptions to the feature matrix.
+        :param term_matrices: The term matrices.
+        :param descriptions: The descriptions.
+        :return: The feature matrix with one row per tool.
+        """
+        blocks = [term_matrices[term_type].matrix for term_type in self.term_types]
+        if self.description_features > 0:
+            from sklearn.feature_extraction.text import HashingVectorizer
+
+            vectorizer = HashingVectorizer(n_features=self.description_features, alternate_sign=False,
+                                           stop_words="english", norm="l2")
+            blocks.append(vectorizer.transform(descriptions))
+        return sparse.hstack(blocks, format="csr", dtype=np.float32)
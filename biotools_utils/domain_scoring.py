@@ -0,0 +1,116 @@
+"""
+Scoring of tools against weighted domain term categories
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .term_matrix import TermMatrix
+
+
+@dataclass
+class DomainCategories:
+    """
+    Term categories compiled to a sparse term by category weight matrix, where element (i, j) is the weight of the
+    term `terms[i]` in the category `names[j]`.
+    """
+    names: List[str]
+    terms: List[str]
+    weights: sparse.csr_matrix
+
+
+def compile_categories(categories: dict, category_weights: Optional[Dict[str, float]] = None) -> DomainCategories:
+    """
+    Compile term categories to a weight matrix.
+
+    The categories use the format of `term_categories.json`, i.e. a dictionary with the category name and the list of
+    terms, each a dictionary with the 'uri' term ID and optionally a 'weight'. Several domains can be compiled at once
+    by nesting the categories in a dictionary with the domain name, in which case the category names are prefixed by
+    the domain name, e.g. 'Proteomics.TopicYes'.
+    :param categories: The categories, or the dictionary with the domain name and its categories.
+    :param category_weights: The dictionary with the category name and the default weight of its terms. Categories not
+        in the dictionary use the weight 1.
+    :return: The compiled categories.
+    """
+    category_weights = category_weights or {}
+    flat_categories: Dict[str, list] = {}
+    for name, value in categories.items():
+        if isinstance(value, dict):
+            flat_categories.update({f"{name}.{category}": terms for category, terms in value.items()})
+        else:
+            flat_categories[name] = value
+
+    term_rows: Dict[str, int] = {}
+    # A term listed twice in a category keeps the weight of its first entry, as the matrix would sum the duplicates
+    entries: Dict[Tuple[int, int], float] = {}
+    for column, (name, terms) in enumerate(flat_categories.items()):
+        default_weight = category_weights.get(name, category_weights.get(name.rsplit(".", 1)[-1], 1.0))
+        for term in terms:
+            entries.setdefault((term_rows.setdefault(term["uri"], len(term_rows)), column),
+                               float(term.get("weight", default_weight)))
+
+    rows = [row for row, _ in entries]
+    columns = [column for _, column in entries]
+    matrix = sparse.csr_matrix((list(entries.values()), (rows, columns)), shape=(len(term_rows), len(flat_categories)))
+    return DomainCategories(names=list(flat_categories), terms=list(term_rows), weights=matrix)
+
+
+def load_categories(path: str, category_weights: Optional[Dict[str, float]] = None) -> DomainCategories:
+    """
+    Load and compile term categories, e.g. `Resources/term_categories.json`.
+    :param path: The path of the JSON file.
+    :param category_weights: The dictionary with the category name and the default weight of its terms.
+    :return: The compiled categories.
+    """
+    with open(path, "r") as f:
+        return compile_categories(categories=json.load(f), category_weights=category_weights)
+
+
+def score_tools(term_matrices: Iterable[TermMatrix], categories: DomainCategories) -> pd.DataFrame:
+    """
+    Score all tools against all categories at once.
+
+    The score of a tool in a category is the sum of the weights of its terms in the category, which is the number of
+    its terms in the category for unweighted categories. The scores are computed as the product of each tool by term
+    matrix with the rows of the weight matrix for its terms.
+    :param term_matrices: The tool by term matrices, e.g. of the topics and the operations, with the same tools.
+    :param categories: The compiled categories.
+    :return: The dataframe indexed by the tool ID, with one column per category.
+    """
+    term_rows = {term: row for row, term in enumerate(categories.terms)}
+    scores: Optional[np.ndarray] = None
+    tool_ids: List[str] = []
+    for term_matrix in term_matrices:
+        rows = np.array([term_rows.get(term, -1) for term in term_matrix.terms], dtype=np.int64)
+        # Terms in no category get an empty row in the aligned weight matrix
+        selector = sparse.csr_matrix((np.ones(int((rows >= 0).sum())), (np.flatnonzero(rows >= 0), rows[rows >= 0])),
+                                     shape=(len(term_matrix.terms), len(categories.terms)))
+        matrix_scores = (term_matrix.matrix @ (selector @ categories.weights)).toarray()
+        if scores is None:
+            scores, tool_ids = matrix_scores, term_matrix.tool_ids
+        elif term_matrix.tool_ids != tool_ids:
+            raise ValueError("The term matrices must have the same tools in the same order.")
+        else:
+            scores += matrix_scores
+
+    if scores is None:
+        raise ValueError("At least one term matrix is required.")
+    return pd.DataFrame(scores, index=pd.Index(tool_ids, name="ID"), columns=categories.names)
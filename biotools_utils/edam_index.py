@@ -0,0 +1,273 @@
+"""
+EDAM term index with the precomputed ancestor closure
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+    from .term_matrix import TermMatrix
+
+
+class EdamIndex:
+    """
+    Index of EDAM terms loaded from the `*_index.json` files in the Resources directory.
+
+    The term IDs are interned to integer codes, and for every term the set of its ancestors, including the term itself,
+    is kept as a row of a packed bit matrix. This makes "is X under Y" a single bit lookup, and the descendants of a
+    term a single column of the matrix.
+    """
+
+    def __init__(self, term_ids: Sequence[str], names: Sequence[str], depths: np.ndarray, ancestor_bits: np.ndarray):
+        """
+        Create the index. Use `EdamIndex.load` or `EdamIndex.from_index_data` to create an index.
+        :param term_ids: The term IDs in code order.
+        :param names: The term names in code order.
+        :param depths: The depth of each term, where the root has depth 0.
+        :param ancestor_bits: The packed bit matrix, where bit j of row i is set if term j is term i or an ancestor.
+        """
+        self.term_ids: List[str] = list(term_ids)
+        self.names: List[str] = list(names)
+        self.depths: np.ndarray = depths
+        self.codes: Dict[str, int] = {term_id: code for code, term_id in enumerate(self.term_ids)}
+        self._ancestor_bits: np.ndarray = ancestor_bits
+        self._ancestors: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_index_data(cls, *indexes: dict) -> "EdamIndex":
+        """
+        Create the index from the 'data' dictionaries of one or more index files.
+        :param indexes: The dictionaries with the term ID and the term.
+        :return: The index.
+        """
+        paths: Dict[str, List[List[str]]] = {}
+        names: Dict[str, str] = {}
+        for index in indexes:
+            for term_id, term in index.items():
+                names[term_id] = term["name"]
+                paths[term_id] = [path["key"].split("||") for path in term["path"]] or [[term_id]]
+                # Terms only seen in paths still get a code, so the closure is complete
+                for path in paths[term_id]:
+                    for path_term in path:
+                        names.setdefault(path_term, path_term)
+
+        term_ids = sorted(names)
+        codes = {term_id: code for code, term_id in enumerate(term_ids)}
+        ancestors = np.zeros((len(term_ids), len(term_ids)), dtype=bool)
+        depths = np.zeros(len(term_ids), dtype=np.int16)
+        for term_id, code in codes.items():
+            ancestors[code, code] = True
+            term_paths = paths.get(term_id, [])
+            for path in term_paths:
+                ancestors[code, [codes[path_term] for path_term in path]] = True
+            if len(term_paths) > 0:
+                depths[code] = min(len(path) for path in term_paths) - 1
+
+        return cls(term_ids=term_ids, names=[names[term_id] for term_id in term_ids], depths=depths,
+                   ancestor_bits=np.packbits(ancestors, axis=1))
+
+    @classmethod
+    def load(cls, *index_paths: str, cache_path: Optional[str] = None) -> "EdamIndex":
+        """
+        Load the index from one or more index files, e.g. `topic_index.json` and `operation_index.json`.
+
+        If a cache path is given, the index is read from the binary cache when it is newer than the index files and
+        was built from the same index files, and the cache is written otherwise.
+        :param index_paths: The paths of the index files.
+        :param cache_path: The path of the binary cache, or None to always parse the index files.
+        :return: The index.
+        """
+        if cache_path is not None and os.path.exists(cache_path) and \
+                all(os.path.getmtime(cache_path) >= os.path.getmtime(path) for path in index_paths):
+            cached = cls.load_cache(cache_path, index_paths=index_paths)
+            if cached is not None:
+                return cached
+
+        indexes = []
+        for path in index_paths:
+            with open(path, "r") as f:
+                indexes.append(json.load(f)["data"])
+        index = cls.from_index_data(*indexes)
+        if cache_path is not None:
+            index.save(cache_path, index_paths=index_paths)
+        return index
+
+    @classmethod
+    def load_cache(cls, cache_path: str, index_paths: Optional[Sequence[str]] = None) -> Optional["EdamIndex"]:
+        """
+        Load the index from a binary cache written by `save`.
+        :param cache_path: The path of the cache.
+        :param index_paths: The paths of the index files the cache must have been built from, or None to not check.
+        :return: The index, or None if the cache has another format or was built from other index files.
+        """
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if "term_ids" not in cache or "ancestor_bits" not in cache:
+                return None
+            if index_paths is not None and not same_index_sources(cache=cache, index_paths=index_paths):
+                return None
+            return cls(term_ids=cache["term_ids"].tolist(), names=cache["names"].tolist(), depths=cache["depths"],
+                       ancestor_bits=cache["ancestor_bits"])
+
+    def save(self, cache_path: str, index_paths: Sequence[str] = ()):
+        """
+        Save the index to a binary cache.
+        :param cache_path: The path of the cache.
+        :param index_paths: The paths of the index files the index was built from, which are recorded in the cache.
+        """
+        with open(cache_path, "wb") as f:
+            np.savez(f, term_ids=np.array(self.term_ids), names=np.array(self.names), depths=self.depths,
+                     ancestor_bits=self._ancestor_bits, **index_sources(index_paths))
+
+    def __len__(self) -> int:
+        return len(self.term_ids)
+
+    def __contains__(self, term_id: str) -> bool:
+        return term_id in self.codes
+
+    @property
+    def ancestor_matrix(self) -> np.ndarray:
+        """
+        The unpacked boolean matrix, where element (i, j) is True if term j is term i or one of its ancestors.
+        """
+        if self._ancestors is None:
+            self._ancestors = np.unpackbits(self._ancestor_bits, axis=1, count=len(self)).astype(bool)
+        return self._ancestors
+
+    def name(self, term_id: str) -> str:
+        """
+        Get the name of a term.
+        :param term_id: The term ID, e.g. 'topic_0121'.
+        :return: The name.
+        """
+        return self.names[self.codes[term_id]]
+
+    def depth(self, term_id: str) -> int:
+        """
+        Get the depth of a term, i.e. the length of its shortest path from the root.
+        :param term_id: The term ID.
+        :return: The depth.
+        """
+        return int(self.depths[self.codes[term_id]])
+
+    def is_under(self, term_id: str, ancestor_id: str) -> bool:
+        """
+        Check if a term is an ancestor term or one of its descendants.
+        :param term_id: The term ID.
+        :param ancestor_id: The ID of the ancestor term.
+        :return: True if the term is under the ancestor.
+        """
+        code = self.codes.get(term_id)
+        ancestor_code = self.codes.get(ancestor_id)
+        if code is None or ancestor_code is None:
+            return False
+        return bool(self._ancestor_bits[code, ancestor_code >> 3] & (0x80 >> (ancestor_code & 7)))
+
+    def ancestors(self, term_id: str, include_self: bool = False) -> List[str]:
+        """
+        Get the ancestors of a term along all its paths.
+        :param term_id: The term ID.
+        :param include_self: Whether to include the term itself.
+        :return: The ancestor term IDs, from the root down.
+        """
+        code = self.codes[term_id]
+        ancestor_codes = np.flatnonzero(self.ancestor_matrix[code])
+        ancestor_codes = ancestor_codes[np.argsort(self.depths[ancestor_codes], kind="stable")]
+        return [self.term_ids[c] for c in ancestor_codes if include_self or c != code]
+
+    def descendants(self, term_id: str, include_self: bool = False) -> List[str]:
+        """
+        Get all descendants of a term.
+        :param term_id: The term ID.
+        :param include_self: Whether to include the term itself.
+        :return: The descendant term IDs.
+        """
+        code = self.codes[term_id]
+        return [self.term_ids[c] for c in np.flatnonzero(self.ancestor_matrix[:, code]) if include_self or c != code]
+
+    def lowest_common_ancestor(self, term_id: str, other_term_id: str) -> Optional[str]:
+        """
+        Get the deepest term that both terms are under.
+        :param term_id: The term ID.
+        :param other_term_id: The other term ID.
+        :return: The ID of the lowest common ancestor, or None if the terms are in different branches.
+        """
+        common = np.unpackbits(self._ancestor_bits[self.codes[term_id]] &
+                               self._ancestor_bits[self.codes[other_term_id]], count=len(self))
+        common_codes = np.flatnonzero(common)
+        if len(common_codes) == 0:
+            return None
+        return self.term_ids[common_codes[np.argmax(self.depths[common_codes])]]
+
+    def closure_matrix(self, terms: Sequence[str]) -> "sparse.csr_matrix":
+        """
+        Get the sparse matrix mapping each of the given terms to itself and all its ancestors.
+
+        Multiplying a tool by term matrix with the columns `terms` by this matrix gives, for every tool and index term,
+        the number of the tool's terms under the index term.
+        :param terms: The terms, e.g. the columns of a term matrix. Terms not in the index only map to nothing.
+        :return: The matrix with one row per term and one column per index term.
+        """
+        from scipy import sparse
+
+        ancestors = self.ancestor_matrix
+        rows = np.array([self.codes.get(term, -1) for term in terms], dtype=np.int64)
+        closure = np.zeros((len(terms), len(self)), dtype=bool)
+        known = rows >= 0
+        closure[known] = ancestors[rows[known]]
+        return sparse.csr_matrix(closure, dtype=np.int32)
+
+    def tools_under(self, term_id: str, term_matrix: "TermMatrix") -> List[str]:
+        """
+        Get the tools annotated with a term or any of its descendants.
+        :param term_id: The term ID, e.g. 'topic_0121' for Proteomics.
+        :param term_matrix: The tool by term matrix.
+        :return: The IDs of the tools.
+        """
+        code = self.codes[term_id]
+        under = self.ancestor_matrix[:, code]
+        columns = np.array([term in self.codes and under[self.codes[term]] for term in term_matrix.terms], dtype=bool)
+        rows = np.flatnonzero(term_matrix.matrix[:, columns].getnnz(axis=1) > 0)
+        return [term_matrix.tool_ids[row] for row in rows]
+
+
+def index_sources(index_paths: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Describe the index files a binary cache is built from, to check that a cache belongs to the files it is loaded for.
+    :param index_paths: The paths of the index files.
+    :return: The dictionary with the sorted absolute paths of the files and their sizes, as arrays for `np.savez`.
+    """
+    paths = sorted(os.path.abspath(path) for path in index_paths)
+    return {"source_paths": np.array(paths, dtype=str),
+            "source_sizes": np.array([os.path.getsize(path) for path in paths], dtype=np.int64)}
+
+
+def same_index_sources(cache, index_paths: Sequence[str]) -> bool:
+    """
+    Check if a binary cache was built from the given index files.
+    :param cache: The loaded cache, e.g. from `np.load`.
+    :param index_paths: The paths of the index files.
+    :return: True if the cache records the same files with the same sizes.
+    """
+    if "source_paths" not in cache or "source_sizes" not in cache:
+        return False
+    sources = index_sources(index_paths)
+    return cache["source_paths"].tolist() == sources["source_paths"].tolist() and \
+        cache["source_sizes"].tolist() == sources["source_sizes"].tolist()
@@ -17,13 +17,148 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 import itertools
+from array import array
 from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List
 
+EDAM_PREFIX: str = "http://edamontology.org/"
+TERM_TYPES: tuple = ("topic", "operation", "data", "format")
 
-def extract_terms(tools: list, term_type: str) -> dict:
+
+@dataclass
+class ExtractedTerms:
+    """
+    The EDAM terms of a batch of tools.
+
+    For each term type, the codes of the terms of the tool `tool_ids[i]` are `codes[term_type][offsets[term_type][i]:
+    offsets[term_type][i + 1]]`, and each code is the position of the term ID, e.g. 'topic_0121', in
+    `vocabularies[term_type]`. The terms of a tool are unique and in the order of the tool record.
+    """
+    tool_ids: List[str]
+    vocabularies: Dict[str, List[str]]
+    codes: Dict[str, array]
+    offsets: Dict[str, array]
+
+    def get_codes(self, term_type: str, row: int) -> array:
+        """
+        Get the term codes of a tool.
+        :param term_type: The term type.
+        :param row: The position of the tool in `tool_ids`.
+        :return: The codes.
+        """
+        term_type = term_type.lower()
+        offsets = self.offsets[term_type]
+        return self.codes[term_type][offsets[row]:offsets[row + 1]]
+
+    def get_terms(self, term_type: str, row: int) -> List[str]:
+        """
+        Get the term IDs of a tool.
+        :param term_type: The term type.
+        :param row: The position of the tool in `tool_ids`.
+        :return: The term IDs.
+        """
+        vocabulary = self.vocabularies[term_type.lower()]
+        return [vocabulary[code] for code in self.get_codes(term_type=term_type, row=row)]
+
+
+class TermExtractor:
+    """
+    Extract the topics, operations, data and formats of tools in a single traversal of each tool record.
+
+    The tools can be added one at a time, e.g. while streaming a dump, and the EDAM URIs are interned, so the prefix
+    is only stripped the first time a URI is seen.
+    """
+
+    def __init__(self):
+        self.tool_ids: List[str] = []
+        self.vocabularies: Dict[str, List[str]] = {term_type: [] for term_type in TERM_TYPES}
+        self.codes: Dict[str, array] = {term_type: array("i") for term_type in TERM_TYPES}
+        self.offsets: Dict[str, array] = {term_type: array("q", [0]) for term_type in TERM_TYPES}
+        self._uri_codes: Dict[str, Dict[str, int]] = {term_type: {} for term_type in TERM_TYPES}
+        self._term_codes: Dict[str, Dict[str, int]] = {term_type: {} for term_type in TERM_TYPES}
+
+    def add(self, tool: dict) -> int:
+        """
+        Extract the terms of a tool.
+        :param tool: The tool.
+        :return: The position of the tool in the result.
+        """
+        operations: list = []
+        data: list = []
+        formats: list = []
+        for function in tool.get("function") or []:
+            operations.extend(function.get("operation") or [])
+            for io in itertools.chain(function.get("input") or [], function.get("output") or []):
+                if "data" in io:
+                    data.append(io["data"])
+                formats.extend(io.get("format") or [])
+
+        self._add_terms(term_type="topic", terms=tool.get("topic") or [])
+        self._add_terms(term_type="operation", terms=operations)
+        self._add_terms(term_type="data", terms=data)
+        self._add_terms(term_type="format", terms=formats)
+        self.tool_ids.append(tool["biotoolsID"])
+        return len(self.tool_ids) - 1
+
+    def result(self) -> ExtractedTerms:
+        """
+        Get the terms of the tools added so far.
+        :return: The extracted terms.
+        """
+        return ExtractedTerms(tool_ids=self.tool_ids, vocabularies=self.vocabularies, codes=self.codes,
+                              offsets=self.offsets)
+
+    def _add_terms(self, term_type: str, terms: list):
+        """
+        Intern the terms of a tool and append their unique codes.
+        :param term_type: The term type.
+        :param terms: The terms, each a dictionary with the URI.
+        """
+        uri_codes = self._uri_codes[term_type]
+        codes = self.codes[term_type]
+        start = len(codes)
+        for term in terms:
+            uri = term["uri"]
+            code = uri_codes.get(uri)
+            if code is None:
+                code = self._intern(term_type=term_type, uri=uri)
+            if code not in codes[start:]:
+                codes.append(code)
+        self.offsets[term_type].append(len(codes))
+
+    def _intern(self, term_type: str, uri: str) -> int:
+        """
+        Get the code of a URI seen for the first time.
+        :param term_type: The term type.
+        :param uri: The EDAM URI.
+        :return: The code.
+        """
+        term_id = uri[len(EDAM_PREFIX):] if uri.startswith(EDAM_PREFIX) else uri
+        term_codes = self._term_codes[term_type]
+        if term_id not in term_codes:
+            term_codes[term_id] = len(self.vocabularies[term_type])
+            self.vocabularies[term_type].append(term_id)
+        self._uri_codes[term_type][uri] = term_codes[term_id]
+        return term_codes[term_id]
+
+
+def extract_all_terms(tools: Iterable[dict]) -> ExtractedTerms:
+    """
+    Extract the topics, operations, data and formats of the tools in a single pass.
+    :param tools: The tools.
+    :return: The extracted terms.
+    """
+    extractor = TermExtractor()
+    for tool in tools:
+        extractor.add(tool)
+    return extractor.result()
+
+
+def extract_terms(tools: Iterable[dict], term_type: str) -> dict:
     """
     Extract terms from the tools.
-    :param tools: The list of tools.
+    :param tools: The tools.
     :param term_type: The term type.
     :return: The dictionary with the tool ID and the terms.
     """
@@ -42,10 +177,10 @@ def extract_terms(tools: list, term_type: str) -> dict:
                          f"'Data'.")
 
 
-def _extract_edam_topics(tools: list) -> dict:
+def _extract_edam_topics(tools: Iterable[dict]) -> dict:
     """
     Get the EDAM topics for each tool.
-    :param tools: The list of tools.
+    :param tools: The tools.
     :return: The dictionary with the tool id and the topics.
     """
     terms: defaultdict = defaultdict(lambda: [])
@@ -56,10 +191,10 @@ def _extract_edam_topics(tools: list) -> dict:
     return terms
 
 
-def _extract_edam_operation(tools: list) -> dict:
+def _extract_edam_operation(tools: Iterable[dict]) -> dict:
     """
     Get the EDAM operation for each tool.
-    :param tools: The list of tools.
+    :param tools: The tools.
     :return: The dictionary with the tool id and the operations.
     """
     terms: defaultdict = defaultdict(lambda: [])
@@ -74,10 +209,10 @@ def _extract_edam_operation(tools: list) -> dict:
     return terms
 
 
-def _extract_edam_format(tools: list) -> dict:
+def _extract_edam_format(tools: Iterable[dict]) -> dict:
     """
     Get the EDAM format for each tool.
-    :param tools: The list of tools.
+    :param tools: The tools.
     :return: The dictionary with the tool id and the formats.
     """
     terms: defaultdict = defaultdict(lambda: [])
@@ -87,10 +222,10 @@ def _extract_edam_format(tools: list) -> dict:
     return terms
 
 
-def _extract_edam_data(tools: list) -> dict:
+def _extract_edam_data(tools: Iterable[dict]) -> dict:
     """
     Get the EDAM data for each tool.
-    :param tools: The list of tools.
+    :param tools: The tools.
     :return: The dictionary with the tool id and the topics.
     """
     terms: defaultdict = defaultdict(lambda: [])
@@ -0,0 +1,193 @@
+"""
+HTTP helpers for talking to the bio.tools API
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# The seconds to wait for the server to connect or send data, so a stalled connection does not hang a worker forever
+REQUEST_TIMEOUT: float = 30.0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to keep a request budget towards an API.
+
+    The bucket is refilled with `rate` tokens per second up to `capacity` tokens, and each request consumes one
+    token. Callers block in `acquire` until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Create the token bucket.
+        :param rate: The number of tokens added per second.
+        :param capacity: The maximum number of tokens, i.e. the allowed burst size.
+        """
+        if rate <= 0:
+            raise ValueError(f"The rate must be positive, got '{rate}'.")
+        if capacity < 1:
+            raise ValueError(f"The capacity must be at least 1, got '{capacity}'.")
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self._tokens: float = capacity
+        self._last_refill: float = time.monotonic()
+        self._lock: threading.Lock = threading.Lock()
+
+    def _refill(self):
+        """
+        Add the tokens accumulated since the last refill. Must be called with the lock held.
+        """
+        now = time.monotonic()
+        if now > self._last_refill:
+            self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+
+    def acquire(self):
+        """
+        Take one token from the bucket, waiting until one is available.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                # The last refill lies in the future while the bucket is paused
+                wait_time = max(0.0, self._last_refill - time.monotonic()) + (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+    Token bucket which adapts its rate to the health of the server.
+
+    The rate grows additively after each successful request up to `max_rate`, and is halved down to `min_rate` when
+    the server answers with 429 or a 5xx status. A `Retry-After` from the server pauses the bucket for that long.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, min_rate: float = 0.1, max_rate: float = 20.0,
+                 increase: float = 0.5):
+        """
+        Create the token bucket.
+        :param rate: The initial number of tokens added per second.
+        :param capacity: The maximum number of tokens, i.e. the allowed burst size.
+        :param min_rate: The lowest rate after backing off.
+        :param max_rate: The highest rate after speeding up.
+        :param increase: The rate added after each successful request.
+        """
+        super().__init__(rate=rate, capacity=capacity)
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.increase: float = increase
+
+    def on_success(self):
+        """
+        Speed up after a successful request.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """
+        Back off after the server signalled that it is overloaded.
+        :param retry_after: The number of seconds the server asked to wait, if any.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after is not None and retry_after > 0:
+                # Push the next refill into the future, so no token is available before the server is ready
+                self._last_refill = max(self._last_refill, time.monotonic() + retry_after)
+
+
+class ProgressJournal:
+    """
+    Append-only journal of the outcome of each item of a bulk operation, so a re-run can skip the finished items.
+
+    Each line holds the item ID and its status separated by a tab, and the last line of an item wins.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open the journal, reading the statuses recorded by earlier runs.
+        :param path: The path of the journal file.
+        """
+        self.path: str = path
+        self.statuses: Dict[str, str] = {}
+        self._lock: threading.Lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    item_id, _, status = line.rstrip("\n").partition("\t")
+                    if item_id:
+                        self.statuses[item_id] = status
+
+    def is_done(self, item_id: str, done_statuses: Iterable[str]) -> bool:
+        """
+        Check if an item has one of the given statuses.
+        :param item_id: The item ID.
+        :param done_statuses: The statuses of finished items.
+        :return: True if the item is finished.
+        """
+        return self.statuses.get(item_id) in set(done_statuses)
+
+    def record(self, item_id: str, status: str):
+        """
+        Record the status of an item, and flush it to disk immediately.
+        :param item_id: The item ID.
+        :param status: The status.
+        """
+        with self._lock:
+            self.statuses[item_id] = status
+            with open(self.path, "a") as f:
+                f.write(f"{item_id}\t{status}\n")
+
+
+def retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    """
+    Get the number of seconds from the `Retry-After` header of a response.
+    :param resp: The response.
+    :return: The number of seconds, or None if the header is missing or is not a number of seconds.
+    """
+    try:
+        return float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def create_session(pool_size: int = 10, retries: int = 3) -> requests.Session:
+    """
+    Create a session with a connection pool, which keeps the connections alive between requests.
+    :param pool_size: The number of connections kept in the pool per host.
+    :param retries: The number of retries on connection errors and 5xx responses for idempotent requests.
+    :return: The session.
+    """
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=frozenset({"GET", "HEAD"}))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
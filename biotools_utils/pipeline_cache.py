@@ -0,0 +1,260 @@
+"""
+Content-addressed cache of the outputs of pipeline stages, with size-bounded LRU eviction on disk
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from types import ModuleType
+from typing import Callable, Dict, List, Optional, Sequence
+
+DEFAULT_MAX_BYTES: int = 2 * 1024 ** 3
+INDEX_FILE: str = "index.json"
+DIGESTS_FILE: str = "digests.json"
+
+
+@dataclass
+class CacheStats:
+    """
+    The stages run and reused by a stage cache, and the entries evicted to keep it under its size.
+    """
+    hits: List[str] = field(default_factory=list)
+    misses: List[str] = field(default_factory=list)
+    evicted: int = 0
+
+
+class StageCache:
+    """
+    Cache of the outputs of pipeline stages in a directory, with one subdirectory per output.
+
+    The key of an output is the hash of the stage name, the contents of its input files, its parameters and the
+    version of its code, so a stage is only run again if one of these changed. Outputs of other stages of the cache
+    are keyed by their own key instead of their contents, so a chain of stages is keyed without reading the outputs.
+    The hashes of the input files are remembered by their size and modification time, so unchanged files are only
+    read once. When the cache is closed and the outputs take more than `max_bytes`, the least recently used outputs
+    are removed. Nothing is removed while the cache is open, as later stages may still read the outputs.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Open or create a cache.
+        :param cache_dir: The cache directory.
+        :param max_bytes: The largest total size of the outputs in bytes.
+        """
+        self.cache_dir: str = os.path.abspath(cache_dir)
+        self.max_bytes: int = max_bytes
+        self.stats: CacheStats = CacheStats()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._entries: Dict[str, dict] = self._load_json(INDEX_FILE)
+        self._digests: Dict[str, dict] = self._load_json(DIGESTS_FILE)
+
+    def key(self, stage: str, inputs: Sequence[str] = (), params: Optional[dict] = None,
+            code_version: str = "") -> str:
+        """
+        Compute the key of the output of a stage.
+        :param stage: The name of the stage.
+        :param inputs: The paths of the input files and directories, including outputs of other stages.
+        :param params: The parameters of the stage, which must be serialisable to JSON.
+        :param code_version: The version of the code of the stage.
+        :return: The key.
+        """
+        description = {"stage": stage, "inputs": [self._input_digest(path) for path in inputs],
+                       "params": params or {}, "code_version": code_version}
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        """
+        Get the path of the output of a key.
+        :param key: The key.
+        :return: The path of the output directory.
+        """
+        return os.path.join(self.cache_dir, key)
+
+    def run(self, stage: str, build: Callable[..., None], inputs: Sequence[str] = (), params: Optional[dict] = None,
+            code_version: Optional[str] = None) -> str:
+        """
+        Get the output of a stage from the cache, or build it if it is not cached.
+        :param stage: The name of the stage.
+        :param build: The function building the output, called as `build(output_path, *inputs, **params)` with the
+            directory to write the output to.
+        :param inputs: The paths of the input files and directories, including outputs of other stages.
+        :param params: The parameters of the stage passed to `build`, which must be serialisable to JSON.
+        :param code_version: The version of the code of the stage. If None, the hash of the source code of `build`
+            is used, so changing the stage invalidates its outputs.
+        :return: The path of the output directory.
+        """
+        if code_version is None:
+            code_version = _source_digest(build)
+        key = self.key(stage=stage, inputs=inputs, params=params, code_version=code_version)
+        output_path = self.path(key)
+        if key in self._entries and os.path.isdir(output_path):
+            self.stats.hits.append(stage)
+        else:
+            self.stats.misses.append(stage)
+            # Build in a temporary directory, so an interrupted stage never leaves a partial output under its key
+            build_path = tempfile.mkdtemp(prefix=f".{key}.", dir=self.cache_dir)
+            try:
+                build(build_path, *inputs, **(params or {}))
+                shutil.rmtree(output_path, ignore_errors=True)
+                os.replace(build_path, output_path)
+            finally:
+                shutil.rmtree(build_path, ignore_errors=True)
+            self._entries[key] = {"stage": stage, "bytes": _directory_size(output_path)}
+        self._entries[key]["last_used"] = time.time()
+        self._save_json(INDEX_FILE, self._entries)
+        return output_path
+
+    def close(self):
+        """
+        Remove the least recently used outputs until the cache fits in its size.
+        """
+        total = self.size
+        for key in sorted(self._entries, key=lambda entry_key: self._entries[entry_key]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._entries[key]["bytes"]
+            self._remove(key)
+            self.stats.evicted += 1
+        self._save_json(INDEX_FILE, self._entries)
+
+    def __enter__(self) -> "StageCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def size(self) -> int:
+        """
+        The total size of the cached outputs in bytes.
+        """
+        return sum(entry["bytes"] for entry in self._entries.values())
+
+    def clear(self):
+        """
+        Remove all cached outputs.
+        """
+        for key in list(self._entries):
+            self._remove(key)
+        self._save_json(INDEX_FILE, self._entries)
+
+    def _remove(self, key: str):
+        """
+        Remove a cached output.
+        :param key: The key of the output.
+        """
+        shutil.rmtree(self.path(key), ignore_errors=True)
+        del self._entries[key]
+
+    def _input_digest(self, path: str) -> str:
+        """
+        Get the digest of an input.
+        :param path: The path of an input file or directory.
+        :return: The key for outputs of this cache, and the hash of the contents otherwise.
+        """
+        path = os.path.abspath(path)
+        if os.path.dirname(path) == self.cache_dir and os.path.basename(path) in self._entries:
+            return f"stage:{os.path.basename(path)}"
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for directory, directories, files in os.walk(path):
+                directories.sort()
+                for file_name in sorted(files):
+                    file_path = os.path.join(directory, file_name)
+                    digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+                    digest.update(self._file_digest(file_path).encode("ascii"))
+            return digest.hexdigest()
+        return self._file_digest(path)
+
+    def _file_digest(self, path: str) -> str:
+        """
+        Hash the contents of a file, or reuse its hash if the file has the same size and modification time.
+        :param path: The path of the file.
+        :return: The SHA-256 hex digest.
+        """
+        stat = os.stat(path)
+        remembered = self._digests.get(path)
+        if remembered is not None and remembered["size"] == stat.st_size and remembered["mtime_ns"] == stat.st_mtime_ns:
+            return remembered["sha256"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        self._digests[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        self._save_json(DIGESTS_FILE, self._digests)
+        return digest.hexdigest()
+
+    def _load_json(self, file_name: str) -> dict:
+        """
+        Load a bookkeeping file of the cache.
+        :param file_name: The file name.
+        :return: The contents, or an empty dictionary if the file is missing or damaged.
+        """
+        try:
+            with open(os.path.join(self.cache_dir, file_name), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_json(self, file_name: str, data: dict):
+        """
+        Save a bookkeeping file of the cache atomically.
+        :param file_name: The file name.
+        :param data: The contents.
+        """
+        temporary_path = os.path.join(self.cache_dir, f".{file_name}.tmp")
+        with open(temporary_path, "w") as f:
+            json.dump(data, f)
+        os.replace(temporary_path, os.path.join(self.cache_dir, file_name))
+
+
+def code_version(*modules: ModuleType) -> str:
+    """
+    Hash the source code of modules, e.g. the modules a stage calls, to use as the code version of the stage.
+    :param modules: The modules.
+    :return: The hex digest.
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        digest.update(inspect.getsource(module).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _source_digest(function: Callable) -> str:
+    """
+    Hash the source code of a function, which changes when the code of the stage changes.
+    :param function: The function.
+    :return: The hex digest, or an empty string if the source is not available.
+    """
+    try:
+        return hashlib.sha256(inspect.getsource(function).encode("utf-8")).hexdigest()
+    except (OSError, TypeError):
+        return ""
+
+
+def _directory_size(path: str) -> int:
+    """
+    Sum the sizes of the files in a directory.
+    :param path: The path of the directory.
+    :return: The size in bytes.
+    """
+    return sum(os.path.getsize(os.path.join(directory, file_name))
+               for directory, _, files in os.walk(path) for file_name in files)
@@ -0,0 +1,555 @@
+"""
+Local full-text search over the names, descriptions and EDAM terms of tools with BM25 ranking
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .edam_index import EdamIndex
+from .edam_term_extractor import EDAM_PREFIX
+
+SEARCH_FORMAT_VERSION: int = 1
+TOKEN_PATTERN: re.Pattern = re.compile(r"[a-z0-9]+")
+STOP_WORDS: frozenset = frozenset(("a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is",
+                                   "it", "its", "of", "on", "or", "that", "the", "their", "this", "to", "which",
+                                   "with"))
+# The weight of an occurrence of a token in each field, so a word in the name counts more than in the description
+FIELD_WEIGHTS: Dict[str, int] = {"name": 3, "terms": 2, "description": 1}
+SEGMENT_ARRAYS: Tuple[str, ...] = ("posting_bytes", "posting_offsets", "posting_starts", "frequencies", "doc_lengths",
+                                   "filter_docs", "filter_offsets")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into lower case words and numbers, without stop words and single characters.
+    :param text: The text.
+    :return: The tokens.
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 and token not in STOP_WORDS]
+
+
+@dataclass
+class _Segment:
+    """
+    An immutable part of the index.
+
+    The postings of token `t` are the documents `decode(posting_bytes[posting_offsets[t]:posting_offsets[t + 1]])`,
+    stored as variable-length encoded gaps between the sorted document numbers, and their weighted term frequencies
+    `frequencies[posting_starts[t]:posting_starts[t + 1]]`. The documents with the filter `f`, e.g.
+    'collection:Proteomics', are `filter_docs[filter_offsets[f]:filter_offsets[f + 1]]`.
+    """
+    tokens: Dict[str, int]
+    filters: Dict[str, int]
+    tool_ids: List[str]
+    posting_bytes: np.ndarray
+    posting_offsets: np.ndarray
+    posting_starts: np.ndarray
+    frequencies: np.ndarray
+    doc_lengths: np.ndarray
+    filter_docs: np.ndarray
+    filter_offsets: np.ndarray
+
+    def postings(self, token: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decode the postings of a token.
+        :param token: The token number.
+        :return: The document numbers and their frequencies.
+        """
+        gaps = _decode_varints(self.posting_bytes[self.posting_offsets[token]:self.posting_offsets[token + 1]])
+        return np.cumsum(gaps), self.frequencies[self.posting_starts[token]:self.posting_starts[token + 1]]
+
+    def filter_documents(self, key: str) -> np.ndarray:
+        """
+        Get the sorted documents with a filter.
+        :param key: The filter key, e.g. 'topic:topic_0121'.
+        :return: The document numbers.
+        """
+        position = self.filters.get(key)
+        if position is None:
+            return np.empty(0, dtype=np.int32)
+        return self.filter_docs[self.filter_offsets[position]:self.filter_offsets[position + 1]]
+
+    def triples(self) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Decode all postings, e.g. to merge the segment with another.
+        :return: The tokens in number order, and the token number, document number and frequency of each posting.
+        """
+        token_list = sorted(self.tokens, key=self.tokens.get)
+        gaps = _decode_varints(self.posting_bytes)
+        counts = np.diff(self.posting_starts)
+        token_numbers = np.repeat(np.arange(len(token_list)), counts)
+        # The first gap of each token is its first document, so the cumulative sum restarts at every token
+        starts = self.posting_starts[:-1][counts > 0]
+        if len(gaps) == 0:
+            return token_list, token_numbers, gaps, np.asarray(self.frequencies)
+        restart = np.zeros(len(gaps), dtype=np.int64)
+        restart[starts[1:]] = np.add.reduceat(gaps, starts)[:-1]
+        docs = np.cumsum(gaps) - np.cumsum(restart)
+        return token_list, token_numbers, docs, np.asarray(self.frequencies)
+
+
+class SearchIndex:
+    """
+    Inverted index of tools for local keyword search with BM25 ranking.
+
+    The name, description and EDAM term names of each tool are split into tokens, and each token points to the sorted
+    tools having it, stored as gaps in a variable-length byte encoding. A search only decodes the postings of the
+    query tokens and scores the tools in them with vectorised BM25. Tools can be filtered on their collections and
+    topics, where a topic filter also matches the tools with a sub-topic if the index was built with an `EdamIndex`.
+
+    Added, replaced and removed tools are kept in a small in-memory segment and a set of removed documents next to
+    the main segment, which is memory-mapped from disk, and `save` merges them into one segment.
+    """
+
+    def __init__(self, segment: _Segment, edam_index: Optional[EdamIndex] = None, k1: float = 1.2, b: float = 0.75):
+        """
+        Create the index from its main segment. Use `SearchIndex.build` or `SearchIndex.load` to create an index.
+        :param segment: The main segment.
+        :param edam_index: The EDAM index used for the term names and sub-topics of added tools.
+        :param k1: The BM25 term frequency saturation.
+        :param b: The BM25 document length normalisation.
+        """
+        self.edam_index: Optional[EdamIndex] = edam_index
+        self.k1: float = k1
+        self.b: float = b
+        self._segments: List[_Segment] = [segment]
+        self._removed: List[np.ndarray] = [np.zeros(len(segment.tool_ids), dtype=bool)]
+        self._added: Dict[str, dict] = {}
+        self._locations: Optional[Dict[str, Tuple[int, int]]] = None
+        self._update_statistics()
+
+    @classmethod
+    def build(cls, tools: Iterable[dict], edam_index: Optional[EdamIndex] = None, k1: float = 1.2,
+              b: float = 0.75) -> "SearchIndex":
+        """
+        Build the index of tools.
+        :param tools: The tools, e.g. streamed with `iter_tools`.
+        :param edam_index: The EDAM index, used for the names of the terms and to match sub-topics with topic filters.
+            If None, the term names in the tool records are used.
+        :param k1: The BM25 term frequency saturation.
+        :param b: The BM25 document length normalisation.
+        :return: The index.
+        """
+        return cls(segment=_build_segment(tools=tools, edam_index=edam_index), edam_index=edam_index, k1=k1, b=b)
+
+    @classmethod
+    def load(cls, path: str, edam_index: Optional[EdamIndex] = None) -> "SearchIndex":
+        """
+        Open an index saved with `save`, with the arrays memory-mapped.
+        :param path: The path of the index directory.
+        :param edam_index: The EDAM index used for tools added later.
+        :return: The index.
+        """
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != SEARCH_FORMAT_VERSION:
+            raise ValueError(f"The search index '{path}' has format version '{meta.get('format_version')}', but "
+                             f"version '{SEARCH_FORMAT_VERSION}' is required.")
+        # Plain array views of the memory maps are sliced without the overhead of the memmap class
+        arrays = {name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+                  for name in SEGMENT_ARRAYS}
+        segment = _Segment(tokens={token: number for number, token in enumerate(meta["tokens"])},
+                           filters={key: number for number, key in enumerate(meta["filters"])},
+                           tool_ids=meta["tool_ids"], **arrays)
+        return cls(segment=segment, edam_index=edam_index, k1=meta["k1"], b=meta["b"])
+
+    def save(self, path: str):
+        """
+        Merge the added and removed tools into the main segment and save the index.
+        :param path: The path of the index directory.
+        """
+        self._compact()
+        segment = self._segments[0]
+        os.makedirs(path, exist_ok=True)
+        for name in SEGMENT_ARRAYS:
+            # Replace the files instead of overwriting them, as the arrays may be memory-mapped from them
+            temporary_path = os.path.join(path, f".{name}.npy")
+            np.save(temporary_path, np.asarray(getattr(segment, name)))
+            os.replace(temporary_path, os.path.join(path, f"{name}.npy"))
+        meta = {"format_version": SEARCH_FORMAT_VERSION, "k1": self.k1, "b": self.b,
+                "tokens": sorted(segment.tokens, key=segment.tokens.get),
+                "filters": sorted(segment.filters, key=segment.filters.get), "tool_ids": segment.tool_ids}
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def __len__(self) -> int:
+        return self._number_of_tools
+
+    def add(self, tools: Iterable[dict]):
+        """
+        Add tools to the index, replacing the tools with the same ID.
+        :param tools: The tools.
+        """
+        tools = list(tools)
+        self.remove(tool["biotoolsID"] for tool in tools)
+        for tool in tools:
+            self._added[tool["biotoolsID"]] = tool
+        self._rebuild_added()
+
+    def remove(self, tool_ids: Iterable[str]):
+        """
+        Remove tools from the index. Unknown tool IDs are ignored.
+        :param tool_ids: The bio.tools IDs.
+        """
+        locations = self._tool_locations()
+        rebuild = False
+        for tool_id in tool_ids:
+            if tool_id in self._added:
+                del self._added[tool_id]
+                locations.pop(tool_id, None)
+                rebuild = True
+            elif tool_id in locations:
+                segment, doc = locations.pop(tool_id)
+                self._removed[segment][doc] = True
+        if rebuild:
+            self._rebuild_added()
+        else:
+            self._update_statistics()
+
+    def search(self, query: str, k: int = 10, collections: Optional[Sequence[str]] = None,
+               topics: Optional[Sequence[str]] = None, require_all: bool = False) -> List[Tuple[str, float]]:
+        """
+        Find the tools best matching a query.
+        :param query: The query, e.g. 'peptide identification mass spectrometry'.
+        :param k: The largest number of tools.
+        :param collections: Only find tools in one of these collections, or None for no filter.
+        :param topics: Only find tools with one of these topics, e.g. 'topic_0121', or None for no filter.
+        :param require_all: Whether the tools must have all query tokens, instead of at least one.
+        :return: The tool IDs and their BM25 scores, by decreasing score.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if len(tokens) == 0:
+            return []
+        document_frequencies = [self._document_frequency(token) for token in tokens]
+        number_of_tools = max(self._number_of_tools, 1)
+        idfs = [math.log(1 + (number_of_tools - frequency + 0.5) / (frequency + 0.5))
+                for frequency in document_frequencies]
+
+        candidates: List[Tuple[float, str]] = []
+        for segment, removed in zip(self._segments, self._removed):
+            docs, scores = self._score_segment(segment=segment, tokens=tokens, idfs=idfs, require_all=require_all)
+            keep = ~removed[docs]
+            if collections is not None:
+                keep &= _in_any(docs, [segment.filter_documents(f"collection:{value}") for value in collections],
+                                number_of_docs=len(removed))
+            if topics is not None:
+                keep &= _in_any(docs, [segment.filter_documents(f"topic:{value}") for value in topics],
+                                number_of_docs=len(removed))
+            docs, scores = docs[keep], scores[keep]
+            if len(docs) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                docs, scores = docs[top], scores[top]
+            candidates.extend((float(score), segment.tool_ids[doc]) for doc, score in zip(docs.tolist(), scores))
+        candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+        return [(tool_id, score) for score, tool_id in candidates[:k]]
+
+    def _document_frequency(self, token: str) -> int:
+        """
+        Count the tools having a token, without the removed and replaced tools, so the scores are the same as those of
+        an index built from the current tools.
+        :param token: The token.
+        :return: The number of tools.
+        """
+        frequency = 0
+        for segment, removed in zip(self._segments, self._removed):
+            number = segment.tokens.get(token)
+            if number is None:
+                continue
+            if removed.any():
+                frequency += int((~removed[segment.postings(number)[0]]).sum())
+            else:
+                frequency += int(segment.posting_starts[number + 1] - segment.posting_starts[number])
+        return frequency
+
+    def _score_segment(self, segment: _Segment, tokens: List[str], idfs: List[float],
+                       require_all: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score the documents of a segment having the query tokens.
+        :param segment: The segment.
+        :param tokens: The query tokens.
+        :param idfs: The inverse document frequency of each token.
+        :param require_all: Whether the documents must have all tokens.
+        :return: The document numbers and their scores.
+        """
+        all_docs: List[np.ndarray] = []
+        all_scores: List[np.ndarray] = []
+        for token, idf in zip(tokens, idfs):
+            number = segment.tokens.get(token)
+            if number is None:
+                if require_all:
+                    return np.empty(0, dtype=np.int64), np.empty(0)
+                continue
+            docs, frequencies = segment.postings(number)
+            frequencies = frequencies.astype(np.float64)
+            norms = self.k1 * (1 - self.b + self.b * segment.doc_lengths[docs] / self._average_length)
+            all_docs.append(docs)
+            all_scores.append(idf * frequencies * (self.k1 + 1) / (frequencies + norms))
+        if len(all_docs) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        if len(all_docs) == 1:
+            return all_docs[0], all_scores[0]
+
+        # Accumulating over all documents of the segment is faster than merging the postings with sorting
+        merged_docs = np.concatenate(all_docs)
+        counts = np.bincount(merged_docs, minlength=len(segment.tool_ids))
+        docs = np.flatnonzero(counts == len(tokens) if require_all else counts)
+        scores = np.bincount(merged_docs, weights=np.concatenate(all_scores), minlength=len(segment.tool_ids))
+        return docs, scores[docs]
+
+    def _tool_locations(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Get the segment and document of each indexed tool, which is only built for the first update.
+        :return: The dictionary with the tool ID and the segment and document numbers.
+        """
+        if self._locations is None:
+            self._locations = {tool_id: (0, doc) for doc, tool_id in enumerate(self._segments[0].tool_ids)
+                               if not self._removed[0][doc]}
+        return self._locations
+
+    def _rebuild_added(self):
+        """
+        Rebuild the in-memory segment of the added tools, which is small compared to the main segment.
+        """
+        self._segments = self._segments[:1]
+        self._removed = self._removed[:1]
+        if len(self._added) > 0:
+            self._segments.append(_build_segment(tools=self._added.values(), edam_index=self.edam_index))
+            self._removed.append(np.zeros(len(self._added), dtype=bool))
+        self._update_statistics()
+
+    def _compact(self):
+        """
+        Merge the segment of the added tools into the main segment, without the removed tools.
+        """
+        if len(self._segments) == 1 and not self._removed[0].any():
+            return
+        vocabulary: Dict[str, int] = {}
+        filter_keys: Dict[str, int] = {}
+        token_parts, doc_parts, frequency_parts, filter_parts, filter_doc_parts = [], [], [], [], []
+        tool_ids: List[str] = []
+        lengths: List[np.ndarray] = []
+        for segment, removed in zip(self._segments, self._removed):
+            # Renumber the kept documents after the documents of the previous segments
+            new_numbers = np.cumsum(~removed) - 1 + len(tool_ids)
+            tool_ids.extend(tool_id for tool_id, is_removed in zip(segment.tool_ids, removed) if not is_removed)
+            lengths.append(np.asarray(segment.doc_lengths)[~removed])
+
+            token_list, tokens, docs, frequencies = segment.triples()
+            token_map = np.array([vocabulary.setdefault(token, len(vocabulary)) for token in token_list],
+                                 dtype=np.int64)
+            keep = ~removed[docs]
+            token_parts.append(token_map[tokens[keep]])
+            doc_parts.append(new_numbers[docs[keep]])
+            frequency_parts.append(frequencies[keep])
+
+            key_list = sorted(segment.filters, key=segment.filters.get)
+            key_map = np.array([filter_keys.setdefault(key, len(filter_keys)) for key in key_list], dtype=np.int64)
+            filter_numbers = np.repeat(np.arange(len(key_list)), np.diff(segment.filter_offsets))
+            filter_docs = np.asarray(segment.filter_docs)
+            keep = ~removed[filter_docs]
+            filter_parts.append(key_map[filter_numbers[keep]])
+            filter_doc_parts.append(new_numbers[filter_docs[keep]])
+
+        merged = _encode_segment(vocabulary=list(vocabulary), tokens=np.concatenate(token_parts),
+                                 docs=np.concatenate(doc_parts), frequencies=np.concatenate(frequency_parts),
+                                 filter_keys=list(filter_keys), filter_numbers=np.concatenate(filter_parts),
+                                 filter_docs=np.concatenate(filter_doc_parts), tool_ids=tool_ids,
+                                 doc_lengths=np.concatenate(lengths))
+        self._segments = [merged]
+        self._removed = [np.zeros(len(tool_ids), dtype=bool)]
+        self._added = {}
+        self._locations = None
+        self._update_statistics()
+
+    def _update_statistics(self):
+        """
+        Update the number of tools and their average length for the BM25 scores.
+        """
+        self._number_of_tools = sum(int((~removed).sum()) for removed in self._removed)
+        total_length = sum(float(np.asarray(segment.doc_lengths)[~removed].sum())
+                           for segment, removed in zip(self._segments, self._removed))
+        self._average_length = max(total_length / max(self._number_of_tools, 1), 1.0)
+        if self._locations is not None:
+            for doc, tool_id in enumerate(self._added):
+                self._locations[tool_id] = (1, doc)
+
+
+def _tool_tokens(tool: dict, edam_index: Optional[EdamIndex]) -> Tuple[Counter, List[str]]:
+    """
+    Count the weighted tokens of a tool and get its filter keys.
+    :param tool: The tool.
+    :param edam_index: The EDAM index for the term names and ancestors, or None.
+    :return: The weighted token counts and the filter keys.
+    """
+    terms = list(tool.get("topic") or []) + [operation for function in tool.get("function") or []
+                                             for operation in function.get("operation") or []]
+    term_names: List[str] = []
+    for term in terms:
+        term_id = term["uri"][len(EDAM_PREFIX):] if term["uri"].startswith(EDAM_PREFIX) else term["uri"]
+        if edam_index is not None and term_id in edam_index:
+            term_names.append(edam_index.name(term_id))
+        else:
+            term_names.append(term.get("term") or "")
+
+    counts: Counter = Counter()
+    for field, text in (("name", tool.get("name") or ""), ("description", tool.get("description") or ""),
+                        ("terms", " ".join(term_names))):
+        for token in tokenize(text):
+            counts[token] += FIELD_WEIGHTS[field]
+
+    filter_keys = [f"collection:{collection}" for collection in tool.get("collectionID") or []]
+    for topic in tool.get("topic") or []:
+        topic_id = topic["uri"][len(EDAM_PREFIX):] if topic["uri"].startswith(EDAM_PREFIX) else topic["uri"]
+        if edam_index is not None and topic_id in edam_index:
+            filter_keys.extend(f"topic:{ancestor}" for ancestor in edam_index.ancestors(topic_id, include_self=True))
+        else:
+            filter_keys.append(f"topic:{topic_id}")
+    return counts, list(dict.fromkeys(filter_keys))
+
+
+def _build_segment(tools: Iterable[dict], edam_index: Optional[EdamIndex]) -> _Segment:
+    """
+    Build a segment from tools.
+    :param tools: The tools.
+    :param edam_index: The EDAM index, or None.
+    :return: The segment.
+    """
+    vocabulary: Dict[str, int] = {}
+    filter_keys: Dict[str, int] = {}
+    tokens: List[int] = []
+    docs: List[int] = []
+    frequencies: List[int] = []
+    filter_numbers: List[int] = []
+    filter_docs: List[int] = []
+    tool_ids: List[str] = []
+    lengths: List[int] = []
+    for doc, tool in enumerate(tools):
+        counts, keys = _tool_tokens(tool=tool, edam_index=edam_index)
+        for token, count in counts.items():
+            tokens.append(vocabulary.setdefault(token, len(vocabulary)))
+            docs.append(doc)
+            frequencies.append(count)
+        for key in keys:
+            filter_numbers.append(filter_keys.setdefault(key, len(filter_keys)))
+            filter_docs.append(doc)
+        tool_ids.append(tool["biotoolsID"])
+        lengths.append(sum(counts.values()))
+    return _encode_segment(vocabulary=list(vocabulary), tokens=np.array(tokens, dtype=np.int64),
+                           docs=np.array(docs, dtype=np.int64), frequencies=np.array(frequencies, dtype=np.int64),
+                           filter_keys=list(filter_keys), filter_numbers=np.array(filter_numbers, dtype=np.int64),
+                           filter_docs=np.array(filter_docs, dtype=np.int64), tool_ids=tool_ids,
+                           doc_lengths=np.array(lengths, dtype=np.float32))
+
+
+def _encode_segment(vocabulary: List[str], tokens: np.ndarray, docs: np.ndarray, frequencies: np.ndarray,
+                    filter_keys: List[str], filter_numbers: np.ndarray, filter_docs: np.ndarray, tool_ids: List[str],
+                    doc_lengths: np.ndarray) -> _Segment:
+    """
+    Sort and encode the postings of a segment.
+    :param vocabulary: The tokens in number order.
+    :param tokens: The token number of each posting.
+    :param docs: The document number of each posting.
+    :param frequencies: The weighted frequency of each posting.
+    :param filter_keys: The filter keys in number order.
+    :param filter_numbers: The filter number of each document filter entry.
+    :param filter_docs: The document number of each document filter entry.
+    :param tool_ids: The tool ID of each document.
+    :param doc_lengths: The weighted number of tokens of each document.
+    :return: The segment.
+    """
+    order = np.lexsort((docs, tokens))
+    tokens, docs = tokens[order], docs[order]
+    starts = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tokens, minlength=len(vocabulary)), out=starts[1:])
+    # The first document of each token is stored as is and the others as the gap to the previous document
+    gaps = np.diff(docs, prepend=0)
+    firsts = starts[:-1][starts[:-1] < starts[1:]]
+    gaps[firsts] = docs[firsts]
+    posting_bytes, byte_lengths = _encode_varints(gaps)
+    byte_offsets = np.concatenate(([0], np.cumsum(byte_lengths)))[starts]
+
+    filter_order = np.lexsort((filter_docs, filter_numbers))
+    filter_offsets = np.zeros(len(filter_keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(filter_numbers, minlength=len(filter_keys)), out=filter_offsets[1:])
+    return _Segment(tokens={token: number for number, token in enumerate(vocabulary)},
+                    filters={key: number for number, key in enumerate(filter_keys)}, tool_ids=tool_ids,
+                    posting_bytes=posting_bytes, posting_offsets=byte_offsets, posting_starts=starts,
+                    frequencies=np.minimum(frequencies[order], 255).astype(np.uint8),
+                    doc_lengths=np.asarray(doc_lengths, dtype=np.float32),
+                    filter_docs=filter_docs[filter_order].astype(np.int32), filter_offsets=filter_offsets)
+
+
+def _encode_varints(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode non-negative integers with 7 bits per byte, where the high bit marks that more bytes follow.
+    :param values: The integers.
+    :return: The bytes and the number of bytes of each integer.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35):
+        lengths += values >= (np.uint64(1) << np.uint64(shift))
+    ends = np.cumsum(lengths)
+    encoded = np.zeros(int(ends[-1]) if len(values) > 0 else 0, dtype=np.uint8)
+    starts = ends - lengths
+    for byte in range(int(lengths.max()) if len(values) > 0 else 0):
+        has_byte = lengths > byte
+        chunk = (values[has_byte] >> np.uint64(7 * byte)) & np.uint64(0x7F)
+        more = (lengths[has_byte] > byte + 1).astype(np.uint64) << np.uint64(7)
+        encoded[starts[has_byte] + byte] = (chunk | more).astype(np.uint8)
+    return encoded, lengths
+
+
+def _decode_varints(encoded: np.ndarray) -> np.ndarray:
+    """
+    Decode integers encoded with `_encode_varints`.
+    :param encoded: The bytes.
+    :return: The integers.
+    """
+    encoded = np.asarray(encoded)
+    ends = np.flatnonzero(encoded < 0x80)
+    if len(ends) == len(encoded):
+        return encoded.astype(np.int64)
+    starts = np.empty(len(ends), dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+    values = np.zeros(len(ends), dtype=np.int64)
+    for byte in range(int(lengths.max())):
+        has_byte = lengths > byte
+        values[has_byte] |= (encoded[starts[has_byte] + byte].astype(np.int64) & 0x7F) << (7 * byte)
+    return values
+
+
+def _in_any(docs: np.ndarray, filter_docs: List[np.ndarray], number_of_docs: int) -> np.ndarray:
+    """
+    Check which documents are in at least one of the document lists of filters.
+    :param docs: The documents.
+    :param filter_docs: The documents of each filter value.
+    :param number_of_docs: The number of documents in the segment.
+    :return: The mask of the documents.
+    """
+    allowed = np.zeros(number_of_docs, dtype=bool)
+    for values in filter_docs:
+        allowed[values] = True
+    return allowed[docs]
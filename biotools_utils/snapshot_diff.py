@@ -0,0 +1,252 @@
+"""
+Streaming diff of two catalogue snapshots, reporting the added, removed and modified tools in a changelog
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .edam_term_extractor import TERM_TYPES, TermExtractor
+from .tool_stream import iter_tools
+
+DEFAULT_RUN_SIZE: int = 10000
+
+
+@dataclass
+class SnapshotDiff:
+    added: int = 0
+    removed: int = 0
+    modified: int = 0
+    unchanged: int = 0
+    field_changes: Counter = field(default_factory=Counter)
+    seconds: float = 0.0
+
+
+def diff_snapshots(old_path: str, new_path: str, changelog_path: str, run_size: int = DEFAULT_RUN_SIZE,
+                   tmp_dir: Optional[str] = None) -> SnapshotDiff:
+    """
+    Compare two snapshots of the catalogue and write the changes to a changelog.
+
+    Each snapshot is streamed with `iter_tools`, and every tool is reduced to its ID and the hash of its contents.
+    These are sorted by tool ID in runs of `run_size` tools, which are written to temporary files, and the runs of both
+    snapshots are merged in one pass to find the added, removed and modified tools. Only the modified tools are then
+    compared field by field, in a second pass over the snapshots. So the memory use depends on `run_size` and the
+    number of changes, and not on the size of the snapshots. If a tool ID occurs more than once in a snapshot, the last
+    occurrence is used.
+
+    The changelog is a JSON Lines file with one line per changed tool, in tool ID order, e.g.
+    {"biotoolsID": "tool", "change": "modified", "fields": ["description", "topic"],
+    "topic": {"added": ["topic_0121"], "removed": []}}, where modified tools list the changed fields, the added and
+    removed terms of each term type and collections, and the old and new license.
+    :param old_path: The path of the older snapshot, a JSON array or JSON Lines file.
+    :param new_path: The path of the newer snapshot.
+    :param changelog_path: The path of the changelog.
+    :param run_size: The number of tools sorted in memory at a time.
+    :param tmp_dir: The directory of the temporary run files. Defaults to the directory of the changelog.
+    :return: The summary of the changes.
+    """
+    start = time.perf_counter()
+    diff = SnapshotDiff()
+    changes: List[Tuple[str, str]] = []
+    with tempfile.TemporaryDirectory(dir=tmp_dir or os.path.dirname(os.path.abspath(changelog_path))) as run_dir:
+        old_runs = _write_runs(path=old_path, run_dir=run_dir, prefix="old", run_size=run_size)
+        new_runs = _write_runs(path=new_path, run_dir=run_dir, prefix="new", run_size=run_size)
+        for tool_id, old_hash, new_hash in _merge_join(old=_merge_runs(old_runs), new=_merge_runs(new_runs)):
+            if old_hash is None:
+                changes.append((tool_id, "added"))
+            elif new_hash is None:
+                changes.append((tool_id, "removed"))
+            elif old_hash != new_hash:
+                changes.append((tool_id, "modified"))
+            else:
+                diff.unchanged += 1
+
+    modified_ids = {tool_id for tool_id, change in changes if change == "modified"}
+    old_summaries = _summarize_tools(path=old_path, tool_ids=modified_ids)
+    new_summaries = _summarize_tools(path=new_path, tool_ids=modified_ids)
+    tmp_path = f"{changelog_path}.part"
+    with open(tmp_path, "w") as f:
+        for tool_id, change in changes:
+            if change == "modified":
+                diff.modified += 1
+                entry = _modification(old=old_summaries[tool_id], new=new_summaries[tool_id])
+                diff.field_changes.update(entry["fields"])
+            else:
+                diff.added += change == "added"
+                diff.removed += change == "removed"
+                entry = {"biotoolsID": tool_id, "change": change}
+            f.write(json.dumps(entry))
+            f.write("\n")
+    os.replace(tmp_path, changelog_path)
+
+    diff.seconds = time.perf_counter() - start
+    return diff
+
+
+def read_changelog(changelog_path: str) -> Iterator[dict]:
+    """
+    Read a changelog written by `diff_snapshots`.
+    :param changelog_path: The path of the changelog.
+    :return: The iterator over the changes.
+    """
+    with open(changelog_path, "r") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _write_runs(path: str, run_dir: str, prefix: str, run_size: int) -> List[str]:
+    """
+    Write the IDs and content hashes of the tools of a snapshot to files of sorted runs.
+
+    Each line holds the tool ID, the position of the tool in the snapshot and the hash, separated by tabs. As a tab
+    sorts before every character of a tool ID, sorting the lines sorts them by tool ID and then by position.
+    :param path: The path of the snapshot.
+    :param run_dir: The directory of the run files.
+    :param prefix: The prefix of the run file names.
+    :param run_size: The number of tools per run.
+    :return: The paths of the run files.
+    """
+    lines = (f"{tool['biotoolsID']}\t{position:010d}\t{_tool_hash(tool)}\n"
+             for position, tool in enumerate(iter_tools(path=path)))
+    run_paths: List[str] = []
+    for run in iter(lambda: list(itertools.islice(lines, run_size)), []):
+        run.sort()
+        run_paths.append(os.path.join(run_dir, f"{prefix}_{len(run_paths)}.txt"))
+        with open(run_paths[-1], "w") as f:
+            f.writelines(run)
+    return run_paths
+
+
+def _merge_runs(run_paths: List[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Merge sorted runs into one stream sorted by tool ID, with the last occurrence of each tool ID.
+    :param run_paths: The paths of the run files.
+    :return: The iterator over the tool ID and the hash.
+    """
+    files = [open(run_path, "r") for run_path in run_paths]
+    try:
+        rows = (line.rstrip("\n").split("\t") for line in heapq.merge(*files))
+        for tool_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+            *_, (_, _, tool_hash) = group
+            yield tool_id, tool_hash
+    finally:
+        for f in files:
+            f.close()
+
+
+def _merge_join(old: Iterator[Tuple[str, str]], new: Iterator[Tuple[str, str]]) \
+        -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Pair the tools of two streams sorted by tool ID.
+    :param old: The tool IDs and hashes of the older snapshot.
+    :param new: The tool IDs and hashes of the newer snapshot.
+    :return: The iterator over the tool ID and its old and new hash, with None for a tool missing from a snapshot.
+    """
+    old_row, new_row = next(old, None), next(new, None)
+    while old_row is not None or new_row is not None:
+        if new_row is None or (old_row is not None and old_row[0] < new_row[0]):
+            yield old_row[0], old_row[1], None
+            old_row = next(old, None)
+        elif old_row is None or new_row[0] < old_row[0]:
+            yield new_row[0], None, new_row[1]
+            new_row = next(new, None)
+        else:
+            yield old_row[0], old_row[1], new_row[1]
+            old_row, new_row = next(old, None), next(new, None)
+
+
+def _tool_hash(tool: dict) -> str:
+    """
+    Hash the contents of a tool, independently of the order of its keys.
+    :param tool: The tool.
+    :return: The hex digest.
+    """
+    return hashlib.blake2b(json.dumps(tool, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _summarize_tools(path: str, tool_ids: Set[str]) -> Dict[str, dict]:
+    """
+    Summarize the tools of a snapshot with the given IDs.
+    :param path: The path of the snapshot.
+    :param tool_ids: The tool IDs.
+    :return: The dictionary with the tool ID and the summary of the last occurrence of the tool.
+    """
+    summaries: Dict[str, dict] = {}
+    if len(tool_ids) == 0:
+        return summaries
+    extractor = TermExtractor()
+    for tool in iter_tools(path=path):
+        if tool["biotoolsID"] in tool_ids:
+            summaries[tool["biotoolsID"]] = _summarize(tool=tool, extractor=extractor)
+    return summaries
+
+
+def _summarize(tool: dict, extractor: TermExtractor) -> dict:
+    """
+    Reduce a tool to the hashes of its fields and the values compared field by field.
+    :param tool: The tool.
+    :param extractor: The term extractor of the snapshot, which interns the term IDs.
+    :return: The summary.
+    """
+    row = extractor.add(tool)
+    terms = extractor.result()
+    return {"id": tool["biotoolsID"],
+            "fields": {key: hashlib.blake2b(json.dumps(value, sort_keys=True).encode("utf-8"),
+                                            digest_size=8).digest() for key, value in tool.items()},
+            "terms": {term_type: sorted(terms.get_terms(term_type=term_type, row=row)) for term_type in TERM_TYPES},
+            "collectionID": sorted(tool.get("collectionID") or []), "license": tool.get("license")}
+
+
+def _modification(old: dict, new: dict) -> dict:
+    """
+    Describe the changes of a modified tool.
+    :param old: The summary of the older version.
+    :param new: The summary of the newer version.
+    :return: The changelog entry.
+    """
+    fields = sorted(key for key in old["fields"].keys() | new["fields"].keys()
+                    if old["fields"].get(key) != new["fields"].get(key))
+    entry = {"biotoolsID": new["id"], "change": "modified", "fields": fields}
+    for term_type in TERM_TYPES:
+        changes = _list_changes(old=old["terms"][term_type], new=new["terms"][term_type])
+        if changes is not None:
+            entry[term_type] = changes
+    changes = _list_changes(old=old["collectionID"], new=new["collectionID"])
+    if changes is not None:
+        entry["collectionID"] = changes
+    if old["license"] != new["license"]:
+        entry["license"] = [old["license"], new["license"]]
+    return entry
+
+
+def _list_changes(old: List[str], new: List[str]) -> Optional[dict]:
+    """
+    Compare two sorted lists of values.
+    :param old: The older values.
+    :param new: The newer values.
+    :return: The dictionary with the added and removed values, or None if the values did not change.
+    """
+    if old == new:
+        return None
+    old_values, new_values = set(old), set(new)
+    return {"added": sorted(new_values - old_values), "removed": sorted(old_values - new_values)}
@@ -15,31 +15,252 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import difflib
 import json
-from dataclasses import dataclass
-from typing import List, Dict
-import requests
-from requests import Response
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+SPDX_LICENSES_URL: str = "https://raw.githubusercontent.com/spdx/license-list-data/master/json/licenses.json"
+DEFAULT_CACHE_DIR: str = os.path.join(os.path.expanduser("~"), ".cache", "biotools_utils")
+# License values accepted by bio.tools, which are not SPDX license IDs
+BIOTOOLS_LICENSE_VALUES: FrozenSet[str] = frozenset({"Proprietary", "Other", "Freeware", "Not licensed",
+                                                     "Unlicensed"})
+
+
+@dataclass
+class LicenseClassification:
+    text: str
+    license_id: Optional[str]
+    match: str
+    deprecated: bool = False
+    osi_approved: bool = False
+    fsf_libre: bool = False
 
 
 @dataclass
 class LicensesData:
     licenses: Dict[str, str]
     licenses_list: List[str]
-    osi_approved_licenses: List[str]
-    fsf_approved_licenses: List[str]
-    deprecated_licenses: List[str]
+    osi_approved_licenses: FrozenSet[str]
+    fsf_approved_licenses: FrozenSet[str]
+    deprecated_licenses: FrozenSet[str]
+    replacements: Dict[str, str] = field(default_factory=dict)
+    _ids: Dict[str, str] = field(default_factory=dict, repr=False)
+    _normalized: Dict[str, str] = field(default_factory=dict, repr=False)
+    _by_version: Dict[Tuple[str, ...], List[str]] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self.osi_approved_licenses = frozenset(self.osi_approved_licenses)
+        self.fsf_approved_licenses = frozenset(self.fsf_approved_licenses)
+        self.deprecated_licenses = frozenset(self.deprecated_licenses)
+        self._ids = {license_id.lower(): license_id for license_id in self.licenses_list}
+
+        # Index the normalised IDs and names, preferring current licenses when a name is shared with a deprecated ID
+        for key, license_id in sorted(list(self._ids.items()) + [(name, lid) for name, lid in self.licenses.items()],
+                                      key=lambda item: item[1] in self.deprecated_licenses, reverse=True):
+            self._normalized[normalize_license(key)] = license_id
+        for normalized in self._normalized:
+            self._by_version.setdefault(_version_numbers(normalized), []).append(normalized)
+
+    def is_osi_approved(self, license_id: str) -> bool:
+        """
+        Check if a license is OSI approved.
+        :param license_id: The SPDX license ID.
+        :return: True if the license is OSI approved.
+        """
+        return license_id in self.osi_approved_licenses
+
+    def is_fsf_libre(self, license_id: str) -> bool:
+        """
+        Check if a license is FSF libre.
+        :param license_id: The SPDX license ID.
+        :return: True if the license is FSF libre.
+        """
+        return license_id in self.fsf_approved_licenses
+
+    def is_deprecated(self, license_id: str) -> bool:
+        """
+        Check if a license ID is deprecated.
+        :param license_id: The SPDX license ID.
+        :return: True if the license ID is deprecated.
+        """
+        return license_id in self.deprecated_licenses
+
+    def classify_one(self, text: str, fuzzy_cutoff: float = 0.9) -> LicenseClassification:
+        """
+        Resolve a free-text license to an SPDX license ID.
+
+        The text is matched against the license IDs ignoring case, then against the normalised IDs and names, which
+        ignores case, punctuation and words like 'license' and 'version', and finally by the closest normalised name
+        with the same version numbers.
+        Deprecated IDs resolve to their replacement, e.g. 'GPL-3.0' to 'GPL-3.0-only', with `deprecated` set.
+        :param text: The license text, e.g. the license field of a tool.
+        :param fuzzy_cutoff: The similarity needed for a fuzzy match, between 0 and 1.
+        :return: The classification.
+        """
+        text = text.strip()
+        license_id = self._ids.get(text.lower())
+        match = "exact"
+        if license_id is None and text in BIOTOOLS_LICENSE_VALUES:
+            return LicenseClassification(text=text, license_id=None, match="non_spdx")
+        if license_id is None:
+            normalized = normalize_license(text)
+            license_id = self._normalized.get(normalized)
+            match = "normalized"
+            if license_id is None and normalized:
+                # A close name with other version numbers is another license, e.g. 'BSD-4-Clause' for 'BSD-3-Clause'
+                same_versions = self._by_version.get(_version_numbers(normalized), [])
+                candidates = difflib.get_close_matches(normalized, same_versions, n=1, cutoff=fuzzy_cutoff)
+                license_id = self._normalized[candidates[0]] if candidates else None
+                match = "fuzzy"
+        if license_id is None:
+            return LicenseClassification(text=text, license_id=None, match="unknown")
+
+        deprecated = license_id in self.deprecated_licenses
+        license_id = self.replacements.get(license_id, license_id)
+        return LicenseClassification(text=text, license_id=license_id, match=match, deprecated=deprecated,
+                                     osi_approved=license_id in self.osi_approved_licenses,
+                                     fsf_libre=license_id in self.fsf_approved_licenses)
+
+    def classify(self, license_strings: Iterable[str], fuzzy_cutoff: float = 0.9) -> List[LicenseClassification]:
+        """
+        Resolve a batch of free-text licenses, resolving each distinct text only once.
+        :param license_strings: The license texts.
+        :param fuzzy_cutoff: The similarity needed for a fuzzy match, between 0 and 1.
+        :return: The classifications in the order of the texts.
+        """
+        resolved: Dict[str, LicenseClassification] = {}
+        classifications: List[LicenseClassification] = []
+        for text in license_strings:
+            text = text or ""
+            if text not in resolved:
+                resolved[text] = self.classify_one(text=text, fuzzy_cutoff=fuzzy_cutoff)
+            classifications.append(resolved[text])
+        return classifications
+
+
+def normalize_license(text: str) -> str:
+    """
+    Normalise a license ID or name for matching, e.g. 'GNU General Public License, Version 3' and 'GPLv3' to 'gpl3'.
+
+    The GNU license names are abbreviated as in their IDs, e.g. 'GNU Lesser General Public License' to 'lgpl', a 'v'
+    before a version number is dropped, '+' and '>=' become 'or later', and '3-clause BSD' becomes 'bsd3clause'.
+    A trailing '.0' is dropped from version numbers, and the components of a version are kept apart by an underscore,
+    so 'LGPL-2.0' and 'LGPL 2' both give 'lgpl2', while 'Synthetic-1.3' gives 'synthetic1_3' and 'Synthetic-13.0'
+    gives 'synthetic13'.
+    :param text: The license ID or name.
+    :return: The normalised text.
+    """
+    text = text.lower().replace("licence", "license").replace("+", " or later")
+    text = re.sub(r">=\s*v?(\d[\d.]*)", r" \1 or later", text)
+    text = re.sub(r"\b(?:lesser|library)\s+general\s+public\b", "lgpl", text)
+    text = re.sub(r"\baffero\s+general\s+public\b", "agpl", text)
+    text = re.sub(r"\bgeneral\s+public\b", "gpl", text)
+    text = re.sub(r"\b(\d)\W*clause\W+bsd\b", r"bsd \1 clause", text)
+    text = re.sub(r"\b(the|gnu|license|version)\b|(?<=[a-z])v(?=\d)|\bv(?=\d)", " ", text)
+    text = re.sub(r"(\d)(\.0)+(?![.\d])", r"\1", text)
+    text = re.sub(r"(?<=\d)[^a-z0-9]+(?=\d)", "_", text)
+    return re.sub(r"[^a-z0-9_]", "", text)
+
+
+def _version_numbers(normalized: str) -> Tuple[str, ...]:
+    """
+    Get the version numbers of a normalised license, e.g. ('2_1',) for 'lgpl2_1only'.
+    :param normalized: The normalised license ID or name.
+    :return: The version numbers.
+    """
+    return tuple(re.findall(r"\d+(?:_\d+)*", normalized))
 
 
-def parse_license_list() -> LicensesData:
+def parse_license_list(cache_dir: Optional[str] = DEFAULT_CACHE_DIR, offline: bool = False,
+                       max_age: float = 24 * 60 * 60, url: str = SPDX_LICENSES_URL) -> LicensesData:
     """
     Parse the licenses list from SPDXs GitHub repository
+
+    The list is cached on disk. A cached list younger than `max_age` seconds is used without any request, and an older
+    one is revalidated with a conditional request. If the list cannot be downloaded, the cached list is used.
+    :param cache_dir: The cache directory, or None to always download the list.
+    :param offline: Only use the cached list, without any request.
+    :param max_age: The number of seconds the cached list is used without revalidating it.
+    :param url: The URL of the SPDX license list.
     :return: The license data.
     """
-    resp: Response = requests.get("https://raw.githubusercontent.com/spdx/license-list-data/master/json/licenses.json")
-    resp.raise_for_status()
-    license_list = resp.json()["licenses"]
+    return _parse_licenses(license_list=_load_license_list(cache_dir=cache_dir, offline=offline, max_age=max_age,
+                                                           url=url)["licenses"])
+
+
+def _load_license_list(cache_dir: Optional[str], offline: bool, max_age: float, url: str) -> dict:
+    """
+    Get the license list from the cache or from SPDX.
+    :param cache_dir: The cache directory, or None to disable the cache.
+    :param offline: Only use the cached list.
+    :param max_age: The number of seconds the cached list is used without revalidating it.
+    :param url: The URL of the SPDX license list.
+    :return: The license list JSON.
+    """
+    import requests
+
+    from .http_utils import REQUEST_TIMEOUT
+
+    if cache_dir is None:
+        if offline:
+            raise ValueError("The license list cannot be loaded offline without a cache directory.")
+        resp: requests.Response = requests.get(url, timeout=REQUEST_TIMEOUT)
+        resp.raise_for_status()
+        return resp.json()
 
+    list_path = os.path.join(cache_dir, "licenses.json")
+    meta_path = os.path.join(cache_dir, "licenses.meta.json")
+    meta: dict = {}
+    if os.path.exists(list_path) and os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+
+    if meta and (offline or time.time() - meta.get("fetched_at", 0) < max_age):
+        with open(list_path, "r") as f:
+            return json.load(f)
+    if offline:
+        raise FileNotFoundError(f"No cached license list in '{cache_dir}'.")
+
+    headers = {}
+    if "etag" in meta:
+        headers["If-None-Match"] = meta["etag"]
+    if "last_modified" in meta:
+        headers["If-Modified-Since"] = meta["last_modified"]
+    try:
+        resp = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+    except requests.RequestException:
+        if not meta:
+            raise
+        # Fall back to the cached list when SPDX cannot be reached
+        with open(list_path, "r") as f:
+            return json.load(f)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if resp.status_code != 304:
+        with open(f"{list_path}.part", "wb") as f:
+            f.write(resp.content)
+        os.replace(f"{list_path}.part", list_path)
+        meta = {key: resp.headers[header] for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+                if header in resp.headers}
+    meta["fetched_at"] = time.time()
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    with open(list_path, "r") as f:
+        return json.load(f)
+
+
+def _parse_licenses(license_list: list) -> LicensesData:
+    """
+    Parse the licenses of the SPDX license list.
+    :param license_list: The list of licenses.
+    :return: The license data.
+    """
     licenses: Dict[str, str] = {}
     licenses_list: List[str] = []
     osi_licenses: List[str] = []
@@ -59,6 +280,14 @@ def parse_license_list() -> LicensesData:
         if "isDeprecatedLicenseId" in licens and licens["isDeprecatedLicenseId"]:
             deprecated_licenses.append(license_id)
 
+    # Deprecated IDs like 'GPL-3.0' and 'GPL-3.0+' were replaced by the '-only' and '-or-later' IDs
+    current_ids = set(licenses_list) - set(deprecated_licenses)
+    replacements: Dict[str, str] = {}
+    for license_id in deprecated_licenses:
+        for replacement in (f"{license_id}-only", f"{license_id[:-1]}-or-later" if license_id.endswith("+") else ""):
+            if replacement in current_ids:
+                replacements[license_id] = replacement
+
     return LicensesData(licenses=licenses, licenses_list=licenses_list,
-                        osi_approved_licenses=osi_licenses, fsf_approved_licenses=fsf_licenses,
-                        deprecated_licenses=deprecated_licenses)
+                        osi_approved_licenses=frozenset(osi_licenses), fsf_approved_licenses=frozenset(fsf_licenses),
+                        deprecated_licenses=frozenset(deprecated_licenses), replacements=replacements)
@@ -0,0 +1,268 @@
+"""
+Columnar tables for handing dataframes between pipeline stages, with an optional Excel export
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .term_matrix import TermMatrix, build_term_matrix
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+STAGE_FORMAT_VERSION: int = 1
+
+
+def save_stage(df: "pd.DataFrame", path: str):
+    """
+    Save a dataframe as a columnar stage table.
+
+    The table is a directory in the layout of the tool store, with one NumPy file per array and a `meta.json` with the
+    column types and the vocabularies. Numeric and boolean columns are saved as they are, string columns as UTF-8
+    bytes with an offset array and a mask of the missing values if there are any, and list columns, e.g. the terms of
+    each tool, as integer codes into the vocabulary of the column with an offset array. The index is saved as a
+    string column. The table is written to a temporary directory which then replaces the table, so an interrupted
+    save never leaves a partial table.
+    :param df: The dataframe, with numeric, boolean, string or list columns. String columns may have None or NaN for
+        missing values.
+    :param path: The path of the table directory.
+    """
+    import pandas as pd
+
+    arrays: Dict[str, np.ndarray] = {}
+    columns: List[dict] = []
+    vocabularies: Dict[str, List[str]] = {}
+    index_name = df.index.name if df.index.name is not None else "index"
+    for name, values in _iter_columns(df=df, index_name=index_name):
+        if pd.api.types.is_bool_dtype(values.dtype) or pd.api.types.is_numeric_dtype(values.dtype):
+            arrays[name] = values.to_numpy()
+            columns.append({"name": name, "kind": "value"})
+        elif values.map(lambda value: isinstance(value, (list, tuple, np.ndarray))).all():
+            codes, offsets, vocabularies[name] = _encode_lists(values)
+            arrays[f"{name}.codes"], arrays[f"{name}.offsets"] = codes, offsets
+            columns.append({"name": name, "kind": "list"})
+        elif values.map(lambda value: isinstance(value, str) or _is_missing(value)).all():
+            missing = values.map(_is_missing).to_numpy(dtype=bool)
+            arrays[f"{name}.bytes"], arrays[f"{name}.offsets"] = _encode_strings(values.where(~missing, ""))
+            if missing.any():
+                arrays[f"{name}.missing"] = missing
+            columns.append({"name": name, "kind": "string"})
+        else:
+            raise TypeError(f"The column '{name}' must be numeric, boolean, strings or lists of strings.")
+
+    parent_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent_dir, exist_ok=True)
+    build_path = tempfile.mkdtemp(prefix=f".{os.path.basename(os.path.abspath(path))}.", dir=parent_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(build_path, f"{name}.npy"), array)
+        meta = {"format_version": STAGE_FORMAT_VERSION, "number_of_rows": len(df), "index": index_name,
+                "columns": columns, "arrays": sorted(arrays), "vocabularies": vocabularies}
+        with open(os.path.join(build_path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(build_path, path)
+    finally:
+        shutil.rmtree(build_path, ignore_errors=True)
+
+
+def load_stage(path: str, columns: Optional[Iterable[str]] = None) -> "pd.DataFrame":
+    """
+    Load a stage table saved with `save_stage`.
+    :param path: The path of the table directory.
+    :param columns: The columns to load, or None to load all columns. Only these columns are read from disk.
+    :return: The dataframe, with the list columns as lists of strings.
+    """
+    import pandas as pd
+
+    meta = _load_meta(path)
+    kinds = {column["name"]: column["kind"] for column in meta["columns"]}
+    names = [column["name"] for column in meta["columns"] if column["name"] != meta["index"]]
+    selected = names if columns is None else list(columns)
+    data = {name: _load_column(path=path, meta=meta, name=name, kind=kinds[name]) for name in selected}
+    index = pd.Index(_load_column(path=path, meta=meta, name=meta["index"], kind=kinds[meta["index"]]),
+                     name=meta["index"])
+    return pd.DataFrame(data, index=index, columns=selected)
+
+
+def load_term_matrix(path: str, column: str, terms: Optional[Sequence[str]] = None) -> TermMatrix:
+    """
+    Build the tool by term matrix of a list column of a stage table directly from its codes, without creating the
+    lists or parsing strings.
+    :param path: The path of the table directory.
+    :param column: The list column, e.g. 'Topics'.
+    :param terms: The terms used as columns. If None, the sorted vocabulary of the column is used.
+    :return: The term matrix, with the index of the table as the tool IDs.
+    """
+    meta = _load_meta(path)
+    kinds = {column["name"]: column["kind"] for column in meta["columns"]}
+    if kinds.get(column) != "list":
+        raise ValueError(f"The column '{column}' of the stage table '{path}' is not a list column.")
+    tool_ids = _load_column(path=path, meta=meta, name=meta["index"], kind=kinds[meta["index"]])
+    return build_term_matrix(codes=np.load(os.path.join(path, f"{column}.codes.npy"), mmap_mode="r"),
+                             offsets=np.load(os.path.join(path, f"{column}.offsets.npy"), mmap_mode="r"),
+                             vocabulary=meta["vocabularies"][column], tool_ids=[str(tool_id) for tool_id in tool_ids],
+                             terms=terms)
+
+
+def ensure_tool_list(path: str, excel_path: str) -> str:
+    """
+    Import a tool list from its spreadsheet if its stage table has not been created yet, so the stages run on a fresh
+    checkout with only the committed spreadsheet.
+    :param path: The path of the stage table.
+    :param excel_path: The path of the spreadsheet, with the name and the bio.tools URL in the ID column and one
+        'Name (term_id)' line per term, as written by `create_tool_list`.
+    :return: The path of the stage table.
+    """
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        print(f"Importing the tool list from '{excel_path}' to '{path}'")
+        save_stage(df=_read_excel_tool_list(excel_path=excel_path), path=path)
+    return path
+
+
+def export_excel(df: "pd.DataFrame", path: str, term_names: Optional[Dict[str, str]] = None):
+    """
+    Export a dataframe to Excel for reading, with each list of terms as one 'Name (term_id)' line per term.
+
+    The export is only for people, as the stages read the stage tables instead.
+    :param df: The dataframe, e.g. loaded with `load_stage`.
+    :param path: The path of the Excel file.
+    :param term_names: The dictionary with the term ID and its name. Terms without a name are written as their ID.
+    """
+    term_names = term_names or {}
+    export_df = df.copy()
+    for name in export_df.columns:
+        if export_df[name].dtype == object and export_df[name].map(
+                lambda value: isinstance(value, (list, tuple, np.ndarray))).all():
+            export_df[name] = ["\n".join(f"{term_names[term]} ({term})" if term in term_names else term
+                                         for term in terms) for terms in export_df[name]]
+    export_df.to_excel(path)
+
+
+def _read_excel_tool_list(excel_path: str) -> "pd.DataFrame":
+    """
+    Read a tool list spreadsheet, with the name and the bio.tools URL in the ID column and one 'Name (term_id)' line
+    per term.
+    :param excel_path: The path of the spreadsheet.
+    :return: The tool list, indexed by the tool ID with the 'Name', 'Description', 'Topics' and 'Operations' columns.
+    """
+    import pandas as pd
+
+    excel_df = pd.read_excel(excel_path, dtype=str, keep_default_na=False)
+    names_ids = excel_df["ID"].str.extract(r"^(.*?)\s*\(https://bio\.tools/([^()\s]+)\)\s*$", flags=re.DOTALL)
+    if names_ids.isna().any(axis=None):
+        raise ValueError(f"The ID column of '{excel_path}' must have the name and the bio.tools URL of each tool.")
+    tools_df = pd.DataFrame({"ID": names_ids[1], "Name": names_ids[0],
+                             "Description": excel_df["Description"]}).set_index("ID")
+    tools_df["Topics"] = [re.findall(r"\((topic_[0-9]{4})\)", terms) for terms in excel_df["Topics"]]
+    tools_df["Operations"] = [re.findall(r"\((operation_[0-9]{4})\)", terms) for terms in excel_df["Operations"]]
+    return tools_df
+
+
+def _is_missing(value) -> bool:
+    """
+    Check if a value of a string column is missing.
+    :param value: The value.
+    :return: True if the value is None or NaN.
+    """
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _iter_columns(df: "pd.DataFrame", index_name: str) -> Iterable[tuple]:
+    """
+    Iterate over the index and the columns of a dataframe.
+    :param df: The dataframe.
+    :param index_name: The name used for the index.
+    :return: The iterator over the name and the values of the index and each column.
+    """
+    import pandas as pd
+
+    yield index_name, pd.Series(df.index.astype(str), index=df.index)
+    for name in df.columns:
+        if name == index_name:
+            raise ValueError(f"The column '{name}' has the name of the index.")
+        yield str(name), df[name]
+
+
+def _encode_strings(values: "pd.Series") -> tuple:
+    """
+    Encode strings as UTF-8 bytes with an offset array.
+    :param values: The strings.
+    :return: The tuple with the bytes and the offsets.
+    """
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _encode_lists(values: "pd.Series") -> tuple:
+    """
+    Encode lists of strings as codes into a vocabulary with an offset array.
+    :param values: The lists.
+    :return: The tuple with the codes, the offsets and the vocabulary.
+    """
+    vocabulary: Dict[str, int] = {}
+    codes = np.fromiter((vocabulary.setdefault(str(item), len(vocabulary)) for items in values for item in items),
+                        dtype=np.int32)
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(items) for items in values], out=offsets[1:])
+    return codes, offsets, list(vocabulary)
+
+
+def _load_meta(path: str) -> dict:
+    """
+    Load the metadata of a stage table.
+    :param path: The path of the table directory.
+    :return: The metadata.
+    """
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != STAGE_FORMAT_VERSION:
+        raise ValueError(f"The stage table '{path}' has format version '{meta.get('format_version')}', but version "
+                         f"'{STAGE_FORMAT_VERSION}' is required.")
+    return meta
+
+
+def _load_column(path: str, meta: dict, name: str, kind: str) -> np.ndarray | list:
+    """
+    Load a column of a stage table.
+    :param path: The path of the table directory.
+    :param meta: The metadata of the table.
+    :param name: The name of the column.
+    :param kind: The kind of the column, 'value', 'string' or 'list'.
+    :return: The values of the column.
+    """
+    if kind == "value":
+        return np.load(os.path.join(path, f"{name}.npy"))
+    offsets = np.load(os.path.join(path, f"{name}.offsets.npy")).tolist()
+    if kind == "string":
+        data = np.load(os.path.join(path, f"{name}.bytes.npy")).tobytes()
+        strings = [data[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+        if f"{name}.missing" in meta["arrays"]:
+            missing = np.load(os.path.join(path, f"{name}.missing.npy")).tolist()
+            strings = [None if is_missing else string for string, is_missing in zip(strings, missing)]
+        return strings
+    vocabulary = meta["vocabularies"][name]
+    codes = np.load(os.path.join(path, f"{name}.codes.npy")).tolist()
+    return [[vocabulary[code] for code in codes[start:end]] for start, end in zip(offsets[:-1], offsets[1:])]
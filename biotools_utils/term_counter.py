@@ -0,0 +1,75 @@
+"""
+Hierarchy-aware counting of EDAM terms
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .edam_index import EdamIndex
+from .term_matrix import TermMatrix
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def count_term_hierarchy(term_matrix: TermMatrix, index: EdamIndex) -> "pd.DataFrame":
+    """
+    Count the tools annotated with each EDAM term, both directly and anywhere under the term.
+
+    The counts are rolled up the EDAM tree with a single sparse product of the tool by term matrix and the ancestor
+    closure of the index, so a tool tagged "Surgery" also counts towards "Medicine" and "Topic". A tool is counted once
+    per term, even if several of its terms are under it.
+    :param term_matrix: The tool by term matrix.
+    :param index: The EDAM index with the terms of the matrix.
+    :return: The dataframe indexed by the term ID, with the name, depth, direct count and rolled-up count of every term
+        with at least one tool, sorted by the rolled-up count. Terms missing from the index have the depth -1.
+    """
+    import pandas as pd
+
+    matrix = term_matrix.matrix.tocsr()
+    under = matrix @ index.closure_matrix(term_matrix.terms)
+    total = under.getnnz(axis=0)
+
+    direct = np.zeros(len(index), dtype=np.int64)
+    unknown_terms: dict = {}
+    for term, count in zip(term_matrix.terms, matrix.getnnz(axis=0)):
+        if term in index.codes:
+            direct[index.codes[term]] += count
+        elif count > 0:
+            unknown_terms[term] = count
+
+    counts = pd.DataFrame({"name": index.names, "depth": index.depths, "direct": direct, "total": total},
+                          index=pd.Index(index.term_ids, name="term"))
+    # Terms missing from the index cannot be rolled up, and are kept with depth -1
+    unknown_counts = pd.DataFrame({"name": "N/A", "depth": -1, "direct": list(unknown_terms.values()),
+                                   "total": list(unknown_terms.values())},
+                                  index=pd.Index(list(unknown_terms), name="term"))
+    counts = pd.concat([counts[counts["total"] > 0], unknown_counts]) if unknown_terms else counts[counts["total"] > 0]
+    return counts.sort_values(["total", "direct"], ascending=False, kind="stable")
+
+
+def top_terms_per_level(counts: "pd.DataFrame", top_n: int, column: str = "total") -> "pd.DataFrame":
+    """
+    Get the most frequent terms at each depth of the EDAM tree.
+    :param counts: The counts from `count_term_hierarchy`.
+    :param top_n: The number of terms per depth.
+    :param column: The count to rank by, 'total' or 'direct'.
+    :return: The dataframe with up to `top_n` terms per depth, sorted by depth and count.
+    """
+    ranked = counts[(counts[column] > 0) & (counts["depth"] >= 0)]
+    ranked = ranked.sort_values(["depth", column], ascending=[True, False], kind="stable")
+    return ranked.groupby("depth", sort=True).head(top_n)
@@ -0,0 +1,162 @@
+"""
+Sparse tool by term incidence matrices
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+from .edam_term_extractor import EDAM_PREFIX, ExtractedTerms, extract_all_terms
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+@dataclass
+class TermMatrix:
+    """
+    A binary tool by term matrix in CSR format, with row `i` for the tool `tool_ids[i]` and column `j` for the term
+    `terms[j]`.
+    """
+    matrix: sparse.csr_matrix
+    tool_ids: List[str]
+    terms: List[str]
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        """
+        Convert the matrix to a sparse dataframe.
+        :return: The dataframe indexed by the tool ID, with one column per term.
+        """
+        import pandas as pd
+
+        return pd.DataFrame.sparse.from_spmatrix(self.matrix, index=pd.Index(self.tool_ids, name="ID"),
+                                                 columns=self.terms)
+
+
+def build_term_matrix(codes: Sequence[int], offsets: Sequence[int], vocabulary: Sequence[str], tool_ids: List[str],
+                      terms: Optional[Sequence[str]] = None) -> TermMatrix:
+    """
+    Build the matrix of a term type from term codes and row offsets, e.g. from `ExtractedTerms` or `ToolStore`.
+    :param codes: The term codes, positions in the vocabulary.
+    :param offsets: The offsets of the codes of each tool.
+    :param vocabulary: The terms of the codes.
+    :param tool_ids: The tool IDs.
+    :param terms: The terms used as columns, e.g. all terms in an EDAM index. If None, the sorted vocabulary is used.
+        Terms not in the columns are dropped.
+    :return: The term matrix.
+    """
+    columns: List[str] = sorted(vocabulary) if terms is None else list(terms)
+    column_of = {term: column for column, term in enumerate(columns)}
+    # Map each vocabulary code to its column once, so the codes are translated in a single vectorised step
+    code_columns = np.array([column_of.get(term, -1) for term in vocabulary], dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+
+    indices = code_columns[codes] if len(codes) > 0 else np.empty(0, dtype=np.int64)
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    keep = indices >= 0
+    matrix = sparse.csr_matrix((np.ones(int(keep.sum()), dtype=np.int8), (rows[keep], indices[keep])),
+                               shape=(len(offsets) - 1, len(columns)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return TermMatrix(matrix=matrix, tool_ids=tool_ids, terms=columns)
+
+
+def build_term_matrices(tools: Iterable[dict] | ExtractedTerms, term_types: Sequence[str] = ("topic", "operation"),
+                        terms: Optional[Dict[str, Sequence[str]]] = None) -> Dict[str, TermMatrix]:
+    """
+    Build the tool by term matrices of a list of tools in one pass over the tools.
+    :param tools: The tools, or the terms already extracted from them.
+    :param term_types: The term types to build matrices for.
+    :param terms: The dictionary with the term type and the terms used as columns. Term types not in the dictionary
+        use their sorted vocabulary.
+    :return: The dictionary with the term type and the term matrix.
+    """
+    extracted = tools if isinstance(tools, ExtractedTerms) else extract_all_terms(tools=tools)
+    terms = terms or {}
+    return {term_type.lower(): build_term_matrix(codes=extracted.codes[term_type.lower()],
+                                                 offsets=extracted.offsets[term_type.lower()],
+                                                 vocabulary=extracted.vocabularies[term_type.lower()],
+                                                 tool_ids=extracted.tool_ids, terms=terms.get(term_type.lower()))
+            for term_type in term_types}
+
+
+def term_matrix_from_strings(column: "pd.Series", regex: str, terms: Optional[Sequence[str]] = None) -> TermMatrix:
+    """
+    Build a term matrix from a spreadsheet column with one 'Name (term_id)' entry per line, as written by
+    `create_tool_list`.
+    :param column: The column, indexed by the tool ID.
+    :param regex: The regex with one group capturing the term ID, e.g. r"\\((topic_[0-9]{4})\\)".
+    :param terms: The terms used as columns. If None, the sorted terms found in the column are used.
+    :return: The term matrix.
+    """
+    import pandas as pd
+
+    matches = column.fillna("").astype(str).reset_index(drop=True).str.extractall(regex)[0]
+    codes, vocabulary = pd.factorize(matches.to_numpy())
+    offsets = np.zeros(len(column) + 1, dtype=np.int64)
+    np.add.at(offsets, matches.index.get_level_values(0).to_numpy() + 1, 1)
+    # extractall keeps the rows in order, so the codes are already grouped by row
+    return build_term_matrix(codes=codes, offsets=np.cumsum(offsets), vocabulary=list(vocabulary),
+                             tool_ids=[str(tool_id) for tool_id in column.index], terms=terms)
+
+
+def combine_term_matrices(term_matrices: Iterable[TermMatrix]) -> TermMatrix:
+    """
+    Combine the matrices of several term types side by side, e.g. to compare tools on all their terms at once.
+    :param term_matrices: The term matrices, with the same tools in the same order.
+    :return: The term matrix with the columns of all the matrices.
+    """
+    term_matrices = list(term_matrices)
+    if len(term_matrices) == 0:
+        raise ValueError("At least one term matrix is required.")
+    tool_ids = term_matrices[0].tool_ids
+    if any(term_matrix.tool_ids != tool_ids for term_matrix in term_matrices[1:]):
+        raise ValueError("The term matrices must have the same tools in the same order.")
+    return TermMatrix(matrix=sparse.hstack([term_matrix.matrix for term_matrix in term_matrices], format="csr"),
+                      tool_ids=tool_ids, terms=[term for term_matrix in term_matrices for term in term_matrix.terms])
+
+
+def term_matrix_from_transactions(*transactions: Dict[str, Iterable[dict | str]],
+                                  terms: Optional[Sequence[str]] = None) -> TermMatrix:
+    """
+    Build a term matrix from dictionaries with the tool ID and its terms, e.g. the output of `extract_terms` for one
+    or more term types. The terms of a tool in several dictionaries are combined.
+    :param transactions: The dictionaries with the tool ID and the terms, either term dictionaries with the 'uri' or
+        term IDs.
+    :param terms: The terms used as columns. If None, the sorted terms found in the dictionaries are used.
+    :return: The term matrix.
+    """
+    tool_rows: Dict[str, int] = {}
+    vocabulary: Dict[str, int] = {}
+    rows: List[int] = []
+    codes: List[int] = []
+    for tool_terms in transactions:
+        for tool_id, tool_term_list in tool_terms.items():
+            row = tool_rows.setdefault(tool_id, len(tool_rows))
+            for term in tool_term_list:
+                term_id = term["uri"].replace(EDAM_PREFIX, "") if isinstance(term, dict) else term
+                rows.append(row)
+                codes.append(vocabulary.setdefault(term_id, len(vocabulary)))
+
+    # Group the codes by tool, as the tools of the later dictionaries may already have terms
+    order = np.argsort(np.asarray(rows, dtype=np.int64), kind="stable")
+    offsets = np.zeros(len(tool_rows) + 1, dtype=np.int64)
+    np.add.at(offsets, np.asarray(rows, dtype=np.int64) + 1, 1)
+    return build_term_matrix(codes=np.asarray(codes, dtype=np.int64)[order], offsets=np.cumsum(offsets),
+                             vocabulary=list(vocabulary), tool_ids=list(tool_rows), terms=terms)
@@ -0,0 +1,194 @@
+"""
+Scalable clustering of tools over their sparse EDAM term vectors
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .term_matrix import TermMatrix
+from .tool_similarity import top_k_similar
+
+
+@dataclass
+class ClusteringResult:
+    """
+    The cluster of each tool, where `labels[i]` is the cluster of the tool `tool_ids[i]` and -1 marks tools in no
+    cluster. Row `c` of `centroids` is the mean TF-IDF vector of the tools in cluster `c`.
+    """
+    tool_ids: List[str]
+    labels: np.ndarray
+    terms: List[str]
+    centroids: np.ndarray
+    sizes: np.ndarray
+
+    @property
+    def number_of_clusters(self) -> int:
+        """
+        The number of clusters.
+        """
+        return len(self.sizes)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Convert the labels to a dataframe.
+        :return: The dataframe indexed by the tool ID, with the 'Cluster' column.
+        """
+        return pd.DataFrame({"Cluster": self.labels}, index=pd.Index(self.tool_ids, name="ID"))
+
+    def top_terms(self, number_of_terms: int = 5) -> Dict[int, List[str]]:
+        """
+        Get the terms with the highest weight in each centroid.
+        :param number_of_terms: The number of terms per cluster.
+        :return: The dictionary with the cluster and its terms, by decreasing weight.
+        """
+        top = np.argsort(-self.centroids, axis=1, kind="stable")[:, :number_of_terms]
+        return {cluster: [self.terms[column] for column in top[cluster] if self.centroids[cluster, column] > 0]
+                for cluster in range(self.number_of_clusters)}
+
+    def summary_linkage(self, method: str = "ward") -> np.ndarray:
+        """
+        Link the cluster centroids hierarchically, which only needs the distances between the clusters instead of
+        between all tools.
+        :param method: The linkage method, see `scipy.cluster.hierarchy.linkage`.
+        :return: The linkage matrix of the clusters.
+        """
+        if self.number_of_clusters < 2:
+            raise ValueError("At least two clusters are needed for a dendrogram.")
+        from scipy.cluster import hierarchy
+
+        return hierarchy.linkage(self.centroids, method=method)
+
+    def plot_dendrogram(self, ax=None, term_names: Optional[Dict[str, str]] = None, number_of_terms: int = 3,
+                        method: str = "ward") -> dict:
+        """
+        Plot the dendrogram of the clusters, with one leaf per cluster labelled by its size and top terms.
+        :param ax: The matplotlib axes, or None to use the current axes.
+        :param term_names: The dictionary with the term ID and the name used in the labels, e.g. from `EdamIndex`.
+            The term IDs are used if not given.
+        :param number_of_terms: The number of terms in each label.
+        :param method: The linkage method.
+        :return: The dictionary returned by `scipy.cluster.hierarchy.dendrogram`.
+        """
+        from matplotlib import pyplot as plt
+        from scipy.cluster import hierarchy
+
+        term_names = term_names or {}
+        top_terms = self.top_terms(number_of_terms=number_of_terms)
+        labels = [f"{cluster} ({self.sizes[cluster]}): " + ", ".join(term_names.get(term, term) for term in terms)
+                  for cluster, terms in top_terms.items()]
+        return hierarchy.dendrogram(self.summary_linkage(method=method), labels=labels, orientation="left",
+                                    ax=ax if ax is not None else plt.gca())
+
+
+def tfidf_vectors(term_matrix: TermMatrix) -> sparse.csr_matrix:
+    """
+    Weight the terms of each tool by TF-IDF, so rare terms count more than terms most tools have.
+    :param term_matrix: The tool by term matrix.
+    :return: The sparse matrix with the L2-normalised TF-IDF vector of each tool.
+    """
+    from sklearn.feature_extraction.text import TfidfTransformer
+
+    return TfidfTransformer(norm="l2").fit_transform(term_matrix.matrix).tocsr()
+
+
+def cluster_kmeans(term_matrix: TermMatrix, number_of_clusters: int = 20, batch_size: int = 2048,
+                   seed: int = 0) -> ClusteringResult:
+    """
+    Cluster the tools with mini-batch k-means on their TF-IDF vectors, which works directly on the sparse vectors in
+    time and memory linear in the number of tools.
+    :param term_matrix: The tool by term matrix.
+    :param number_of_clusters: The number of clusters, at most the number of tools with terms.
+    :param batch_size: The number of tools per mini-batch.
+    :param seed: The random seed.
+    :return: The clustering. Tools without terms are in no cluster.
+    """
+    vectors = tfidf_vectors(term_matrix)
+    has_terms = np.diff(vectors.indptr) > 0
+    labels = np.full(vectors.shape[0], -1, dtype=np.int64)
+    number_of_clusters = min(number_of_clusters, int(has_terms.sum()))
+    if number_of_clusters > 0:
+        from sklearn.cluster import MiniBatchKMeans
+
+        kmeans = MiniBatchKMeans(n_clusters=number_of_clusters, batch_size=batch_size, random_state=seed, n_init=3)
+        labels[has_terms] = kmeans.fit_predict(vectors[has_terms])
+    return _build_result(term_matrix=term_matrix, vectors=vectors, labels=labels)
+
+
+def cluster_knn_graph(term_matrix: TermMatrix, k: int = 15, min_cluster_size: int = 10, min_samples: int = 5,
+                      workers: int = 1) -> ClusteringResult:
+    """
+    Cluster the tools with HDBSCAN on the graph of the k most similar tools of each tool.
+
+    The Jaccard distances are only kept for the k nearest neighbours, so the distance matrix is sparse with at most
+    2k entries per tool. Tools with fewer than `min_samples` neighbours sharing a term are in no cluster.
+    :param term_matrix: The tool by term matrix.
+    :param k: The number of neighbours per tool.
+    :param min_cluster_size: The smallest number of tools in a cluster.
+    :param min_samples: The number of neighbours of a core tool, at most `k`.
+    :param workers: The number of processes for the neighbour search.
+    :return: The clustering. Tools in no cluster have the label -1.
+    """
+    neighbours = top_k_similar(term_matrix=term_matrix, k=k, metric="jaccard", workers=workers)
+    rows = {tool_id: row for row, tool_id in enumerate(term_matrix.tool_ids)}
+    number_of_tools = len(term_matrix.tool_ids)
+    # Identical tools have distance 0, which would be taken as a missing edge, so all distances are shifted a little
+    distances = sparse.csr_matrix((1.0 - neighbours["Similarity"].to_numpy(dtype=np.float64) + 1e-9,
+                                   (neighbours["ID"].map(rows).to_numpy(),
+                                    neighbours["SimilarID"].map(rows).to_numpy())),
+                                  shape=(number_of_tools, number_of_tools))
+    distances = distances.maximum(distances.T).tocsr()
+
+    # HDBSCAN needs min_samples neighbours for every tool, and removing a tool can leave others with too few
+    kept = np.arange(number_of_tools)
+    while len(kept) > 0:
+        enough = np.diff(distances.indptr) >= min_samples
+        if enough.all():
+            break
+        kept = kept[enough]
+        distances = distances[enough][:, enough]
+
+    labels = np.full(number_of_tools, -1, dtype=np.int64)
+    if len(kept) > min_cluster_size:
+        from sklearn.cluster import HDBSCAN
+
+        labels[kept] = HDBSCAN(metric="precomputed", min_cluster_size=min_cluster_size, min_samples=min_samples,
+                               copy=True).fit_predict(distances)
+    return _build_result(term_matrix=term_matrix, vectors=tfidf_vectors(term_matrix), labels=labels)
+
+
+def _build_result(term_matrix: TermMatrix, vectors: sparse.csr_matrix, labels: np.ndarray) -> ClusteringResult:
+    """
+    Renumber the non-empty clusters and compute their centroids with one sparse product.
+    :param term_matrix: The tool by term matrix.
+    :param vectors: The TF-IDF vectors of the tools.
+    :param labels: The cluster of each tool, or -1.
+    :return: The clustering.
+    """
+    clustered = np.flatnonzero(labels >= 0)
+    _, cluster_labels = np.unique(labels[clustered], return_inverse=True)
+    labels = np.full(len(labels), -1, dtype=np.int64)
+    labels[clustered] = cluster_labels
+    sizes = np.bincount(cluster_labels, minlength=cluster_labels.max() + 1 if len(cluster_labels) > 0 else 0)
+
+    membership = sparse.csr_matrix((np.ones(len(clustered)), (cluster_labels, clustered)),
+                                   shape=(len(sizes), len(labels)))
+    centroids = np.asarray((membership @ vectors).todense()) / np.maximum(sizes, 1).reshape(-1, 1)
+    return ClusteringResult(tool_ids=term_matrix.tool_ids, labels=labels, terms=term_matrix.terms,
+                            centroids=centroids, sizes=sizes)
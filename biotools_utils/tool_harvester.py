@@ -0,0 +1,183 @@
+"""
+Concurrent and resumable harvesting of the tool list from bio.tools
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import math
+import os
+import shutil
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, Optional
+
+import requests
+
+from .http_utils import REQUEST_TIMEOUT, TokenBucket, create_session
+
+BIOTOOLS_API_URL: str = "https://bio.tools/api/t/"
+
+
+def harvest_tools(params: Optional[Dict[str, str]] = None, base_url: str = BIOTOOLS_API_URL,
+                  checkpoint_dir: Optional[str] = None, workers: int = 4, requests_per_second: float = 4.0,
+                  burst: int = 4, session: Optional[requests.Session] = None) -> Iterator[dict]:
+    """
+    Harvest the tools from the bio.tools API and yield them one at a time in page order.
+
+    The pages are fetched concurrently by a pool of workers sharing one session, while a token bucket keeps the
+    number of requests within the budget. If a checkpoint directory is given, each page is written to it as soon as it
+    has been downloaded, and pages already in the directory are read from disk instead, so an interrupted harvest
+    resumes where it stopped. The directory is removed once all tools have been yielded, so the next harvest fetches
+    the catalogue again. The number of pages is estimated from the first page, and the pages after it are fetched
+    one at a time while the API reports a next page, e.g. for tools registered during a long harvest.
+    :param params: The extra query parameters, e.g. {"collectionID": '"Proteomics"'}.
+    :param base_url: The URL of the tool list endpoint.
+    :param checkpoint_dir: The directory for the page checkpoints, or None to disable checkpointing.
+    :param workers: The number of concurrent requests.
+    :param requests_per_second: The sustained number of requests per second.
+    :param burst: The number of requests allowed in a burst.
+    :param session: The session to use. A pooled session is created if not given.
+    :return: The iterator over the tools.
+    """
+    query: Dict[str, str] = {"format": "json"}
+    query.update(params or {})
+    if checkpoint_dir is not None:
+        _prepare_checkpoint_dir(checkpoint_dir=checkpoint_dir, base_url=base_url, query=query)
+
+    bucket = TokenBucket(rate=requests_per_second, capacity=burst)
+    own_session = session is None
+    if session is None:
+        session = create_session(pool_size=workers)
+
+    def get_page(page: int) -> dict:
+        return _load_or_fetch_page(session=session, bucket=bucket, base_url=base_url, query=query, page=page,
+                                   checkpoint_dir=checkpoint_dir)
+
+    try:
+        first_page = get_page(1)
+        yield from first_page["list"]
+        if first_page["next"] is not None and len(first_page["list"]) > 0:
+            number_of_pages = math.ceil(first_page["count"] / len(first_page["list"]))
+            last_page = first_page
+
+            # Keep a bounded window of pages in flight, so the memory use does not grow with the catalogue size
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pages = iter(range(2, number_of_pages + 1))
+                pending: Deque[Future] = deque(executor.submit(get_page, page)
+                                               for page in _take(pages, workers * 2))
+                while pending:
+                    last_page = pending.popleft().result()
+                    for page in _take(pages, 1):
+                        pending.append(executor.submit(get_page, page))
+                    yield from last_page["list"]
+
+            # The catalogue grew while harvesting, so there are pages after the last page counted on the first page
+            page = number_of_pages
+            while last_page["next"] is not None and len(last_page["list"]) > 0:
+                page += 1
+                last_page = get_page(page)
+                yield from last_page["list"]
+        # The harvest is complete, so the checkpoints would only return this catalogue again on the next harvest
+        if checkpoint_dir is not None:
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    finally:
+        if own_session:
+            session.close()
+
+
+def save_tool_list(tools: Iterable[dict], path: str) -> int:
+    """
+    Write the tools to a JSON file one at a time, without holding the tool list in memory.
+    :param tools: The tools.
+    :param path: The path of the JSON file.
+    :return: The number of tools written.
+    """
+    number_of_tools: int = 0
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "w") as f:
+        f.write("[")
+        for tool in tools:
+            if number_of_tools > 0:
+                f.write(",")
+            f.write(json.dumps(tool))
+            number_of_tools += 1
+        f.write("]")
+    os.replace(tmp_path, path)
+    return number_of_tools
+
+
+def _load_or_fetch_page(session: requests.Session, bucket: TokenBucket, base_url: str, query: Dict[str, str],
+                        page: int, checkpoint_dir: Optional[str]) -> dict:
+    """
+    Get a page of tools, either from the checkpoint directory or from the API.
+    :param session: The session.
+    :param bucket: The token bucket limiting the requests.
+    :param base_url: The URL of the tool list endpoint.
+    :param query: The query parameters.
+    :param page: The page number.
+    :param checkpoint_dir: The checkpoint directory, or None.
+    :return: The page as returned by the API.
+    """
+    page_path = os.path.join(checkpoint_dir, f"page_{page:06d}.json") if checkpoint_dir is not None else None
+    if page_path is not None and os.path.exists(page_path):
+        with open(page_path, "r") as f:
+            return json.load(f)
+
+    bucket.acquire()
+    resp = session.get(base_url, params={**query, "page": page}, timeout=REQUEST_TIMEOUT)
+    if resp.status_code == 404 and page > 1:
+        # The catalogue shrank while harvesting, so the page no longer exists
+        return {"count": 0, "next": None, "previous": None, "list": []}
+    resp.raise_for_status()
+    resp_json = resp.json()
+
+    if page_path is not None:
+        tmp_path = f"{page_path}.part"
+        with open(tmp_path, "w") as f:
+            json.dump(resp_json, f)
+        os.replace(tmp_path, page_path)
+    return resp_json
+
+
+def _prepare_checkpoint_dir(checkpoint_dir: str, base_url: str, query: Dict[str, str]):
+    """
+    Create the checkpoint directory, and verify that existing checkpoints belong to the same harvest.
+    :param checkpoint_dir: The checkpoint directory.
+    :param base_url: The URL of the tool list endpoint.
+    :param query: The query parameters.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    manifest_path = os.path.join(checkpoint_dir, "manifest.json")
+    manifest = {"base_url": base_url, "query": query}
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            existing_manifest = json.load(f)
+        if existing_manifest != manifest:
+            raise ValueError(f"The checkpoint directory '{checkpoint_dir}' belongs to another harvest "
+                             f"({existing_manifest}).")
+    else:
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+
+
+def _take(iterator: Iterator[int], n: int) -> list:
+    """
+    Take up to n items from an iterator.
+    :param iterator: The iterator.
+    :param n: The number of items.
+    :return: The list of items.
+    """
+    return [item for _, item in zip(range(n), iterator)]
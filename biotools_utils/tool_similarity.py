@@ -0,0 +1,357 @@
+"""
+Pairwise similarity of tools over their sparse EDAM term vectors
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .term_matrix import TermMatrix
+
+METRICS: Tuple[str, ...] = ("jaccard", "cosine", "gower")
+# The Mersenne prime 2^31 - 1 used by the MinHash functions, small enough that a * x + b fits in 64 bits
+MINHASH_PRIME: int = (1 << 31) - 1
+
+
+def similarity_block(intersections: np.ndarray, row_sizes: np.ndarray, column_sizes: np.ndarray,
+                     number_of_terms: int, metric: str = "jaccard") -> np.ndarray:
+    """
+    Compute the similarities of a block of tool pairs from the number of shared terms.
+
+    For binary term vectors a and b with |a ∩ b| shared terms:
+    - 'jaccard' is |a ∩ b| / |a ∪ b|.
+    - 'cosine' is |a ∩ b| / sqrt(|a| |b|).
+    - 'gower' is the fraction of all terms on which the tools agree, i.e. both have or both lack the term, which is
+      the Gower similarity of one-hot encoded terms.
+    Tools without terms have similarity 0 to all tools with 'jaccard' and 'cosine'.
+    :param intersections: The number of shared terms, with one row per tool of the block.
+    :param row_sizes: The number of terms of the tools in the rows.
+    :param column_sizes: The number of terms of the tools in the columns.
+    :param number_of_terms: The number of terms, i.e. the columns of the term matrix.
+    :param metric: The metric, 'jaccard', 'cosine' or 'gower'.
+    :return: The similarities with the shape of the intersections.
+    """
+    return _similarities(intersections=intersections, sizes=row_sizes.reshape(-1, 1),
+                         other_sizes=column_sizes.reshape(1, -1), number_of_terms=number_of_terms, metric=metric)
+
+
+def top_k_similar(term_matrix: TermMatrix, k: int = 10, metric: str = "jaccard", workers: int = 1,
+                  block_size: int = 512, min_similarity: float = 0.0) -> pd.DataFrame:
+    """
+    Find the k most similar tools of every tool.
+
+    The similarities are computed in blocks of rows, each a sparse product of the rows with the whole matrix, so only
+    one block of similarities is held in memory per worker instead of the full n x n matrix. The blocks are spread
+    over a pool of processes if `workers` is above 1.
+    :param term_matrix: The tool by term matrix, e.g. combining all term types with `combine_term_matrices`.
+    :param k: The number of similar tools per tool.
+    :param metric: The metric, 'jaccard', 'cosine' or 'gower'. See `similarity_block`.
+    :param workers: The number of processes.
+    :param block_size: The number of rows per block.
+    :param min_similarity: The lowest similarity kept. Pairs with similarity 0 are never kept.
+    :return: The dataframe with the columns 'ID', 'SimilarID' and 'Similarity', in the order of the tools and by
+        decreasing similarity.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}.")
+    state = _SimilarityState(matrix=term_matrix.matrix, metric=metric, k=min(k, term_matrix.matrix.shape[0] - 1))
+    starts = range(0, term_matrix.matrix.shape[0], block_size)
+    blocks = [(start, min(start + block_size, term_matrix.matrix.shape[0])) for start in starts]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(state,)) as executor:
+            results = list(executor.map(_top_k_block, blocks))
+    else:
+        results = [state.top_k(start=start, stop=stop) for start, stop in blocks]
+
+    rows = np.concatenate([result[0] for result in results]) if results else np.empty(0, dtype=np.int64)
+    columns = np.concatenate([result[1] for result in results]) if results else np.empty(0, dtype=np.int64)
+    similarities = np.concatenate([result[2] for result in results]) if results else np.empty(0, dtype=np.float32)
+    keep = (similarities > 0) & (similarities >= min_similarity)
+    tool_ids = np.asarray(term_matrix.tool_ids, dtype=object)
+    return pd.DataFrame({"ID": tool_ids[rows[keep]], "SimilarID": tool_ids[columns[keep]],
+                         "Similarity": similarities[keep]})
+
+
+def similar_tools(term_matrix: TermMatrix, tool_id: str, k: int = 10, metric: str = "jaccard") -> pd.DataFrame:
+    """
+    Find the k most similar tools of a single tool with one sparse product.
+    :param term_matrix: The tool by term matrix.
+    :param tool_id: The tool ID.
+    :param k: The number of similar tools.
+    :param metric: The metric, 'jaccard', 'cosine' or 'gower'.
+    :return: The dataframe with the columns 'SimilarID' and 'Similarity', sorted by decreasing similarity.
+    """
+    row = term_matrix.tool_ids.index(tool_id)
+    state = _SimilarityState(matrix=term_matrix.matrix, metric=metric, k=min(k, term_matrix.matrix.shape[0] - 1))
+    _, columns, similarities = state.top_k(start=row, stop=row + 1)
+    keep = similarities > 0
+    return pd.DataFrame({"SimilarID": [term_matrix.tool_ids[column] for column in columns[keep]],
+                         "Similarity": similarities[keep]})
+
+
+def pair_similarity(term_matrix: TermMatrix, rows: np.ndarray, other_rows: np.ndarray,
+                    metric: str = "jaccard") -> np.ndarray:
+    """
+    Compute the similarities of the given pairs of tools.
+    :param term_matrix: The tool by term matrix.
+    :param rows: The rows of the first tool of each pair.
+    :param other_rows: The rows of the second tool of each pair.
+    :param metric: The metric, 'jaccard', 'cosine' or 'gower'.
+    :return: The similarity of each pair.
+    """
+    matrix = term_matrix.matrix.astype(np.float32)
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    intersections = np.asarray(matrix[rows].multiply(matrix[other_rows]).sum(axis=1)).ravel()
+    return _similarities(intersections=intersections, sizes=sizes[rows], other_sizes=sizes[other_rows],
+                         number_of_terms=matrix.shape[1], metric=metric)
+
+
+class MinHashLSH:
+    """
+    MinHash signatures with locality-sensitive hashing, to find the pairs of tools with a high Jaccard similarity
+    without comparing all pairs.
+
+    Each tool gets `num_perm` MinHash values, where the probability that two tools share a value is their Jaccard
+    similarity. The signatures are cut into `bands` bands, and tools sharing all the values of any band become
+    candidate pairs. Pairs with a Jaccard similarity above roughly (1 / bands) ^ (1 / rows per band) are likely to
+    become candidates.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, seed: int = 1):
+        """
+        Create the hash functions.
+        :param num_perm: The number of hash functions, i.e. the length of the signatures.
+        :param bands: The number of bands, which must divide `num_perm`.
+        :param seed: The random seed of the hash functions.
+        """
+        if num_perm % bands != 0:
+            raise ValueError(f"The number of bands ({bands}) must divide the number of hash functions ({num_perm}).")
+        rng = np.random.default_rng(seed)
+        self.num_perm: int = num_perm
+        self.bands: int = bands
+        self._a: np.ndarray = rng.integers(1, MINHASH_PRIME, size=num_perm, dtype=np.int64)
+        self._b: np.ndarray = rng.integers(0, MINHASH_PRIME, size=num_perm, dtype=np.int64)
+
+    @property
+    def threshold(self) -> float:
+        """
+        The approximate Jaccard similarity above which pairs are likely to become candidates.
+        """
+        return (1 / self.bands) ** (self.bands / self.num_perm)
+
+    def signatures(self, matrix: sparse.csr_matrix, chunk_size: int = 16) -> np.ndarray:
+        """
+        Compute the MinHash signatures of all tools at once.
+        :param matrix: The tool by term matrix.
+        :param chunk_size: The number of hash functions evaluated at a time, to bound the memory use.
+        :return: The signature matrix with one row per tool. Tools without terms get the maximal value everywhere.
+        """
+        matrix = matrix.tocsr()
+        signatures = np.full((matrix.shape[0], self.num_perm), MINHASH_PRIME, dtype=np.int64)
+        non_empty = np.flatnonzero(np.diff(matrix.indptr) > 0)
+        if len(non_empty) == 0:
+            return signatures
+        indices = matrix.indices.astype(np.int64).reshape(-1, 1)
+        for start in range(0, self.num_perm, chunk_size):
+            stop = min(start + chunk_size, self.num_perm)
+            hashes = (indices * self._a[start:stop] + self._b[start:stop]) % MINHASH_PRIME
+            # The minimum over the terms of each tool, in one pass over the non-zeros
+            signatures[non_empty, start:stop] = np.minimum.reduceat(hashes, matrix.indptr[non_empty], axis=0)
+        return signatures
+
+    def candidate_pairs(self, signatures: np.ndarray, max_bucket_size: Optional[int] = None) -> np.ndarray:
+        """
+        Find the pairs of tools sharing at least one band of their signatures.
+        :param signatures: The signatures.
+        :param max_bucket_size: Skip buckets with more tools than this, or None to keep all buckets.
+        :return: The unique pairs (i, j) with i < j, one per row.
+        """
+        rows_per_band = self.num_perm // self.bands
+        pairs: List[np.ndarray] = []
+        for band in range(self.bands):
+            band_values = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+            _, labels, counts = np.unique(band_values, axis=0, return_inverse=True, return_counts=True)
+            labels = labels.ravel()
+            order = np.argsort(labels, kind="stable")
+            bucket_starts = np.concatenate(([0], np.cumsum(counts)))
+            for bucket in np.flatnonzero(counts > 1):
+                if max_bucket_size is not None and counts[bucket] > max_bucket_size:
+                    continue
+                members = order[bucket_starts[bucket]:bucket_starts[bucket + 1]]
+                first, second = np.triu_indices(len(members), k=1)
+                pairs.append(np.column_stack((members[first], members[second])))
+        if len(pairs) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        return np.unique(np.sort(np.concatenate(pairs), axis=1), axis=0)
+
+
+def find_duplicates(term_matrix: TermMatrix, threshold: float = 0.8, min_terms: int = 3, num_perm: int = 128,
+                    bands: int = 16, max_bucket_size: Optional[int] = 1000) -> pd.DataFrame:
+    """
+    Find likely duplicate tools, i.e. pairs of tools with a Jaccard similarity of at least `threshold`.
+
+    The candidate pairs are found with MinHash and LSH, and their exact Jaccard similarity is checked, so the result
+    has no false positives, while a few true pairs may be missed. Tools with few terms are skipped, as sharing one or
+    two terms is common and not a sign of duplication.
+    :param term_matrix: The tool by term matrix, e.g. combining all term types with `combine_term_matrices`.
+    :param threshold: The lowest Jaccard similarity of a duplicate pair.
+    :param min_terms: The smallest number of terms of a compared tool.
+    :param num_perm: The number of MinHash functions.
+    :param bands: The number of LSH bands. See `MinHashLSH`.
+    :param max_bucket_size: Skip LSH buckets with more tools than this, or None to keep all buckets.
+    :return: The dataframe with the columns 'ID', 'SimilarID' and 'Similarity', sorted by decreasing similarity.
+    """
+    matrix = term_matrix.matrix.tocsr()
+    kept_rows = np.flatnonzero(np.diff(matrix.indptr) >= max(min_terms, 1))
+    lsh = MinHashLSH(num_perm=num_perm, bands=bands)
+    pairs = kept_rows[lsh.candidate_pairs(lsh.signatures(matrix[kept_rows]), max_bucket_size=max_bucket_size)]
+    if len(pairs) == 0:
+        return pd.DataFrame({"ID": [], "SimilarID": [], "Similarity": []})
+
+    similarities = pair_similarity(term_matrix=term_matrix, rows=pairs[:, 0], other_rows=pairs[:, 1],
+                                   metric="jaccard")
+    keep = similarities >= threshold
+    order = np.argsort(-similarities[keep], kind="stable")
+    tool_ids = np.asarray(term_matrix.tool_ids, dtype=object)
+    return pd.DataFrame({"ID": tool_ids[pairs[keep, 0][order]], "SimilarID": tool_ids[pairs[keep, 1][order]],
+                         "Similarity": similarities[keep][order]}).reset_index(drop=True)
+
+
+def _similarities(intersections: np.ndarray, sizes: np.ndarray, other_sizes: np.ndarray, number_of_terms: int,
+                  metric: str) -> np.ndarray:
+    """
+    Compute similarities element-wise from the number of shared terms, broadcasting the sizes.
+    :param intersections: The number of shared terms.
+    :param sizes: The number of terms of the first tools.
+    :param other_sizes: The number of terms of the second tools.
+    :param number_of_terms: The number of terms, i.e. the columns of the term matrix.
+    :param metric: The metric, 'jaccard', 'cosine' or 'gower'.
+    :return: The similarities.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if metric == "jaccard":
+            similarities = intersections / (sizes + other_sizes - intersections)
+        elif metric == "cosine":
+            similarities = intersections / np.sqrt(sizes * other_sizes)
+        elif metric == "gower":
+            similarities = (number_of_terms - sizes - other_sizes + 2 * intersections) / number_of_terms
+        else:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}.")
+    similarities = np.asarray(similarities, dtype=np.float32)
+    similarities[~np.isfinite(similarities)] = 0.0
+    return similarities
+
+
+class _SimilarityState:
+    """
+    The matrix and metric shared by the blocks of `top_k_similar`, created once per process.
+    """
+
+    def __init__(self, matrix: sparse.csr_matrix, metric: str, k: int):
+        """
+        Prepare the matrix for the block products.
+        :param matrix: The tool by term matrix.
+        :param metric: The metric.
+        :param k: The number of similar tools per tool.
+        """
+        self.matrix: sparse.csr_matrix = matrix.astype(np.float32).tocsr()
+        self.transposed: sparse.csr_matrix = self.matrix.T.tocsr()
+        self.sizes: np.ndarray = np.asarray(self.matrix.sum(axis=1)).ravel()
+        self.metric: str = metric
+        self.k: int = k
+
+    def top_k(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the k most similar tools of the rows in a block.
+        :param start: The first row of the block.
+        :param stop: The row after the last row of the block.
+        :return: The rows, the similar rows and the similarities, sorted by row and decreasing similarity.
+        """
+        if self.k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        block_rows = np.arange(stop - start)
+        intersections = self.matrix[start:stop] @ self.transposed
+        if self.metric != "gower":
+            return self._top_k_sparse(start=start, intersections=intersections)
+
+        # Tools without shared terms still agree on the terms both lack, so the whole block is needed
+        similarities = similarity_block(intersections=intersections.toarray(), row_sizes=self.sizes[start:stop],
+                                        column_sizes=self.sizes, number_of_terms=self.matrix.shape[1],
+                                        metric=self.metric)
+        # A tool is not its own neighbour
+        similarities[block_rows, block_rows + start] = -np.inf
+        top = np.argpartition(-similarities, self.k - 1, axis=1)[:, :self.k]
+        top_similarities = np.take_along_axis(similarities, top, axis=1)
+        order = np.lexsort((top, -top_similarities), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_similarities = np.take_along_axis(top_similarities, order, axis=1)
+        return np.repeat(block_rows + start, self.k), top.ravel(), top_similarities.ravel()
+
+    def _top_k_sparse(self, start: int, intersections: sparse.csr_matrix) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the k most similar tools from the non-zeros of the product, as only the tools sharing a term have a
+        similarity above 0 with 'jaccard' and 'cosine'.
+        :param start: The first row of the block.
+        :param intersections: The sparse number of shared terms of the rows in the block.
+        :return: The rows, the similar rows and the similarities, sorted by row and decreasing similarity.
+        """
+        indptr = intersections.indptr
+        rows = np.repeat(np.arange(intersections.shape[0]), np.diff(indptr))
+        similarities = _similarities(intersections=intersections.data, sizes=self.sizes[start + rows],
+                                     other_sizes=self.sizes[intersections.indices],
+                                     number_of_terms=self.matrix.shape[1], metric=self.metric)
+        # A tool is not its own neighbour
+        similarities[intersections.indices == rows + start] = -np.inf
+
+        top_rows: List[np.ndarray] = []
+        top_columns: List[np.ndarray] = []
+        top_similarities: List[np.ndarray] = []
+        for row in range(intersections.shape[0]):
+            row_similarities = similarities[indptr[row]:indptr[row + 1]]
+            top = np.arange(len(row_similarities))
+            if len(row_similarities) > self.k:
+                top = np.argpartition(-row_similarities, self.k - 1)[:self.k]
+            columns = intersections.indices[indptr[row]:indptr[row + 1]][top]
+            order = np.lexsort((columns, -row_similarities[top]))
+            top_rows.append(np.full(len(top), start + row))
+            top_columns.append(columns[order])
+            top_similarities.append(row_similarities[top][order])
+        return np.concatenate(top_rows), np.concatenate(top_columns), np.concatenate(top_similarities)
+
+
+_worker_state: Optional[_SimilarityState] = None
+
+
+def _init_worker(state: _SimilarityState):
+    """
+    Keep the similarity state in a worker process, so the matrix is only sent once per process.
+    :param state: The similarity state.
+    """
+    global _worker_state
+    _worker_state = state
+
+
+def _top_k_block(block: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find the k most similar tools of the rows in a block in a worker process.
+    :param block: The first row and the row after the last row of the block.
+    :return: The rows, the similar rows and the similarities.
+    """
+    return _worker_state.top_k(start=block[0], stop=block[1])
@@ -0,0 +1,227 @@
+"""
+Compact columnar on-disk store of the tool catalogue
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import os
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .edam_term_extractor import TERM_TYPES, TermExtractor
+from .term_matrix import TermMatrix, build_term_matrix
+from .tool_stream import iter_tools
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+FORMAT_VERSION: int = 1
+STRING_COLUMNS: Tuple[str, ...] = ("biotoolsID", "name", "description")
+TERM_COLUMNS: Tuple[str, ...] = ("collectionID",) + TERM_TYPES
+
+
+class ToolStore:
+    """
+    Read-only view of a columnar tool store.
+
+    The store is a directory with one NumPy file per array and a `meta.json` with the vocabularies. Strings are kept as
+    UTF-8 bytes with an offset array, and the term lists as integer codes into the vocabulary of the column with an
+    offset array, i.e. the same layout as the rows of a CSR matrix. All arrays are memory-mapped, so loading the store
+    only reads the metadata, and the arrays are shared with the page cache instead of being copied.
+    """
+
+    def __init__(self, path: str, meta: dict, arrays: Dict[str, np.ndarray]):
+        """
+        Create the view. Use `ToolStore.load` to open a store.
+        :param path: The path of the store.
+        :param meta: The metadata of the store.
+        :param arrays: The dictionary with the array name and the memory-mapped array.
+        """
+        self.path: str = path
+        self.vocabularies: Dict[str, List[str]] = meta["vocabularies"]
+        self._number_of_tools: int = meta["number_of_tools"]
+        self._arrays: Dict[str, np.ndarray] = arrays
+        self._tool_index: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def load(cls, path: str) -> "ToolStore":
+        """
+        Open a tool store.
+        :param path: The path of the store.
+        :return: The tool store.
+        """
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"The tool store '{path}' has format version '{meta.get('format_version')}', but "
+                             f"version '{FORMAT_VERSION}' is required.")
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in meta["arrays"]}
+        return cls(path=path, meta=meta, arrays=arrays)
+
+    def __len__(self) -> int:
+        return self._number_of_tools
+
+    def get_string(self, column: str, row: int) -> str:
+        """
+        Get a single string value.
+        :param column: The string column, e.g. 'name'.
+        :param row: The row number of the tool.
+        :return: The string.
+        """
+        offsets = self._arrays[f"{column}.offsets"]
+        return bytes(self._arrays[f"{column}.bytes"][offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    def strings(self, column: str) -> List[str]:
+        """
+        Decode all values of a string column.
+        :param column: The string column, e.g. 'name'.
+        :return: The list of strings.
+        """
+        data = bytes(self._arrays[f"{column}.bytes"])
+        offsets = self._arrays[f"{column}.offsets"].tolist()
+        return [data[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def term_codes(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the memory-mapped codes and offsets of a term column, without copying them.
+
+        The codes of the terms of row `i` are `codes[offsets[i]:offsets[i + 1]]`, and the code is the position of the
+        term in `vocabularies[column]`.
+        :param column: The term column, e.g. 'topic'.
+        :return: The tuple with the codes and the offsets.
+        """
+        return self._arrays[f"{column}.codes"], self._arrays[f"{column}.offsets"]
+
+    def get_terms(self, column: str, row: int) -> List[str]:
+        """
+        Get the terms of a single tool.
+        :param column: The term column, e.g. 'topic'.
+        :param row: The row number of the tool.
+        :return: The list of terms.
+        """
+        codes, offsets = self.term_codes(column)
+        vocabulary = self.vocabularies[column]
+        return [vocabulary[code] for code in codes[offsets[row]:offsets[row + 1]]]
+
+    def term_frame(self, column: str) -> "pd.DataFrame":
+        """
+        Get a term column in long format, with one row per tool and term.
+        :param column: The term column, e.g. 'topic'.
+        :return: The dataframe with the row number of the tool and the categorical term.
+        """
+        import pandas as pd
+
+        codes, offsets = self.term_codes(column)
+        rows = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(offsets))
+        terms = pd.Categorical.from_codes(codes, categories=self.vocabularies[column])
+        return pd.DataFrame({"row": rows, column: terms})
+
+    def term_matrix(self, column: str, terms: Optional[Sequence[str]] = None) -> TermMatrix:
+        """
+        Get the tool by term matrix of a term column.
+        :param column: The term column, e.g. 'topic'.
+        :param terms: The terms used as columns. If None, the sorted vocabulary of the column is used.
+        :return: The term matrix.
+        """
+        codes, offsets = self.term_codes(column)
+        return build_term_matrix(codes=codes, offsets=offsets, vocabulary=self.vocabularies[column],
+                                 tool_ids=self.strings("biotoolsID"), terms=terms)
+
+    def row_of(self, tool_id: str) -> int:
+        """
+        Get the row number of a tool.
+        :param tool_id: The bio.tools ID.
+        :return: The row number.
+        """
+        if self._tool_index is None:
+            self._tool_index = {tool: row for row, tool in enumerate(self.strings("biotoolsID"))}
+        return self._tool_index[tool_id]
+
+    def to_dataframe(self, columns: Iterable[str] = STRING_COLUMNS + TERM_COLUMNS) -> "pd.DataFrame":
+        """
+        Materialise the store as a dataframe, with the term columns as lists of terms.
+        :param columns: The columns to include.
+        :return: The dataframe indexed by the bio.tools ID.
+        """
+        import pandas as pd
+
+        data: dict = {}
+        for column in columns:
+            if column in STRING_COLUMNS:
+                data[column] = self.strings(column)
+            else:
+                codes, offsets = self.term_codes(column)
+                vocabulary = np.array(self.vocabularies[column], dtype=object)
+                data[column] = [list(terms) for terms in np.split(vocabulary[codes], offsets[1:-1])]
+        return pd.DataFrame(data, index=pd.Index(self.strings("biotoolsID"), name="biotoolsID"))
+
+
+def build_tool_store(tools: Iterable[dict], path: str) -> ToolStore:
+    """
+    Write the tools to a columnar tool store in a single pass.
+    :param tools: The tools.
+    :param path: The path of the store directory.
+    :return: The tool store.
+    """
+    strings: Dict[str, bytearray] = {column: bytearray() for column in STRING_COLUMNS}
+    string_offsets: Dict[str, List[int]] = {column: [0] for column in STRING_COLUMNS}
+    collections: Dict[str, int] = {}
+    collection_codes: List[int] = []
+    collection_offsets: List[int] = [0]
+    extractor = TermExtractor()
+
+    for tool in tools:
+        for column in STRING_COLUMNS:
+            strings[column].extend((tool.get(column) or "").encode("utf-8"))
+            string_offsets[column].append(len(strings[column]))
+        collection_codes.extend(collections.setdefault(collection, len(collections))
+                                for collection in dict.fromkeys(tool.get("collectionID") or []))
+        collection_offsets.append(len(collection_codes))
+        extractor.add(tool)
+    terms = extractor.result()
+
+    arrays: Dict[str, np.ndarray] = {}
+    for column in STRING_COLUMNS:
+        arrays[f"{column}.bytes"] = np.frombuffer(bytes(strings[column]), dtype=np.uint8)
+        arrays[f"{column}.offsets"] = np.array(string_offsets[column], dtype=np.int64)
+    arrays["collectionID.codes"] = np.array(collection_codes, dtype=np.int32)
+    arrays["collectionID.offsets"] = np.array(collection_offsets, dtype=np.int64)
+    vocabularies: Dict[str, List[str]] = {"collectionID": list(collections)}
+    for column in TERM_TYPES:
+        arrays[f"{column}.codes"] = np.frombuffer(terms.codes[column], dtype=np.int32)
+        arrays[f"{column}.offsets"] = np.frombuffer(terms.offsets[column], dtype=np.int64)
+        vocabularies[column] = terms.vocabularies[column]
+
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    meta = {"format_version": FORMAT_VERSION, "number_of_tools": len(terms.tool_ids), "arrays": sorted(arrays),
+            "vocabularies": vocabularies}
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    return ToolStore.load(path)
+
+
+def convert_json_dump(json_path: str, store_path: str, collection_id: Optional[str] = None) -> ToolStore:
+    """
+    Convert a tool list dump, e.g. `all_tools.json`, to a columnar tool store.
+    :param json_path: The path of the JSON or JSON Lines dump.
+    :param store_path: The path of the store directory.
+    :param collection_id: Only convert the tools in this collection, or None to convert all tools.
+    :return: The tool store.
+    """
+    return build_tool_store(tools=iter_tools(path=json_path, collection_id=collection_id), path=store_path)
@@ -0,0 +1,148 @@
+"""
+Streaming reading and writing of tool list dumps
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import json
+import os
+from typing import Iterable, Iterator, Optional, Sequence, TextIO
+
+CHUNK_SIZE: int = 1 << 16
+JSON_LINES_EXTENSIONS: tuple = (".jsonl", ".ndjson")
+
+_decoder: json.JSONDecoder = json.JSONDecoder()
+
+
+def iter_tools(path: str, collection_id: Optional[str] = None, fields: Optional[Sequence[str]] = None) \
+        -> Iterator[dict]:
+    """
+    Read the tools from a dump one at a time, so the memory use does not depend on the size of the catalogue.
+
+    Both the JSON array written by `save_tool_list` and JSON Lines files with one tool per line are supported. The
+    format is detected from the first character of the file.
+    :param path: The path of the dump.
+    :param collection_id: Only yield the tools in this collection, or None to yield all tools.
+    :param fields: Only keep these fields of each tool, or None to keep all fields. The tool ID is always kept.
+    :return: The iterator over the tools.
+    """
+    keep_fields = None if fields is None else set(fields) | {"biotoolsID"}
+    with open(path, "r", encoding="utf-8") as f:
+        first_char = _peek_first_char(f)
+        if first_char == "[":
+            raw_tools = _iter_json_array(f)
+        elif first_char == "" or first_char == "{" or path.endswith(JSON_LINES_EXTENSIONS):
+            raw_tools = _iter_json_lines(f, collection_id=collection_id)
+        else:
+            raise ValueError(f"The file '{path}' is neither a JSON array nor JSON Lines.")
+
+        for tool in raw_tools:
+            if collection_id is not None and collection_id not in (tool.get("collectionID") or []):
+                continue
+            if keep_fields is not None:
+                tool = {key: value for key, value in tool.items() if key in keep_fields}
+            yield tool
+
+
+def save_json_lines(tools: Iterable[dict], path: str) -> int:
+    """
+    Write the tools to a JSON Lines file, one tool per line.
+    :param tools: The tools.
+    :param path: The path of the JSON Lines file.
+    :return: The number of tools written.
+    """
+    number_of_tools: int = 0
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for tool in tools:
+            f.write(json.dumps(tool))
+            f.write("\n")
+            number_of_tools += 1
+    os.replace(tmp_path, path)
+    return number_of_tools
+
+
+def _peek_first_char(f: TextIO) -> str:
+    """
+    Get the first non-whitespace character of a file, and rewind the file to it.
+    :param f: The file.
+    :return: The character, or an empty string if the file is empty.
+    """
+    position = f.tell()
+    while True:
+        char = f.read(1)
+        if char == "" or not char.isspace():
+            f.seek(position)
+            return char
+        position = f.tell()
+
+
+def _iter_json_lines(f: TextIO, collection_id: Optional[str]) -> Iterator[dict]:
+    """
+    Decode the tools in a JSON Lines file.
+    :param f: The file.
+    :param collection_id: Skip lines without this collection ID before decoding them, or None.
+    :return: The iterator over the tools.
+    """
+    # Lines not mentioning the collection cannot contain a tool in it, so they are not decoded at all. This only holds
+    # if the ID is written verbatim in every line, so IDs that a JSON encoder may escape, e.g. non-ASCII characters,
+    # quotes or slashes, are not filtered before decoding
+    if collection_id is not None and (not collection_id.isascii() or "/" in collection_id
+                                      or json.dumps(collection_id)[1:-1] != collection_id):
+        collection_id = None
+    for line in f:
+        if collection_id is not None and collection_id not in line:
+            continue
+        if line.strip():
+            yield json.loads(line)
+
+
+def _iter_json_array(f: TextIO) -> Iterator[dict]:
+    """
+    Decode the elements of a JSON array incrementally from a file.
+    :param f: The file positioned at the opening bracket.
+    :return: The iterator over the elements.
+    """
+    buffer = f.read(CHUNK_SIZE)
+    position = buffer.index("[") + 1
+    end_of_file = False
+    while True:
+        position = _skip_separators(buffer, position)
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            element, end = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if end_of_file:
+                raise
+            # The element continues in the next chunk
+            chunk = f.read(CHUNK_SIZE)
+            end_of_file = chunk == ""
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield element
+        position = end
+
+
+def _skip_separators(buffer: str, position: int) -> int:
+    """
+    Skip the whitespace and commas between array elements.
+    :param buffer: The buffer.
+    :param position: The current position.
+    :return: The position of the next element.
+    """
+    while position < len(buffer) and (buffer[position] == "," or buffer[position].isspace()):
+        position += 1
+    return position
@@ -0,0 +1,278 @@
+"""
+Validation of tool records against the SPDX license list and the EDAM indexes
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import itertools
+import json
+import os
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .edam_index import EdamIndex
+from .edam_term_extractor import EDAM_PREFIX
+from .spdx_license_parser import LicenseClassification, LicensesData
+from .tool_stream import iter_tools
+
+# The fields needed for the validation, so the other fields are dropped before the tools are sent to the workers
+VALIDATED_FIELDS: Tuple[str, ...] = ("license", "topic", "function")
+EDAM_URI_PATTERN: re.Pattern = re.compile(rf"^{re.escape(EDAM_PREFIX)}(topic|operation|data|format)_[0-9]{{4}}$")
+# The fields a record needs to be accepted by the bio.tools API, with the pattern of their values
+REQUIRED_FIELDS: Dict[str, re.Pattern] = {"biotoolsID": re.compile(r"^[_\-.0-9a-zA-Z]{1,100}$"),
+                                          "name": re.compile(r"^\S.{0,99}$", re.DOTALL),
+                                          "description": re.compile(r"^\S.{9,999}$", re.DOTALL),
+                                          "homepage": re.compile(r"^https?://\S+$")}
+LIST_FIELDS: Tuple[str, ...] = ("topic", "function", "collectionID", "toolType", "operatingSystem", "language",
+                                "link", "download", "documentation", "publication", "credit")
+
+
+@dataclass
+class ValidationIssue:
+    issue: str
+    field: str
+    value: str
+    suggestion: Optional[str] = None
+
+
+@dataclass
+class ValidationReport:
+    tools: int = 0
+    tools_with_issues: int = 0
+    issues: Counter = field(default_factory=Counter)
+    seconds: float = 0.0
+
+    @property
+    def tools_per_second(self) -> float:
+        """
+        The number of tools validated per second.
+        """
+        return self.tools / self.seconds if self.seconds > 0 else 0.0
+
+
+class ToolValidator:
+    """
+    Validator of single tool records.
+
+    The following issues are reported:
+    - 'unknown_license': The license is neither an SPDX license ID nor a bio.tools license value.
+    - 'nonstandard_license': The license names an SPDX license, but not by its ID, e.g. 'MIT License'.
+    - 'deprecated_license': The license is a deprecated SPDX ID, e.g. 'GPL-3.0' instead of 'GPL-3.0-only'.
+    - 'invalid_uri': The term URI is not an EDAM URI of the expected type, e.g. a topic in the operations.
+    - 'unknown_term': The topic or operation is missing from the EDAM indexes, e.g. because the term is obsolete.
+    With `check_schema`, e.g. before uploading records, the following issues are reported as well:
+    - 'missing_field': A required field, e.g. the homepage, is missing or empty.
+    - 'invalid_field': A required field does not have the form the API accepts, or a list field is not a list.
+    The license classifications are cached, as the registry only uses a few hundred distinct license texts.
+    """
+
+    def __init__(self, licenses: LicensesData, index: EdamIndex, check_schema: bool = False):
+        """
+        Create the validator.
+        :param licenses: The SPDX license data.
+        :param index: The index of the topics and operations.
+        :param check_schema: Whether to check the required fields and the types of the list fields, which is off for
+            catalogue dumps streamed with only the validated fields.
+        """
+        self.licenses: LicensesData = licenses
+        self.check_schema: bool = check_schema
+        self.known_terms: frozenset = frozenset(index.term_ids)
+        self._license_cache: Dict[str, LicenseClassification] = {}
+
+    def validate(self, tool: dict) -> List[ValidationIssue]:
+        """
+        Validate a tool.
+        :param tool: The tool.
+        :return: The issues, or an empty list if the tool is valid.
+        """
+        issues: List[ValidationIssue] = []
+        if self.check_schema:
+            self._check_schema(tool=tool, issues=issues)
+        if tool.get("license"):
+            self._check_license(license_text=tool["license"], issues=issues)
+        self._check_terms(terms=tool.get("topic") or [], term_type="topic", field_name="topic", issues=issues)
+        for function in tool.get("function") or []:
+            self._check_terms(terms=function.get("operation") or [], term_type="operation",
+                              field_name="function.operation", issues=issues)
+            for direction in ("input", "output"):
+                for io in function.get(direction) or []:
+                    if "data" in io:
+                        self._check_terms(terms=[io["data"]], term_type="data", field_name=f"function.{direction}.data",
+                                          issues=issues)
+                    self._check_terms(terms=io.get("format") or [], term_type="format",
+                                      field_name=f"function.{direction}.format", issues=issues)
+        return issues
+
+    def _check_schema(self, tool: dict, issues: List[ValidationIssue]):
+        """
+        Check the required fields of a tool and the types of its list fields.
+        :param tool: The tool.
+        :param issues: The list the issues are added to.
+        """
+        for field_name, pattern in REQUIRED_FIELDS.items():
+            value = tool.get(field_name)
+            if not value:
+                issues.append(ValidationIssue(issue="missing_field", field=field_name, value=""))
+            elif not isinstance(value, str) or pattern.match(value) is None:
+                issues.append(ValidationIssue(issue="invalid_field", field=field_name, value=str(value)[:100]))
+        for field_name in LIST_FIELDS:
+            if tool.get(field_name) is not None and not isinstance(tool[field_name], list):
+                issues.append(ValidationIssue(issue="invalid_field", field=field_name,
+                                              value=type(tool[field_name]).__name__))
+
+    def _check_license(self, license_text: str, issues: List[ValidationIssue]):
+        """
+        Check the license of a tool.
+        :param license_text: The license.
+        :param issues: The list the issues are added to.
+        """
+        classification = self._license_cache.get(license_text)
+        if classification is None:
+            classification = self.licenses.classify_one(text=license_text)
+            self._license_cache[license_text] = classification
+
+        if classification.match == "unknown":
+            issues.append(ValidationIssue(issue="unknown_license", field="license", value=license_text))
+        elif classification.match in ("normalized", "fuzzy"):
+            issues.append(ValidationIssue(issue="nonstandard_license", field="license", value=license_text,
+                                          suggestion=classification.license_id))
+        elif classification.deprecated:
+            issues.append(ValidationIssue(issue="deprecated_license", field="license", value=license_text,
+                                          suggestion=classification.license_id))
+
+    def _check_terms(self, terms: list, term_type: str, field_name: str, issues: List[ValidationIssue]):
+        """
+        Check the EDAM terms of a field. Only the topics and operations are looked up, as there are no data and format
+        indexes.
+        :param terms: The terms, each a dictionary with the URI.
+        :param term_type: The expected term type, i.e. 'topic', 'operation', 'data' or 'format'.
+        :param field_name: The name of the field in the report.
+        :param issues: The list the issues are added to.
+        """
+        for term in terms:
+            uri = term.get("uri") or ""
+            match = EDAM_URI_PATTERN.match(uri)
+            if match is None or match.group(1) != term_type:
+                issues.append(ValidationIssue(issue="invalid_uri", field=field_name, value=uri))
+            elif term_type in ("topic", "operation") and uri[len(EDAM_PREFIX):] not in self.known_terms:
+                issues.append(ValidationIssue(issue="unknown_term", field=field_name, value=uri))
+
+
+def validate_tools(tools: Iterable[dict], validator: ToolValidator) -> Iterator[Tuple[str, List[ValidationIssue]]]:
+    """
+    Validate tools in the current process.
+    :param tools: The tools.
+    :param validator: The validator.
+    :return: The iterator over the tool ID and the issues of each tool.
+    """
+    for tool in tools:
+        yield tool["biotoolsID"], validator.validate(tool)
+
+
+def validate_catalogue(path: str, report_path: str, validator: ToolValidator, workers: Optional[int] = None,
+                       chunk_size: int = 500) -> ValidationReport:
+    """
+    Validate every tool of a catalogue dump and write the issues to a report.
+
+    The dump is streamed with `iter_tools`, and chunks of tools are validated by a pool of processes, with a bounded
+    number of chunks in flight so the memory use does not depend on the size of the catalogue. The report is a JSON
+    Lines file with one line per tool with issues, e.g.
+    {"biotoolsID": "tool", "issues": [["deprecated_license", "license", "GPL-3.0", "GPL-3.0-only"]]},
+    in the order of the dump.
+    :param path: The path of the dump, a JSON array or JSON Lines file.
+    :param report_path: The path of the report.
+    :param validator: The validator.
+    :param workers: The number of processes, where 1 validates in the current process. Defaults to the number of CPUs.
+    :param chunk_size: The number of tools sent to a process at a time.
+    :return: The summary of the validation.
+    """
+    workers = workers or os.cpu_count() or 1
+    report = ValidationReport()
+    start = time.perf_counter()
+    tools = iter_tools(path=path, fields=VALIDATED_FIELDS)
+
+    tmp_path = f"{report_path}.part"
+    with open(tmp_path, "w") as f:
+        if workers == 1:
+            _write_results(results=validate_tools(tools=tools, validator=validator), f=f, report=report)
+        else:
+            chunks = iter(lambda: list(itertools.islice(tools, chunk_size)), [])
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(validator,)) as executor:
+                pending: Deque[Future] = deque(executor.submit(_validate_chunk, chunk)
+                                               for chunk in itertools.islice(chunks, workers * 2))
+                while pending:
+                    results = pending.popleft().result()
+                    for chunk in itertools.islice(chunks, 1):
+                        pending.append(executor.submit(_validate_chunk, chunk))
+                    _write_results(results=results, f=f, report=report)
+    os.replace(tmp_path, report_path)
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def read_report(report_path: str) -> Iterator[Tuple[str, List[ValidationIssue]]]:
+    """
+    Read a report written by `validate_catalogue`.
+    :param report_path: The path of the report.
+    :return: The iterator over the tool ID and the issues of each tool with issues.
+    """
+    with open(report_path, "r") as f:
+        for line in f:
+            entry = json.loads(line)
+            yield entry["biotoolsID"], [ValidationIssue(*issue) for issue in entry["issues"]]
+
+
+def _write_results(results: Iterable[Tuple[str, List[ValidationIssue]]], f, report: ValidationReport):
+    """
+    Write the tools with issues to the report file, and count the tools and issues.
+    :param results: The tool ID and the issues of each tool.
+    :param f: The report file.
+    :param report: The summary to update.
+    """
+    for tool_id, issues in results:
+        report.tools += 1
+        if len(issues) == 0:
+            continue
+        report.tools_with_issues += 1
+        report.issues.update(issue.issue for issue in issues)
+        f.write(json.dumps({"biotoolsID": tool_id,
+                            "issues": [[issue.issue, issue.field, issue.value, issue.suggestion] if issue.suggestion
+                                       else [issue.issue, issue.field, issue.value] for issue in issues]}))
+        f.write("\n")
+
+
+_worker_validator: Optional[ToolValidator] = None
+
+
+def _init_worker(validator: ToolValidator):
+    """
+    Keep the validator in a worker process, so it is only sent once per process instead of once per chunk.
+    :param validator: The validator.
+    """
+    global _worker_validator
+    _worker_validator = validator
+
+
+def _validate_chunk(tools: List[dict]) -> List[Tuple[str, List[ValidationIssue]]]:
+    """
+    Validate a chunk of tools in a worker process.
+    :param tools: The tools.
+    :return: The tool ID and the issues of each tool.
+    """
+    return list(validate_tools(tools=tools, validator=_worker_validator))
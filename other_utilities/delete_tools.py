@@ -16,13 +16,17 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 from argparse import ArgumentParser, FileType, Namespace
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import sys
-import time
+from typing import Optional
 
 import requests
 from requests import HTTPError
 
+from biotools_utils.http_utils import AdaptiveTokenBucket, ProgressJournal, REQUEST_TIMEOUT, create_session, \
+    retry_after_seconds
+
 
 class CustomArgumentParser(ArgumentParser):
     def error(self, message: str):
@@ -34,6 +38,9 @@ class CustomArgumentParser(ArgumentParser):
 
 
 BASE_API_URL: str = "https://bio.tools/api"
+MAX_ATTEMPTS: int = 5
+MAX_REQUESTS_PER_SECOND: float = 10.0
+DONE_STATUSES: tuple = ("deleted", "not_found")
 LICENSE_STR: str = """
 delete_tools.py  Copyright (C) 2022  Mads Kierkegaard
 
@@ -52,22 +59,39 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 
-def delete_tools(account_credentials: dict, tool_id_list_file: str):
+def delete_tools(account_credentials: dict, tool_id_list_file: str, workers: int = 4,
+                 journal_file: Optional[str] = None, requests_per_second: float = 1.0,
+                 max_requests_per_second: float = MAX_REQUESTS_PER_SECOND, api_url: str = BASE_API_URL):
     """
     Delete tools from bio.tools.
 
+    The deletions are sent concurrently over a single keep-alive session, with a request rate which backs off when
+    the server answers with 429 or 5xx, and speeds up again while it is healthy. The outcome of each tool is written to
+    a journal, so a re-run skips the tools already deleted or not found.
+
     :param account_credentials: The dictionary with the the username and password of the account responsible
         for the deletion.
     :param tool_id_list_file: The text file with the user.
+    :param workers: The number of concurrent deletions.
+    :param journal_file: The journal file. Defaults to the tool ID file with the extension '.journal'.
+    :param requests_per_second: The initial number of deletions per second.
+    :param max_requests_per_second: The highest number of deletions per second.
+    :param api_url: The base URL of the API.
     """
     # Parse tool ids
-    tool_ids: list = [tool.rstrip("\n") for tool in open(tool_id_list_file, 'r').readlines()]
-
+    tool_ids: list = [tool.rstrip("\n") for tool in open(tool_id_list_file, 'r').readlines() if tool.strip()]
+    journal: ProgressJournal = ProgressJournal(journal_file or f"{tool_id_list_file}.journal")
+    skipped_ids: list = [tool_id for tool_id in tool_ids if journal.is_done(tool_id, DONE_STATUSES)]
+    if len(skipped_ids) > 0:
+        print(f"Skipping {len(skipped_ids)} tools already deleted according to '{journal.path}'")
+        tool_ids = [tool_id for tool_id in tool_ids if not journal.is_done(tool_id, DONE_STATUSES)]
+
+    session: requests.Session = create_session(pool_size=workers)
     token: str = ""
     # Get the token
     try:
-        resp_auth = requests.post(f"{BASE_API_URL}/rest-auth/login/", json=account_credentials,
-                                  headers={"Content-Type": "application/json"})
+        resp_auth = session.post(f"{api_url}/rest-auth/login/", json=account_credentials,
+                                 headers={"Content-Type": "application/json"}, timeout=REQUEST_TIMEOUT)
         resp_auth.raise_for_status()
         token = resp_auth.json()['key']
         print("Got the token")
@@ -79,23 +103,69 @@ def delete_tools(account_credentials: dict, tool_id_list_file: str):
             sys.stderr.write(f"ERROR: {e.response.status_code} {e.response.reason}")
             exit(5)
 
-    # Loop through the tools and delete them
+    # Delete the tools concurrently
+    bucket: AdaptiveTokenBucket = AdaptiveTokenBucket(rate=requests_per_second, capacity=workers,
+                                                      max_rate=max(requests_per_second, max_requests_per_second))
     number_of_tools: int = len(tool_ids)
-    for idx, tool_id in enumerate(tool_ids):
-        time.sleep(1)
-        try:
-            resp_delete = requests.delete(f"{BASE_API_URL}/tool/{tool_id}/",
-                                          headers={'Authorization': f"Token {token}"})
-            resp_delete.raise_for_status()
-            print(f"Deleted tool {idx + 1}/{number_of_tools}: 'biotools:{tool_id}'")
-        except HTTPError as e:
-            if e.response.status_code == 404:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_delete_tool, session=session, bucket=bucket, token=token, tool_id=tool_id,
+                                   api_url=api_url): tool_id for tool_id in tool_ids}
+        for idx, future in enumerate(as_completed(futures)):
+            tool_id = futures[future]
+            try:
+                status = future.result()
+            except HTTPError as e:
+                sys.stderr.write(f"ERROR: 'biotools:{tool_id}' {e.response.status_code} {e.response.reason}\n")
+                journal.record(tool_id, "failed")
+                continue
+            except requests.RequestException as e:
+                # E.g. a timeout, so the remaining tools are still deleted and a re-run retries this one
+                sys.stderr.write(f"ERROR: 'biotools:{tool_id}' {e}\n")
+                journal.record(tool_id, "failed")
+                continue
+            journal.record(tool_id, status)
+            if status == "deleted":
+                print(f"Deleted tool {idx + 1}/{number_of_tools}: 'biotools:{tool_id}'")
+            elif status == "not_found":
                 print(f"Tool {idx + 1}/{number_of_tools}: 'biotools:{tool_id}' has already been deleted or "
                       f"does not exist.")
-                continue
-            sys.stderr.write(f"ERROR: {e.response.status_code} {e.response.reason}")
+            else:
+                sys.stderr.write(f"ERROR: Gave up deleting 'biotools:{tool_id}' after {MAX_ATTEMPTS} attempts.\n")
+    session.close()
+
+
+def _delete_tool(session: requests.Session, bucket: AdaptiveTokenBucket, token: str, tool_id: str,
+                 api_url: str) -> str:
+    """
+    Delete a single tool, retrying while the server is overloaded.
+
+    :param session: The session.
+    :param bucket: The rate limiter shared by the workers.
+    :param token: The authentication token.
+    :param tool_id: The tool ID.
+    :param api_url: The base URL of the API.
+    :return: The status, 'deleted', 'not_found' or 'failed'.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        bucket.acquire()
+        try:
+            resp_delete = session.delete(f"{api_url}/tool/{tool_id}/", headers={'Authorization': f"Token {token}"},
+                                         timeout=REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            bucket.on_throttle()
+            continue
+        if resp_delete.status_code == 429 or resp_delete.status_code >= 500:
+            bucket.on_throttle(retry_after=retry_after_seconds(resp_delete))
             continue
 
+        bucket.on_success()
+        # Deleting is idempotent, so a 404 after a retry means the earlier attempt succeeded
+        if resp_delete.status_code == 404:
+            return "not_found" if attempt == 0 else "deleted"
+        resp_delete.raise_for_status()
+        return "deleted"
+    return "failed"
+
 
 if __name__ == '__main__':
     # Create the argument parser, add the arguments and parse the arguments
@@ -107,6 +177,14 @@ if __name__ == '__main__':
     parser.add_argument("--ids", "-i", help="The file containing the ids of the bio.tools to be deleted. "
                                             "One ID per line.",
                         type=FileType('r'), required=True)
+    parser.add_argument("--workers", "-w", help="The number of concurrent deletions.", type=int, default=4)
+    parser.add_argument("--rate", "-r", help="The initial number of deletions per second. The rate adapts to the "
+                                             "responses of the server.", type=float, default=1.0)
+    parser.add_argument("--max-rate", help="The highest number of deletions per second.", type=float,
+                        default=MAX_REQUESTS_PER_SECOND)
+    parser.add_argument("--journal", "-j", help="The journal file recording the deleted tools, so a re-run skips "
+                                                "them. Defaults to the ID file with the extension '.journal'.")
+    parser.add_argument("--api-url", help="The base URL of the API.", default=BASE_API_URL)
     args: Namespace = parser.parse_args()
 
     print(LICENSE_STR)
@@ -122,4 +200,6 @@ if __name__ == '__main__':
         exit(2)
 
     # Call the script
-    delete_tools(account_credentials=credentials, tool_id_list_file=args.file.name)
+    delete_tools(account_credentials=credentials, tool_id_list_file=args.ids.name, workers=args.workers,
+                 journal_file=args.journal, requests_per_second=args.rate,
+                 max_requests_per_second=args.max_rate, api_url=args.api_url)
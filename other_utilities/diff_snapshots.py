@@ -0,0 +1,72 @@
+"""
+Utility script for comparing two snapshots of the catalogue
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import sys
+
+from biotools_utils.snapshot_diff import DEFAULT_RUN_SIZE, diff_snapshots
+
+
+class CustomArgumentParser(ArgumentParser):
+    def error(self, message: str):
+        sys.stdout.write(LICENSE_STR)
+        sys.stdout.write("\n")
+        sys.stderr.write('error: %s\n' % message)
+        self.print_help()
+        exit(2)
+
+
+LICENSE_STR: str = """
+diff_snapshots.py  Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+if __name__ == '__main__':
+    # Create the argument parser, add the arguments and parse the arguments
+    parser: CustomArgumentParser = CustomArgumentParser(prog="diff_snapshots.py",
+                                                        description="Script for listing the tools added, removed and "
+                                                                    "modified between two tool list dumps",
+                                                        add_help=True)
+    parser.add_argument("old", help="The older dump, a JSON array or JSON Lines file.")
+    parser.add_argument("new", help="The newer dump, a JSON array or JSON Lines file.")
+    parser.add_argument("--changelog", "-c", help="The JSON Lines changelog with one line per changed tool.",
+                        required=True)
+    parser.add_argument("--run-size", help="The number of tools sorted in memory at a time.", type=int,
+                        default=DEFAULT_RUN_SIZE)
+    args: Namespace = parser.parse_args()
+
+    print(LICENSE_STR)
+
+    diff = diff_snapshots(old_path=args.old, new_path=args.new, changelog_path=args.changelog, run_size=args.run_size)
+
+    print(f"Compared the snapshots in {diff.seconds:.1f} s")
+    print(f"{diff.added} added, {diff.removed} removed, {diff.modified} modified and {diff.unchanged} unchanged tools")
+    for field_name, count in diff.field_changes.most_common():
+        print(f"  {field_name}: {count}")
@@ -0,0 +1,275 @@
+"""
+Utility script for bulk creation and update of tools
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, FileType, Namespace
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import json
+import sys
+from typing import Optional
+
+import requests
+from requests import HTTPError
+
+from biotools_utils import EdamIndex, iter_tools, parse_license_list
+from biotools_utils.http_utils import AdaptiveTokenBucket, ProgressJournal, REQUEST_TIMEOUT, create_session, \
+    retry_after_seconds
+from biotools_utils.spdx_license_parser import DEFAULT_CACHE_DIR
+from biotools_utils.tool_validator import ToolValidator
+
+
+class CustomArgumentParser(ArgumentParser):
+    def error(self, message: str):
+        sys.stdout.write(LICENSE_STR)
+        sys.stdout.write("\n")
+        sys.stderr.write('error: %s\n' % message)
+        self.print_help()
+        exit(2)
+
+
+BASE_API_URL: str = "https://bio.tools/api"
+MAX_ATTEMPTS: int = 5
+MAX_REQUESTS_PER_SECOND: float = 10.0
+DONE_STATUSES: tuple = ("created", "updated")
+# The issues which make the API reject a record, while the other issues are only reported
+BLOCKING_ISSUES: tuple = ("missing_field", "invalid_field", "invalid_uri", "unknown_term", "unknown_license")
+LICENSE_STR: str = """
+upload_tools.py  Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+def upload_tools(account_credentials: dict, tools_file: str, validator: Optional[ToolValidator] = None,
+                 workers: int = 4, journal_file: Optional[str] = None, requests_per_second: float = 1.0,
+                 max_requests_per_second: float = MAX_REQUESTS_PER_SECOND, api_url: str = BASE_API_URL,
+                 validate_only: bool = False) -> Counter:
+    """
+    Create or update tools in bio.tools.
+
+    Every record is validated locally first, and records with issues the API would reject are not sent. The records
+    are sent concurrently over a single keep-alive session, with a request rate which backs off when the server
+    answers with 429 or 5xx, and speeds up again while it is healthy. Each record is first sent as an update, and
+    created if the tool does not exist. The outcome of each record is written to a journal keyed by the tool ID and
+    the hash of the record, so a re-run skips the records already uploaded, but sends the records edited since.
+
+    :param account_credentials: The dictionary with the username and password of the account responsible for the
+        upload.
+    :param tools_file: The JSON array or JSON Lines file with the tool records.
+    :param validator: The validator, which should check the schema. If None, the records are not validated.
+    :param workers: The number of concurrent uploads.
+    :param journal_file: The journal file. Defaults to the tools file with the extension '.journal'.
+    :param requests_per_second: The initial number of requests per second.
+    :param max_requests_per_second: The highest number of requests per second.
+    :param api_url: The base URL of the API.
+    :param validate_only: Only validate the records, without logging in or uploading.
+    :return: The number of records with each status, 'created', 'updated', 'skipped', 'invalid' or 'failed'.
+    """
+    statuses: Counter = Counter()
+    journal: ProgressJournal = ProgressJournal(journal_file or f"{tools_file}.journal")
+    records: list = []
+    for tool in iter_tools(path=tools_file):
+        tool_id = tool.get("biotoolsID") or ""
+        if validator is not None:
+            issues = validator.validate(tool)
+            for issue in issues:
+                sys.stderr.write(f"{'ERROR' if issue.issue in BLOCKING_ISSUES else 'WARNING'}: 'biotools:{tool_id}' "
+                                 f"{issue.issue} in '{issue.field}': '{issue.value}'"
+                                 f"{f', use {issue.suggestion!r}' if issue.suggestion else ''}\n")
+            if any(issue.issue in BLOCKING_ISSUES for issue in issues):
+                statuses["invalid"] += 1
+                continue
+        journal_id = _journal_id(tool)
+        if journal.is_done(journal_id, DONE_STATUSES):
+            statuses["skipped"] += 1
+            continue
+        records.append((journal_id, tool))
+    if statuses["skipped"] > 0:
+        print(f"Skipping {statuses['skipped']} tools already uploaded according to '{journal.path}'")
+    if statuses["invalid"] > 0:
+        print(f"Skipping {statuses['invalid']} invalid tools")
+    if validate_only or len(records) == 0:
+        return statuses
+
+    session: requests.Session = create_session(pool_size=workers)
+    token: str = ""
+    # Get the token
+    try:
+        resp_auth = session.post(f"{api_url}/rest-auth/login/", json=account_credentials,
+                                 headers={"Content-Type": "application/json"}, timeout=REQUEST_TIMEOUT)
+        resp_auth.raise_for_status()
+        token = resp_auth.json()['key']
+        print("Got the token")
+    except HTTPError as e:
+        if e.response.status_code == 400:
+            sys.stderr.write("ERROR: Please verify the login credentials.")
+            exit(5)
+        else:
+            sys.stderr.write(f"ERROR: {e.response.status_code} {e.response.reason}")
+            exit(5)
+
+    # Upload the tools concurrently
+    bucket: AdaptiveTokenBucket = AdaptiveTokenBucket(rate=requests_per_second, capacity=workers,
+                                                      max_rate=max(requests_per_second, max_requests_per_second))
+    number_of_tools: int = len(records)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_upload_tool, session=session, bucket=bucket, token=token, tool=tool,
+                                   api_url=api_url): (journal_id, tool["biotoolsID"]) for journal_id, tool in records}
+        for idx, future in enumerate(as_completed(futures)):
+            journal_id, tool_id = futures[future]
+            try:
+                status = future.result()
+            except HTTPError as e:
+                sys.stderr.write(f"ERROR: 'biotools:{tool_id}' {e.response.status_code} {e.response.reason} "
+                                 f"{e.response.text[:200]}\n")
+                statuses["failed"] += 1
+                journal.record(journal_id, "failed")
+                continue
+            except requests.RequestException as e:
+                # E.g. a timeout, which is not retried as the server may have created the tool
+                sys.stderr.write(f"ERROR: 'biotools:{tool_id}' {e}\n")
+                statuses["failed"] += 1
+                journal.record(journal_id, "failed")
+                continue
+            statuses[status] += 1
+            journal.record(journal_id, status)
+            if status in DONE_STATUSES:
+                print(f"{status.capitalize()} tool {idx + 1}/{number_of_tools}: 'biotools:{tool_id}'")
+            else:
+                sys.stderr.write(f"ERROR: Gave up uploading 'biotools:{tool_id}' after {MAX_ATTEMPTS} attempts.\n")
+    session.close()
+    return statuses
+
+
+def _journal_id(tool: dict) -> str:
+    """
+    Get the journal ID of a record, which changes when the record is edited.
+
+    :param tool: The tool.
+    :return: The tool ID and the start of the hash of the record.
+    """
+    digest = hashlib.sha256(json.dumps(tool, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{tool['biotoolsID']}@{digest[:16]}"
+
+
+def _upload_tool(session: requests.Session, bucket: AdaptiveTokenBucket, token: str, tool: dict,
+                 api_url: str) -> str:
+    """
+    Update a single tool, or create it if it does not exist, retrying while the server is overloaded.
+
+    :param session: The session.
+    :param bucket: The rate limiter shared by the workers.
+    :param token: The authentication token.
+    :param tool: The tool.
+    :param api_url: The base URL of the API.
+    :return: The status, 'created', 'updated' or 'failed'.
+    """
+    headers = {'Authorization': f"Token {token}", "Content-Type": "application/json"}
+    data = json.dumps(tool).encode("utf-8")
+    create = False
+    for _ in range(MAX_ATTEMPTS):
+        bucket.acquire()
+        try:
+            if create:
+                resp_upload = session.post(f"{api_url}/tool/", data=data, headers=headers, timeout=REQUEST_TIMEOUT)
+            else:
+                resp_upload = session.put(f"{api_url}/tool/{tool['biotoolsID']}/", data=data, headers=headers,
+                                          timeout=REQUEST_TIMEOUT)
+        except requests.ConnectionError:
+            bucket.on_throttle()
+            continue
+        if resp_upload.status_code == 429 or resp_upload.status_code >= 500:
+            bucket.on_throttle(retry_after=retry_after_seconds(resp_upload))
+            continue
+
+        bucket.on_success()
+        if not create and resp_upload.status_code == 404:
+            create = True
+            continue
+        # Creating is not idempotent, so a tool which exists after a retry was created by the earlier attempt, or in
+        # the meantime by someone else, and the record is sent again as an update
+        if create and resp_upload.status_code in (400, 409) and "already exists" in resp_upload.text:
+            create = False
+            continue
+        resp_upload.raise_for_status()
+        return "created" if create else "updated"
+    return "failed"
+
+
+if __name__ == '__main__':
+    # Create the argument parser, add the arguments and parse the arguments
+    parser: CustomArgumentParser = CustomArgumentParser(prog="upload_tools.py",
+                                                        description="Script for bulk creation and update of tools",
+                                                        add_help=True)
+    parser.add_argument("--credentials", '-c', help="The JSON-file containing the dictionary with the keys: 'username'"
+                                                    "and 'password' for the account responsible for the upload.",
+                        type=FileType('r'))
+    parser.add_argument("--tools", "-t", help="The JSON array or JSON Lines file with the tool records.",
+                        required=True)
+    parser.add_argument("--workers", "-w", help="The number of concurrent uploads.", type=int, default=4)
+    parser.add_argument("--rate", "-r", help="The initial number of requests per second. The rate adapts to the "
+                                             "responses of the server.", type=float, default=1.0)
+    parser.add_argument("--max-rate", help="The highest number of requests per second.", type=float,
+                        default=MAX_REQUESTS_PER_SECOND)
+    parser.add_argument("--journal", "-j", help="The journal file recording the uploaded records, so a re-run skips "
+                                                "them. Defaults to the tools file with the extension '.journal'.")
+    parser.add_argument("--api-url", help="The base URL of the API.", default=BASE_API_URL)
+    parser.add_argument("--index", help="The EDAM index files.", nargs="+",
+                        default=["automatic_domain_assignment_test/Resources/topic_index.json",
+                                 "automatic_domain_assignment_test/Resources/operation_index.json"])
+    parser.add_argument("--license-cache", help="The cache directory of the SPDX license list.",
+                        default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--offline", help="Only use the cached SPDX license list.", action="store_true")
+    parser.add_argument("--validate-only", help="Only validate the records.", action="store_true")
+    args: Namespace = parser.parse_args()
+
+    print(LICENSE_STR)
+
+    credentials = {}
+    if not args.validate_only:
+        if args.credentials is None:
+            parser.error("the following arguments are required: --credentials/-c")
+        # Read the credentials and check that it contains the required fields
+        with open(args.credentials.name, 'r') as f:
+            credentials = json.load(f)
+        if 'username' not in credentials or str.isspace(credentials['username']):
+            sys.stderr.write("No 'username' found in credentials.")
+            exit(2)
+        if 'password' not in credentials or str.isspace(credentials['password']):
+            sys.stderr.write("No 'password' found in credentials.")
+            exit(2)
+
+    # Call the script
+    tool_validator = ToolValidator(licenses=parse_license_list(cache_dir=args.license_cache, offline=args.offline),
+                                   index=EdamIndex.load(*args.index), check_schema=True)
+    result = upload_tools(account_credentials=credentials, tools_file=args.tools, validator=tool_validator,
+                          workers=args.workers, journal_file=args.journal, requests_per_second=args.rate,
+                          max_requests_per_second=args.max_rate, api_url=args.api_url,
+                          validate_only=args.validate_only)
+    print(", ".join(f"{count} {status}" for status, count in result.most_common()))
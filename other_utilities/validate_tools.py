@@ -0,0 +1,80 @@
+"""
+Utility script for validating the licenses and EDAM terms of a tool list dump
+Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser, Namespace
+import sys
+
+from biotools_utils import EdamIndex, parse_license_list
+from biotools_utils.spdx_license_parser import DEFAULT_CACHE_DIR
+from biotools_utils.tool_validator import ToolValidator, validate_catalogue
+
+
+class CustomArgumentParser(ArgumentParser):
+    def error(self, message: str):
+        sys.stdout.write(LICENSE_STR)
+        sys.stdout.write("\n")
+        sys.stderr.write('error: %s\n' % message)
+        self.print_help()
+        exit(2)
+
+
+LICENSE_STR: str = """
+validate_tools.py  Copyright (C) 2022  Mads Kierkegaard
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+if __name__ == '__main__':
+    # Create the argument parser, add the arguments and parse the arguments
+    parser: CustomArgumentParser = CustomArgumentParser(prog="validate_tools.py",
+                                                        description="Script for validating the licenses and EDAM "
+                                                                    "terms of all tools in a tool list dump",
+                                                        add_help=True)
+    parser.add_argument("--dump", "-d", help="The tool list dump, a JSON array or JSON Lines file.", required=True)
+    parser.add_argument("--report", "-r", help="The JSON Lines report with one line per tool with issues.",
+                        required=True)
+    parser.add_argument("--index", help="The EDAM index files.", nargs="+",
+                        default=["automatic_domain_assignment_test/Resources/topic_index.json",
+                                 "automatic_domain_assignment_test/Resources/operation_index.json"])
+    parser.add_argument("--license-cache", help="The cache directory of the SPDX license list.",
+                        default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--offline", help="Only use the cached SPDX license list.", action="store_true")
+    parser.add_argument("--workers", "-w", help="The number of processes. Defaults to the number of CPUs.", type=int)
+    args: Namespace = parser.parse_args()
+
+    print(LICENSE_STR)
+
+    validator = ToolValidator(licenses=parse_license_list(cache_dir=args.license_cache, offline=args.offline),
+                              index=EdamIndex.load(*args.index))
+    report = validate_catalogue(path=args.dump, report_path=args.report, validator=validator, workers=args.workers)
+
+    print(f"Validated {report.tools} tools in {report.seconds:.1f} s ({report.tools_per_second:.0f} tools/s)")
+    print(f"{report.tools_with_issues} tools with issues")
+    for issue, count in report.issues.most_common():
+        print(f"  {issue}: {count}")